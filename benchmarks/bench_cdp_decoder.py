@@ -0,0 +1,109 @@
+"""
+CDP 事件解码微基准：对比逐字段 jsonpath 查询与预编译解码器的每秒事件处理量
+
+    python -m benchmarks.bench_cdp_decoder [事件数量]
+"""
+import json
+import sys
+import time
+
+import jsonpath
+
+from selenium_ide_script.cdp import decode_performance_log
+from selenium_ide_script.collector import NetworkLog, WebDriverNetworkCollector
+
+
+class _Driver:
+    @staticmethod
+    def execute_cdp_cmd(cmd, params):
+        return {'body': '{"code": 200, "data": []}'}
+
+
+def performance_logs(count):
+    methods = ['Network.requestWillBeSent', 'Network.requestWillBeSentExtraInfo', 'Network.responseReceived',
+               'Network.responseReceivedExtraInfo', 'Network.dataReceived', 'Network.loadingFinished']
+    logs = []
+    for index in range(count):
+        request_id = str(index // len(methods))
+        params = {
+            'requestId': request_id,
+            'documentURL': 'https://test.example.com/',
+            'type': 'XHR',
+            'headers': {'content-type': 'application/json', 'x-request-id': request_id},
+            'request': {'url': f'https://test.example.com/api/{request_id}', 'method': 'POST',
+                        'headers': {'accept': 'application/json'}, 'postData': '{"page": 1}'},
+            'response': {'status': 200, 'headers': {'content-type': 'application/json'}},
+            'statusCode': 200,
+        }
+        message = {'message': {'method': methods[index % len(methods)], 'params': params}, 'webview': 'ABC'}
+        logs.append({'level': 'INFO', 'message': json.dumps(message), 'timestamp': 1684000000000 + index})
+    return logs
+
+
+def _extract(data, expression):
+    data = jsonpath.jsonpath(data, expression)
+    return data[0] if data and len(data) == 1 else data
+
+
+def legacy(logs, driver):
+    """ 优化前的实现：每个字段一次完整的 jsonpath 解析 """
+    networks = {}
+    for log in logs:
+        log['message'] = json.loads(log.get('message'))
+        method = _extract(log, "$.message.message.method")
+        if not method.startswith("Network"):
+            continue
+        request_id = _extract(log, "$.message.message.params.requestId")
+        network = networks.setdefault(request_id, {'logs': []})
+        _extract(log, "$.message.message.method")
+        _extract(log, "$.message.message.params.requestId")
+        network['logs'].append(log)
+        if method == 'Network.requestWillBeSent':
+            for expression in ["$.message.message.params.documentURL", "$.message.message.params.request.url",
+                               "$.message.message.params.request.method", "$.message.message.params.request.headers",
+                               "$.message.message.params.type", "$.message.message.params.request.postData",
+                               "$.timestamp"]:
+                network[expression] = _extract(log, expression)
+        elif method in ('Network.requestWillBeSentExtraInfo', 'Network.responseReceivedExtraInfo'):
+            network['headers'] = _extract(log, "$.message.message.params.headers")
+        elif method == 'Network.responseReceived':
+            network['status'] = _extract(log, "$.message.message.params.response.status")
+            network['headers'] = _extract(log, "$.message.message.params.headers")
+            network['body'] = json.loads(driver.execute_cdp_cmd('Network.getResponseBody', {}).get('body'))
+        elif method == 'Network.loadingFinished':
+            network['finished'] = _extract(log, "$.timestamp")
+    return networks
+
+
+def compiled(logs, driver):
+    networks = {}
+    for log in logs:
+        event = decode_performance_log(log)
+        if event is not None and event.is_network():
+            network = networks.get(event.request_id)
+            if network is None:
+                network = networks[event.request_id] = NetworkLog()
+            network.append_chrome_devtools_protocol_log(event, driver)
+    WebDriverNetworkCollector().fetch_response_bodies(driver, list(networks.values()))
+    return networks
+
+
+def bench(func, count, rounds=3):
+    best = None
+    for _ in range(rounds):
+        logs = performance_logs(count)
+        start = time.perf_counter()
+        func(logs, _Driver())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    legacy_rate = bench(legacy, count)
+    compiled_rate = bench(compiled, count)
+    print(f"events: {count}")
+    print(f"jsonpath  : {legacy_rate:>12,.0f} events/s")
+    print(f"compiled  : {compiled_rate:>12,.0f} events/s")
+    print(f"speedup   : {compiled_rate / legacy_rate:>12.1f}x")
@@ -0,0 +1,88 @@
+"""
+网络记录内存基准：对比 dict 版 NetworkLog 与 __slots__ 版在不同原始日志保留策略下每个请求占用的字节数
+
+    python -m benchmarks.bench_memory [请求数量]
+"""
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.bench_cdp_decoder import performance_logs
+from selenium_ide_script import cdp
+from selenium_ide_script.cdp import decode_performance_log
+from selenium_ide_script.collector import NetworkLog
+
+EVENTS_PER_REQUEST = 6
+
+
+class LegacyNetworkLog(dict):
+    """ 优化前的实现：dict 子类，保存全部解码后的 CDP 消息 """
+
+    def append(self, event):
+        self.setdefault('logs', []).append(event.log)
+        self.setdefault('request_id', event.request_id)
+        if event.method == 'Network.requestWillBeSent':
+            fields = cdp.request_will_be_sent(event.params)
+            self._set_headers('request_headers', fields.pop('request_headers'))
+            self.update(fields)
+            self.setdefault('timing', {})['request'] = event.timestamp
+        elif event.method in ('Network.requestWillBeSentExtraInfo', 'Network.responseReceivedExtraInfo'):
+            key = 'request_headers' if event.method == 'Network.requestWillBeSentExtraInfo' else 'response_headers'
+            self._set_headers(key, event.params.get('headers'))
+        elif event.method == 'Network.responseReceived':
+            fields = cdp.response_received(event.params)
+            self['response_status_code'] = fields['response_status_code']
+            self._set_headers('response_headers', fields['response_headers'])
+            self.setdefault('timing', {})['response'] = event.timestamp
+        elif event.method == 'Network.loadingFinished':
+            self.update(finished=True, canceled=False, error=None)
+            self.setdefault('timing', {})['finished'] = event.timestamp
+
+    def _set_headers(self, key, headers):
+        if headers and isinstance(headers, dict):
+            self[key] = {**self.get(key, {}), **headers}
+
+
+def legacy(logs):
+    networks = {}
+    for log in logs:
+        event = decode_performance_log(log)
+        networks.setdefault(event.request_id, LegacyNetworkLog()).append(event)
+    return networks
+
+
+def compact(logs, raw_logs):
+    NetworkLog.RAW_LOGS = raw_logs
+    networks = {}
+    for log in logs:
+        event = decode_performance_log(log)
+        network = networks.get(event.request_id)
+        if network is None:
+            network = networks[event.request_id] = NetworkLog()
+        network.append_chrome_devtools_protocol_log(event, None)
+    for network in networks.values():
+        network.discard_logs()
+    return networks
+
+
+def measure(func, count, *args):
+    logs = performance_logs(count * EVENTS_PER_REQUEST)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    networks = func(logs, *args)
+    del logs
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(networks) == count
+    return retained / count
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"requests: {count}")
+    print(f"dict + raw logs            : {measure(legacy, count):>10,.0f} bytes/request")
+    for policy in NetworkLog.RAW_LOG_POLICIES:
+        label = f"slots, raw_logs={policy}"
+        print(f"{label:<26}: {measure(compact, count, policy):>10,.0f} bytes/request")
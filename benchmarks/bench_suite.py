@@ -0,0 +1,190 @@
+"""
+离线基准测试：用回放录制日志的 RecordedWebDriver 测量收集器、命令执行、用例执行和报告写入的开销，不需要浏览器
+
+    python -m benchmarks.bench_suite [--events 10000] [--steps 1000] [--iterations 5]
+    python -m benchmarks.bench_suite --output current.json --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_devtools import DevToolsReplayServer
+from benchmarks.fake_webdriver import RecordedStep, RecordedWebDriver
+from selenium_ide_script.collector import DevToolsNetworkCollector, WebDriverConsoleCollector, \
+    WebDriverNetworkCollector
+from selenium_ide_script.devtools import DevToolsSession
+from selenium_ide_script.selenium_ide import Command, TestCase
+
+SCENARIOS = {}
+
+
+def scenario(unit):
+    def _register(func):
+        SCENARIOS[func.__name__] = (unit, func)
+        return func
+
+    return _register
+
+
+def _click(index):
+    return {'id': f'cmd-{index}', 'command': 'click', 'target': 'css=#submit', 'targets': [], 'value': '',
+            'comment': ''}
+
+
+@scenario('events')
+def network_collector(args):
+    """ 单个步骤 args.events 条 CDP 事件的网络日志收集 """
+    driver = RecordedWebDriver(RecordedStep.load(events=args.events))
+
+    def prepare():
+        driver.next_step()
+        return lambda: WebDriverNetworkCollector(idle_window=0).collect(driver)
+
+    return args.events, prepare
+
+
+@scenario('events')
+def devtools_network_collector(args):
+    """ 单个步骤 args.events 条 CDP 事件经本地 websocket 推送、收集并获取响应体（含 50ms 空闲窗口） """
+    step = RecordedStep.load(events=args.events)
+    server = DevToolsReplayServer(step).start()
+    collector = DevToolsNetworkCollector(DevToolsSession(server.websocket_url).start(), idle_window=0.05)
+
+    def prepare():
+        return lambda: (server.replay(), collector.collect())
+
+    return args.events, prepare
+
+
+@scenario('entries')
+def console_collector(args):
+    """ 单个步骤 1000 条 browser 日志的控制台收集 """
+    step = RecordedStep.load()
+    step.browser = (step.browser * 500)[:1000]
+    driver = RecordedWebDriver(step)
+
+    def prepare():
+        driver.next_step()
+        return lambda: WebDriverConsoleCollector().collect(driver)
+
+    return len(step.browser), prepare
+
+
+@scenario('commands')
+def command_execute(args):
+    """ 单条 click 命令：执行、网络和控制台收集 """
+    driver = RecordedWebDriver(RecordedStep.load())
+    command = Command.compile(_click(0))._asdict()
+    return 1, lambda: (lambda: Command.execute(driver, **command))
+
+
+@scenario('steps')
+def testcase_running(args):
+    """ args.steps 步的用例：执行、判定、截图和附件落盘 """
+    driver = RecordedWebDriver(RecordedStep.load(), latency=args.latency / 1000)
+    test = TestCase('bench', 'bench', [_click(index) for index in range(args.steps)])
+
+    def run():
+        result = test.running('bench.side', 'bench', 'https://test.example.com', driver, 'test')
+        if result.store is not None:
+            result.store.release()
+
+    return args.steps, lambda: run
+
+
+@scenario('steps')
+def testresult_write(args):
+    """ args.steps 步用例结果写入 allure（未注册 allure 插件时只计算本项目的开销） """
+    driver = RecordedWebDriver(RecordedStep.load())
+    test = TestCase('bench', 'bench', [_click(index) for index in range(args.steps)])
+
+    def prepare():
+        return test.running('bench.side', 'bench', 'https://test.example.com', driver, 'test').write
+
+    return args.steps, prepare
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def measure(name, args):
+    unit, factory = SCENARIOS[name]
+    units, prepare = factory(args)
+    prepare()()
+    latencies = []
+    for _ in range(args.iterations):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    run = prepare()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'unit': unit,
+        'throughput': units * len(latencies) / sum(latencies),
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ 吞吐下降、延迟或峰值内存上升超过 tolerance 视为回归 """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput']:.0f} -> {current['throughput']:.0f}")
+        for key in ('p95_ms', 'peak_memory_kb'):
+            if current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {previous[key]:.1f} -> {current[key]:.1f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000, help='network_collector 每个步骤的 CDP 事件数量')
+    parser.add_argument('--steps', type=int, default=1000, help='testcase_running/testresult_write 的步骤数量')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='testcase_running 中每个浏览器动作模拟的耗时（毫秒），用于观察流水线的重叠效果')
+    parser.add_argument('--only', nargs='*', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--output', help='结果写入 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的 JSON 结果比较，出现回归时退出码为 1')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    WebDriverNetworkCollector.IDLE_WINDOW = 0
+    results = {}
+    print(f"{'scenario':<28}{'throughput':>22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KB':>12}")
+    for name in args.only:
+        result = results[name] = measure(name, args)
+        throughput = f"{result['throughput']:,.0f} {result['unit']}/s"
+        print(f"{name:<28}{throughput:>22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['peak_memory_kb']:>12,.0f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+回放录制日志的 DevTools websocket 替身：按 CDP 协议应答 Target 发现/附加、domain 启用和 Network.getResponseBody，
+replay() 把录制步骤中的 performance 日志作为页面会话的 CDP 事件推送给已连接的客户端
+"""
+import json
+import threading
+
+import trio
+from trio_websocket import ConnectionClosed, serve_websocket
+
+from benchmarks.fake_webdriver import RecordedStep
+
+
+class DevToolsReplayServer:
+    TARGET_ID = 'recorded-target'
+    SESSION_ID = 'recorded-session'
+
+    def __init__(self, step: RecordedStep, host='127.0.0.1', port=0):
+        self.step = step
+        self.host = host
+        self.port = port
+        self.events = [log['message']['message'] for log in step.performance]
+        self.received = []
+        self._connections = []
+        self._ready = threading.Event()
+        self._thread = None
+        self._token = None
+        self._cancel_scope = None
+
+    @property
+    def websocket_url(self):
+        return f"ws://{self.host}:{self.port}/devtools/browser/recorded"
+
+    def start(self) -> 'DevToolsReplayServer':
+        self._thread = threading.Thread(target=trio.run, args=(self._main,), name='devtools-replay', daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def replay(self):
+        """ 推送一个步骤的全部网络事件，返回时事件已写入连接 """
+        trio.from_thread.run(self._replay, trio_token=self._token)
+
+    def close(self):
+        if self._cancel_scope is not None:
+            trio.from_thread.run_sync(self._cancel_scope.cancel, trio_token=self._token)
+            self._thread.join(10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def _main(self):
+        with trio.CancelScope() as self._cancel_scope:
+            async with trio.open_nursery() as nursery:
+                server = await nursery.start(serve_websocket, self._handler, self.host, self.port, None)
+                self.port = server.port
+                self._token = trio.lowlevel.current_trio_token()
+                self._ready.set()
+
+    async def _replay(self):
+        for websocket in list(self._connections):
+            for event in self.events:
+                await websocket.send_message(json.dumps({**event, 'sessionId': self.SESSION_ID}))
+
+    async def _handler(self, request):
+        websocket = await request.accept()
+        self._connections.append(websocket)
+        try:
+            while True:
+                message = json.loads(await websocket.get_message())
+                self.received.append(message['method'])
+                for response in self._respond(message):
+                    await websocket.send_message(json.dumps(response))
+        except ConnectionClosed:
+            pass
+        finally:
+            self._connections.remove(websocket)
+
+    def _respond(self, message):
+        method, params = message['method'], message.get('params', {})
+        if method == 'Network.getResponseBody':
+            body = self.step.bodies.get(params.get('requestId'))
+            if body is None:
+                yield {'id': message['id'], 'error': {'code': -32000, 'message': 'No resource with given identifier found'}}
+            else:
+                yield {'id': message['id'], 'result': {'body': body, 'base64Encoded': False}}
+            return
+        yield {'id': message['id'], 'result': {}}
+        if method == 'Target.setDiscoverTargets':
+            yield {'method': 'Target.targetCreated', 'params': {'targetInfo': {'type': 'page', 'targetId': self.TARGET_ID}}}
+        elif method == 'Target.attachToTarget':
+            yield {'method': 'Target.attachedToTarget',
+                   'params': {'sessionId': self.SESSION_ID, 'targetInfo': {'type': 'page', 'targetId': self.TARGET_ID}}}
@@ -0,0 +1,138 @@
+"""
+回放录制日志的 WebDriver 替身：performance/browser/driver 日志、响应体和截图来自 fixtures 目录中的录制文件
+"""
+import base64
+import copy
+import json
+import os
+import time
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class RecordedStep:
+    """ 一个步骤的录制数据，可按 requestId 复制放大到指定的事件数量 """
+
+    def __init__(self, performance, browser=None, driver=None, bodies=None, screenshot=None):
+        self.performance = performance
+        self.browser = browser or []
+        self.driver = driver or []
+        self.bodies = bodies or {}
+        self.screenshot = screenshot
+
+    @classmethod
+    def load(cls, name='orders_step.json', events=None) -> 'RecordedStep':
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            data = json.load(f)
+        step = cls(data['performance'], data.get('browser'), data.get('driver'), data.get('bodies'),
+                   data.get('screenshot'))
+        return step.scale(events) if events else step
+
+    def scale(self, events) -> 'RecordedStep':
+        performance, bodies, copies = [], {}, 0
+        while len(performance) < events:
+            for log in self.performance:
+                log = copy.deepcopy(log)
+                params = log['message']['message'].get('params', {})
+                if 'requestId' in params:
+                    params['requestId'] = f"{params['requestId']}.{copies}"
+                performance.append(log)
+            for request_id, body in self.bodies.items():
+                bodies[f"{request_id}.{copies}"] = body
+            copies += 1
+        return RecordedStep(performance[:events], self.browser, self.driver, bodies, self.screenshot)
+
+    def encoded(self):
+        """ 与 chromedriver 一致，message 字段为 JSON 字符串 """
+        return [{**log, 'message': json.dumps(log['message'])} for log in self.performance]
+
+
+class FakeWebElement:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def click(self):
+        self.driver.act()
+
+    def send_keys(self, *value):
+        self.driver.act()
+
+    def is_displayed(self):
+        return True
+
+    def is_selected(self):
+        return False
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class RecordedWebDriver:
+    """
+    每个浏览器动作（get、click、send_keys）开始一个新步骤，随后 get_log 返回该步骤录制的日志；
+    latency 模拟每个动作在浏览器中的耗时（秒），期间不持有 GIL
+    """
+
+    def __init__(self, step: RecordedStep, session_id='recorded', latency=0.0):
+        self.step = step
+        self.latency = latency
+        self.session_id = session_id
+        self.capabilities = {'browserName': 'chrome'}
+        self.window_handles = ['recorded-window']
+        self.current_window_handle = 'recorded-window'
+        self.switch_to = FakeSwitchTo(self)
+        self.current_url = None
+        self._performance = self.step.encoded()
+        self._pending = {}
+
+    def next_step(self):
+        self._pending = {
+            'performance': [dict(log) for log in self._performance],
+            'browser': [dict(log) for log in self.step.browser],
+            'driver': [dict(log) for log in self.step.driver],
+        }
+
+    def act(self):
+        if self.latency:
+            time.sleep(self.latency)
+        self.next_step()
+
+    def get(self, url):
+        self.current_url = url
+        self.act()
+
+    def get_log(self, log_type):
+        return self._pending.pop(log_type, [])
+
+    def find_element(self, by=None, value=None):
+        return FakeWebElement(self)
+
+    def execute_script(self, script, *args):
+        return [0, FakeWebElement(self)]
+
+    def execute_async_script(self, script, *args):
+        return [0, FakeWebElement(self)]
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == 'Network.getResponseBody':
+            return {'body': self.step.bodies.get(params.get('requestId'), ''), 'base64Encoded': False}
+        if cmd == 'Page.captureScreenshot':
+            return {'data': self.step.screenshot}
+        return {}
+
+    def get_screenshot_as_png(self):
+        return base64.b64decode(self.step.screenshot)
+
+    def maximize_window(self):
+        pass
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
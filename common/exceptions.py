@@ -12,3 +12,7 @@ class CommandExecuteException(SeleniumIDEException):
 
 class WaitSomethingTimeoutException(SeleniumIDEException):
     pass
+
+
+class NotFoundTestException(SeleniumIDEException):
+    pass
@@ -1,14 +1,92 @@
-import json
+import warnings
 
 import pytest
-from selenium.webdriver import DesiredCapabilities, Chrome
 
-from selenium_ide_script.selenium_ide import SeleniumIDE
-from selenium_ide_script.utils import update_chromedriver_version
+from selenium_ide_script.allure import AttachmentStore
+from selenium_ide_script.asserter import AssertionEngine
+from selenium_ide_script.chromedriver import ChromeDriverResolver
+from selenium_ide_script.collector import DevToolsConsoleCollector, NetworkLog, WebDriverConsoleCollector, \
+    WebDriverNetworkCollector, WebDriverPerformanceCollector, WebDriverScreenshotCollector
+from selenium_ide_script.metrics import RunMetrics
+from selenium_ide_script.operable import BaseWebOperation
+from selenium_ide_script.performance import PerformanceBudgets, default_budgets
+from selenium_ide_script.rules import default_rules
+from selenium_ide_script.selenium_ide import SeleniumIDE, TestCase
+from selenium_ide_script.schedule import DurationHistory
+from selenium_ide_script.shard import ShardedRunner
+from selenium_ide_script.trace import TraceRecorder
+from selenium_ide_script.session import WebDriverPool, create_chrome
+
+POOL_KEY = pytest.StashKey[WebDriverPool]()
+MB = 1024 * 1024
 
 
 def pytest_addoption(parser):
     parser.addoption("--host", default='test')
+    parser.addoption("--workers", type=int, default=1, help="parallel: true 的测试套件同时使用的浏览器数量")
+    parser.addoption("--warm", type=int, default=WebDriverPool.WARM_SIZE, help="运行开始前预先启动的浏览器数量")
+    parser.addoption("--recycle-after", type=int, default=WebDriverPool.RECYCLE_AFTER,
+                     help="浏览器会话执行多少个测试后重新启动，0 表示只在崩溃时重新启动")
+    parser.addoption("--processes", type=int, default=ShardedRunner.DEFAULT_PROCESSES,
+                     help="按测试 id 分片到多个进程执行，每个进程使用自己的浏览器")
+    parser.addoption("--shard", type=int, default=None, help="只在当前进程执行 --processes 分片中的第 N 个（从 0 开始），用于复现失败的分片")
+    parser.addoption("--schedule", default=DurationHistory.SCHEDULE, choices=DurationHistory.SCHEDULES,
+                     help="parallel 套件中测试的执行顺序，duration（默认）: 没有历史的测试在前，其余按历史耗时最长优先；"
+                          "file: 按 .side 顺序")
+    parser.addoption("--sharding", default=DurationHistory.SHARDING, choices=DurationHistory.SHARDINGS,
+                     help="多进程分片方式，hash（默认）: 按 id 哈希，--shard 可以复现；"
+                          "duration: 按历史耗时在进程间均衡，分片随历史文件变化")
+    parser.addoption("--side", action="append", default=None,
+                     help=".side 文件或目录（递归查找 *.side），可重复指定，默认 selenium_ide_script.side")
+    parser.addoption("--lazy", action="store_true", default=False, help="收集阶段只解析 .side 文件，每个测试项单独执行")
+    parser.addoption("--screenshot", default=WebDriverScreenshotCollector.POLICY,
+                     choices=WebDriverScreenshotCollector.POLICIES, help="截图策略")
+    parser.addoption("--screenshot-every", type=int, default=WebDriverScreenshotCollector.EVERY_N,
+                     help="every_n_steps 策略下的截图间隔步数")
+    parser.addoption("--screenshot-format", default=WebDriverScreenshotCollector.FORMAT,
+                     choices=list(WebDriverScreenshotCollector.ATTACHMENT_TYPES), help="截图格式")
+    parser.addoption("--wait-engine", default=BaseWebOperation.WAIT_ENGINE, choices=BaseWebOperation.WAIT_ENGINES,
+                     help="元素等待方式：webdriver 轮询或页面内 MutationObserver")
+    parser.addoption("--poll-interval", type=float, default=BaseWebOperation.POLL_INTERVAL, help="元素等待的轮询间隔（秒）")
+    parser.addoption("--console-backend", default=WebDriverConsoleCollector.BACKEND,
+                     choices=WebDriverConsoleCollector.BACKENDS, help="控制台日志收集方式：get_log 轮询或 DevTools 事件订阅")
+    parser.addoption("--console-levels", default=",".join(DevToolsConsoleCollector.LEVELS),
+                     help="devtools 方式下保留的控制台日志级别，逗号分隔")
+    parser.addoption("--network-backend", default=WebDriverNetworkCollector.BACKEND,
+                     choices=WebDriverNetworkCollector.BACKENDS,
+                     help="网络请求收集方式：performance 日志轮询或 DevTools 事件流；"
+                          "devtools 不开启 performance 日志，连接不上 DevTools 时步骤失败")
+    parser.addoption("--raw-network-logs", default=NetworkLog.RAW_LOGS, choices=NetworkLog.RAW_LOG_POLICIES,
+                     help="是否保留请求的原始 CDP 消息")
+    parser.addoption("--chromedriver", default=None, help="chromedriver 路径，指定后不再自动查找和下载")
+    parser.addoption("--chromedriver-mirror", default=ChromeDriverResolver.CFT_MIRROR,
+                     help="chromedriver 下载镜像（Chrome 115 及以后），可以是 http 地址或本地目录")
+    parser.addoption("--chromedriver-offline", action="store_true", default=False,
+                     help="只使用缓存或 PATH 中匹配的 chromedriver，不访问网络")
+    parser.addoption("--attachment-dir", default=None, help="附件临时目录，默认使用系统临时目录")
+    parser.addoption("--attachment-test-budget", type=int, default=AttachmentStore.TEST_BUDGET // MB,
+                     help="单个测试的附件预算（MB）")
+    parser.addoption("--attachment-run-budget", type=int, default=AttachmentStore.RUN_BUDGET // MB,
+                     help="整个运行的附件预算（MB）")
+    parser.addoption("--attachment-max-size", type=int, default=AttachmentStore.MAX_SIZE // 1024,
+                     help="单个附件的大小上限（KB），超出的响应体会被截断")
+    parser.addoption("--assertions", default=None,
+                     help="接口断言 JSON 文件（url/method/types/path/operator/expect/max_latency_ms/optional），"
+                          "代替默认的响应体 code 为 200 的断言")
+    parser.addoption("--budgets", default=None,
+                     help="性能预算 JSON 文件（suite/test/url/types/max_ttfb_ms/max_duration_ms/max_slowest_ms/"
+                          "max_bytes/max_requests/navigation/metrics），超出时步骤失败")
+    parser.addoption("--page-metrics", default=WebDriverPerformanceCollector.POLICY,
+                     choices=WebDriverPerformanceCollector.POLICIES,
+                     help="采集 navigation timing 和 Performance.getMetrics（JS 堆、布局次数）的步骤，默认只在页面跳转后")
+    parser.addoption("--no-pipeline", action="store_true", default=False,
+                     help="关闭流水线执行，每个步骤的附件处理完成后才开始下一个步骤")
+    parser.addoption("--trace-file", default=None,
+                     help="录制每个步骤的网络、控制台、耗时和截图到 zip 轨迹文件，"
+                          "之后可用 python -m selenium_ide_script.trace 离线重新判定")
+    parser.addoption("--metrics-json", default=None, help="运行结束后将每个步骤的分阶段耗时汇总写入 JSON 文件")
+    parser.addoption("--metrics-prometheus", default=None,
+                     help="运行结束后将分阶段耗时写入 Prometheus textfile（node_exporter textfile collector）")
 
 
 @pytest.fixture(scope='session')
@@ -16,17 +94,84 @@ def host(request):
     return request.config.getoption("--host")
 
 
+def pytest_configure(config):
+    processes, shard = config.getoption('--processes'), config.getoption('--shard')
+    if shard is not None and not 0 <= shard < max(1, processes):
+        raise pytest.UsageError(f"--shard {shard} 超出范围，--processes {processes} 时应在 0 到 "
+                                f"{max(1, processes) - 1} 之间")
+    AssertionEngine.FILE = config.getoption('--assertions')
+    TestCase.RULES = default_rules()
+    PerformanceBudgets.FILE = config.getoption('--budgets')
+    TestCase.BUDGETS = default_budgets()
+    WebDriverPerformanceCollector.POLICY = config.getoption('--page-metrics')
+    TestCase.PIPELINE = not config.getoption('--no-pipeline')
+    TraceRecorder.FILE = config.getoption('--trace-file')
+    DurationHistory.SCHEDULE = config.getoption('--schedule')
+    DurationHistory.SHARDING = config.getoption('--sharding')
+    WebDriverPool.WARM_SIZE = config.getoption('--warm')
+    WebDriverPool.RECYCLE_AFTER = config.getoption('--recycle-after')
+    WebDriverScreenshotCollector.POLICY = config.getoption('--screenshot')
+    WebDriverScreenshotCollector.EVERY_N = config.getoption('--screenshot-every')
+    WebDriverScreenshotCollector.FORMAT = config.getoption('--screenshot-format')
+    BaseWebOperation.WAIT_ENGINE = config.getoption('--wait-engine')
+    BaseWebOperation.POLL_INTERVAL = config.getoption('--poll-interval')
+    WebDriverConsoleCollector.BACKEND = config.getoption('--console-backend')
+    DevToolsConsoleCollector.LEVELS = tuple(config.getoption('--console-levels').upper().split(','))
+    WebDriverNetworkCollector.BACKEND = config.getoption('--network-backend')
+    NetworkLog.RAW_LOGS = config.getoption('--raw-network-logs')
+    AttachmentStore.DIRECTORY = config.getoption('--attachment-dir')
+    AttachmentStore.TEST_BUDGET = config.getoption('--attachment-test-budget') * MB
+    AttachmentStore.RUN_BUDGET = config.getoption('--attachment-run-budget') * MB
+    AttachmentStore.MAX_SIZE = config.getoption('--attachment-max-size') * 1024
+    ChromeDriverResolver.CFT_MIRROR = config.getoption('--chromedriver-mirror')
+    ChromeDriverResolver.OFFLINE = config.getoption('--chromedriver-offline')
+    ChromeDriverResolver.EXECUTABLE = config.getoption('--chromedriver')
+    try:
+        ChromeDriverResolver.resolve_default()
+    except (RuntimeWarning, OSError) as e:
+        warnings.warn(f"chromedriver 自动匹配失败，使用 PATH 中的 chromedriver：{e}")
+
+
+def pytest_sessionfinish(session):
+    TraceRecorder.close_current()
+    metrics_json = session.config.getoption('--metrics-json')
+    metrics_prometheus = session.config.getoption('--metrics-prometheus')
+    if metrics_json:
+        RunMetrics.current().write_json(metrics_json)
+    if metrics_prometheus:
+        RunMetrics.current().write_prometheus(metrics_prometheus)
+
+
+def pytest_unconfigure(config):
+    pool = config.stash.get(POOL_KEY, None)
+    if pool is not None:
+        pool.quit()
+
+
+def session_pool(config) -> WebDriverPool:
+    """ 整个运行共享一个预热的会话池，pytest_unconfigure 时关闭 """
+    if POOL_KEY not in config.stash:
+        config.stash[POOL_KEY] = WebDriverPool(create_chrome, config.getoption('--workers')).warm()
+    return config.stash[POOL_KEY]
+
+
 def pytest_generate_tests(metafunc):
-    update_chromedriver_version()
+    if 'testcase' not in metafunc.fixturenames:
+        return
     result = []
-    caps = DesiredCapabilities.CHROME
-    caps['goog:loggingPrefs'] = {'performance': 'ALL'}
-    caps["excludeSwitches"] = ['enable-automation', 'enable-logging']
 
     host = metafunc.config.getoption('--host')
+    processes = metafunc.config.getoption('--processes')
+    shard = metafunc.config.getoption('--shard')
 
-    with Chrome(desired_capabilities=caps) as driver:
-        with open('selenium_ide_script.side', encoding='utf-8') as f:
-            file = SeleniumIDE(**json.load(f))
-            result.extend(file.running(driver, host))
-    metafunc.parametrize("testcase", result)
+    for file in SeleniumIDE.load_all(metafunc.config.getoption('--side') or ['selenium_ide_script.side']):
+        if metafunc.config.getoption('--lazy'):
+            result.extend(file.descriptors(host, session_pool(metafunc.config)))
+        elif processes > 1 or shard is not None:
+            result.extend(file.sharded(host, processes, shard))
+        else:
+            result.extend(file.running(None, host, session_pool(metafunc.config)))
+    if metafunc.config.getoption('--lazy'):
+        metafunc.parametrize("testcase", result, ids=repr)
+    else:
+        metafunc.parametrize("testcase", result)
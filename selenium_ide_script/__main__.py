@@ -0,0 +1,150 @@
+"""
+不经过 pytest 直接执行 .side 文件，每个步骤和测试结束时输出一行 JSON（JSON Lines），最后输出汇总
+
+    python -m selenium_ide_script run tests/ checkout.side --host test
+    python -m selenium_ide_script run tests/ --processes 4 --output results.jsonl --alluredir result
+
+退出码：全部通过为 0，有失败为 1，没有找到测试为 5（与 pytest 一致）
+"""
+import argparse
+import sys
+import time
+import warnings
+
+from selenium_ide_script.allure import AllureReport, AttachmentStore
+from selenium_ide_script.asserter import AssertionEngine
+from selenium_ide_script.chromedriver import ChromeDriverResolver
+from selenium_ide_script.collector import NetworkLog, WebDriverConsoleCollector, WebDriverNetworkCollector, \
+    WebDriverPerformanceCollector, WebDriverScreenshotCollector
+from selenium_ide_script.metrics import RunMetrics
+from selenium_ide_script.performance import PerformanceBudgets, default_budgets
+from selenium_ide_script.rules import default_rules
+from selenium_ide_script.schedule import DurationHistory
+from selenium_ide_script.selenium_ide import SeleniumIDE, TestCase
+from selenium_ide_script.session import WebDriverPool, create_chrome
+from selenium_ide_script.stream import STDOUT, ResultStream
+from selenium_ide_script.trace import TraceRecorder
+
+NO_TESTS = 5
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m selenium_ide_script', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='执行 .side 文件或目录（递归查找 *.side）')
+    run.add_argument('paths', nargs='+', help='.side 文件或目录')
+    run.add_argument('--host', default='test')
+    run.add_argument('--output', default=STDOUT, help='JSON Lines 结果写入的文件，默认标准输出')
+    run.add_argument('--workers', type=int, default=1, help='parallel: true 的测试套件同时使用的浏览器数量')
+    run.add_argument('--processes', type=int, default=1, help='按测试分片到多个进程执行，每个进程使用自己的浏览器')
+    run.add_argument('--shard', type=int, default=None, help='只在当前进程执行 --processes 分片中的第 N 个（从 0 开始）')
+    run.add_argument('--schedule', default=DurationHistory.SCHEDULE, choices=DurationHistory.SCHEDULES,
+                     help='parallel 套件中测试的执行顺序，默认按历史耗时最长优先')
+    run.add_argument('--sharding', default=DurationHistory.SHARDING, choices=DurationHistory.SHARDINGS,
+                     help='多进程分片方式，默认按 id 哈希，--shard 可以复现')
+    run.add_argument('--alluredir', default=None, help='同时写入 allure 结果目录，不指定时不生成报告附件')
+    run.add_argument('--clean-alluredir', action='store_true', default=False)
+    run.add_argument('--screenshot', default=None, choices=WebDriverScreenshotCollector.POLICIES,
+                     help='截图策略，默认在写入 allure 或轨迹时使用 always，否则 never')
+    run.add_argument('--network-backend', default=WebDriverNetworkCollector.BACKEND,
+                     choices=WebDriverNetworkCollector.BACKENDS)
+    run.add_argument('--console-backend', default=WebDriverConsoleCollector.BACKEND,
+                     choices=WebDriverConsoleCollector.BACKENDS)
+    run.add_argument('--raw-network-logs', default=NetworkLog.OFF, choices=NetworkLog.RAW_LOG_POLICIES)
+    run.add_argument('--assertions', default=None, help='接口断言 JSON 文件')
+    run.add_argument('--budgets', default=None, help='性能预算 JSON 文件')
+    run.add_argument('--page-metrics', default=WebDriverPerformanceCollector.POLICY,
+                     choices=WebDriverPerformanceCollector.POLICIES, help='采集 navigation timing 和 JS 堆、布局次数的步骤')
+    run.add_argument('--trace-file', default=None, help='录制轨迹文件（zip），与 pytest 的 --trace-file 相同')
+    run.add_argument('--metrics-json', default=None, help='运行指标写入 JSON 文件')
+    run.add_argument('--chromedriver', default=None, help='chromedriver 路径，指定后不再自动查找和下载')
+    run.add_argument('--chromedriver-mirror', default=ChromeDriverResolver.CFT_MIRROR)
+    run.add_argument('--chromedriver-offline', action='store_true', default=False)
+    return parser
+
+
+def configure(args):
+    reporting = bool(args.alluredir or args.trace_file)
+    TestCase.REPORT = bool(args.alluredir)
+    AttachmentStore.ENABLED = bool(args.alluredir)
+    AssertionEngine.FILE = args.assertions
+    TestCase.RULES = default_rules()
+    PerformanceBudgets.FILE = args.budgets
+    TestCase.BUDGETS = default_budgets()
+    WebDriverPerformanceCollector.POLICY = args.page_metrics
+    TraceRecorder.FILE = args.trace_file
+    DurationHistory.SCHEDULE = args.schedule
+    DurationHistory.SHARDING = args.sharding
+    WebDriverScreenshotCollector.POLICY = args.screenshot or (
+        WebDriverScreenshotCollector.ALWAYS if reporting else WebDriverScreenshotCollector.NEVER)
+    WebDriverNetworkCollector.BACKEND = args.network_backend
+    WebDriverConsoleCollector.BACKEND = args.console_backend
+    NetworkLog.RAW_LOGS = args.raw_network_logs
+    ResultStream.FILE = args.output
+    if args.output != STDOUT:
+        # 多进程执行时子进程以追加方式写入同一个文件，这里先清空上一次的结果
+        open(args.output, 'w').close()
+    ChromeDriverResolver.CFT_MIRROR = args.chromedriver_mirror
+    ChromeDriverResolver.OFFLINE = args.chromedriver_offline
+    ChromeDriverResolver.EXECUTABLE = args.chromedriver
+    try:
+        ChromeDriverResolver.resolve_default()
+    except (RuntimeWarning, OSError) as e:
+        warnings.warn(f"chromedriver 自动匹配失败，使用 PATH 中的 chromedriver：{e}")
+
+
+def run(args) -> int:
+    configure(args)
+    start = time.monotonic()
+    plans = SeleniumIDE.load_all(args.paths)
+    report = AllureReport(args.alluredir, args.clean_alluredir) if args.alluredir else None
+    pool = None
+    tests = passed = 0
+    try:
+        for plan in plans:
+            if args.processes > 1 or args.shard is not None:
+                results = plan.sharded(args.host, args.processes, args.shard)
+            else:
+                if pool is None:
+                    pool = WebDriverPool(create_chrome, args.workers).warm()
+                results = plan.running(None, args.host, pool)
+            for result in results:
+                tests += 1
+                passed += bool(result.result)
+                if report is not None:
+                    report.write(result)
+                elif result.store is not None:
+                    result.store.release()
+    finally:
+        if pool is not None:
+            pool.quit()
+        if report is not None:
+            report.close()
+        TraceRecorder.close_current()
+    stream = ResultStream.current()
+    stream.write({'event': 'summary', 'files': len(plans), 'tests': tests, 'passed': passed, 'failed': tests - passed,
+                  'duration_ms': round((time.monotonic() - start) * 1000, 3)})
+    ResultStream.close_current()
+    if args.metrics_json:
+        RunMetrics.current().write_json(args.metrics_json)
+    if not tests:
+        # 路径写错或目录中没有 .side 文件时不能当作通过，与 pytest 没有收集到测试时的退出码一致
+        print('没有找到可以执行的测试', file=sys.stderr)
+        return NO_TESTS
+    return 0 if passed == tests else 1
+
+
+def main(argv=None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        if args.shard is not None and not 0 <= args.shard < max(1, args.processes):
+            parser.error(f"--shard {args.shard} 超出范围，--processes {args.processes} 时应在 0 到 "
+                         f"{max(1, args.processes) - 1} 之间")
+        return run(args)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
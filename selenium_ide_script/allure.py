@@ -1,11 +1,128 @@
-import allure
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+
+from allure_commons import hookimpl
 from allure_commons.types import AttachmentType
+from allure_commons.utils import now, uuid4
+
+
+class AttachmentStore:
+    """
+    附件存储：附件产生后立即写入临时目录，内存中只保留文件路径
+    """
+    ENABLED = True
+    DIRECTORY = None
+    TEST_BUDGET = 256 * 1024 * 1024
+    RUN_BUDGET = 4 * 1024 * 1024 * 1024
+    MAX_SIZE = 1024 * 1024
+    BINARY_TYPES = (AttachmentType.PNG, AttachmentType.JPG, AttachmentType.GIF, AttachmentType.BMP,
+                    AttachmentType.TIFF, AttachmentType.ZIP, AttachmentType.PDF, 'image/webp')
+    _RUN = None
+    _RUN_LOCK = threading.Lock()
+
+    def __init__(self, directory=None, budget=None, max_size=None, parent: 'AttachmentStore' = None):
+        self.directory = directory
+        self.budget = budget
+        self.max_size = AttachmentStore.MAX_SIZE if max_size is None else max_size
+        self.parent = parent
+        self.used = 0
+        self.paths = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    @classmethod
+    def run(cls) -> 'AttachmentStore':
+        """ 整个运行共享的存储，负责临时目录和运行级预算 """
+        with cls._RUN_LOCK:
+            if AttachmentStore._RUN is None:
+                directory = AttachmentStore.DIRECTORY
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                else:
+                    directory = tempfile.mkdtemp(prefix='selenium_ide_attachments_')
+                    atexit.register(shutil.rmtree, directory, True)
+                AttachmentStore._RUN = cls(directory, AttachmentStore.RUN_BUDGET)
+            return AttachmentStore._RUN
+
+    @classmethod
+    def for_test(cls) -> 'AttachmentStore':
+        run = cls.run()
+        return cls(tempfile.mkdtemp(dir=run.directory), AttachmentStore.TEST_BUDGET, parent=run)
+
+    def reserve(self, size) -> bool:
+        with self._lock:
+            if self.budget and self.used + size > self.budget:
+                return False
+            if self.parent is not None and not self.parent.reserve(size):
+                return False
+            self.used += size
+            return True
+
+    def put(self, content, content_type=AttachmentType.TEXT):
+        """ 写入一个附件，返回 (文件路径, 附件类型)，超出预算时替换为说明文本 """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        if self.max_size and len(content) > self.max_size:
+            if content_type in self.BINARY_TYPES:
+                content = f"附件大小 {len(content)} 字节，超过上限 {self.max_size} 字节，已丢弃".encode('utf-8')
+                content_type = AttachmentType.TEXT
+            else:
+                content = content[:self.max_size] + f"\n...（已截断，原始大小 {len(content)} 字节）".encode('utf-8')
+        if not self.reserve(len(content)):
+            content = f"附件大小 {len(content)} 字节，超出附件预算，已丢弃".encode('utf-8')
+            content_type = AttachmentType.TEXT
+        with self._lock:
+            self._sequence += 1
+            path = os.path.join(self.directory, f"{self._sequence:06d}")
+            self.paths.append(path)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path, content_type
+
+    def release(self):
+        """ 附件已写入报告后删除临时文件并归还预算 """
+        with self._lock:
+            paths, self.paths = self.paths, []
+            used, self.used = self.used, 0
+        if self.parent is not None:
+            with self.parent._lock:
+                self.parent.used -= used
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if self.parent is not None:
+            shutil.rmtree(self.directory, True)
+
+    def __getstate__(self):
+        """ 跨进程传递时只保留文件记录，运行级存储在接收方进程中重新关联 """
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['parent'] = self.parent is not None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        if self.parent:
+            self.parent = AttachmentStore.run()
+            with self.parent._lock:
+                self.parent.used += self.used
+        else:
+            self.parent = None
 
 
 class Step:
-    def __init__(self, title):
+    def __init__(self, title, store: AttachmentStore = None):
         self.title = title
         self.contents = []
+        self.store = store
 
     class _Content:
         def __init__(self, title, content, content_type: AttachmentType = AttachmentType.TEXT, file: bool = None):
@@ -14,35 +131,161 @@ class Step:
             self.content = content
             self.content_type = content_type
 
+        def __getstate__(self):
+            state = self.__dict__.copy()
+            if isinstance(self.content, Future):
+                state['content'] = self.content.result()
+            return state
+
         def __call__(self, *args, **kwargs):
+            content, content_type = self.content, self.content_type
+            if isinstance(content, Future):
+                content = content.result()
+            if isinstance(content, tuple):
+                content, content_type = content
+            if content is None:
+                return
+            import allure
             if self.file:
-                allure.attach.file(self.content, self.title, self.content_type)
+                allure.attach.file(content, self.title, content_type)
             else:
-                allure.attach(self.content, self.title, self.content_type)
+                allure.attach(content, self.title, content_type)
+
+    def add_sub_step(self, title, content, content_type: AttachmentType = AttachmentType.TEXT, file: bool = False,
+                     index: int = None):
+        if self.store is not None and not file:
+            content, content_type, file = self._spill(content, content_type)
+        _content = self._Content(title, content, content_type, file)
+        if index is None:
+            self.contents.append(_content)
+        else:
+            self.contents.insert(index, _content)
+
+    def _spill(self, content, content_type):
+        if content is None:
+            return content, content_type, False
+        if not isinstance(content, Future):
+            path, content_type = self.store.put(content, content_type)
+            return path, content_type, True
+        path = Future()
 
-    def add_sub_step(self, title, content, content_type: AttachmentType = AttachmentType.TEXT, file: bool = False):
-        self.contents.append(self._Content(title, content, content_type, file))
+        def _done(future):
+            try:
+                data = future.result()
+                path.set_result(None if data is None else self.store.put(data, content_type))
+            except Exception as e:
+                path.set_exception(e)
+
+        content.add_done_callback(_done)
+        return path, content_type, True
 
     def write(self):
+        import allure
         with allure.step(self.title):
             for content in self.contents:
                 content()
 
 
 class TestResult:
-    def __init__(self, file_name, suite_name, testcase_name, description=None, result=True):
+    def __init__(self, file_name, suite_name, testcase_name, description=None, result=True,
+                 store: AttachmentStore = None):
         super().__init__()
+        self.store = store
         self.file_name = file_name
         self.suite_name = suite_name
         self.testcase_name = testcase_name
         self.description = description
         self.steps = []
+        self.timings = []
         self.result = result
 
     def write(self):
+        import allure
         allure.dynamic.epic(self.file_name)
         allure.dynamic.story(self.suite_name)
         allure.dynamic.title(self.testcase_name)
         allure.dynamic.description(self.description)
         for step in self.steps:
             step.write()
+        if self.store is not None:
+            self.store.release()
+
+
+class AllureReport:
+    """
+    不经过 pytest 直接生成 allure 结果：注册为 allure 插件接收 TestResult.write() 中的 allure 调用，
+    结果文件写入 report_dir，之后仍可用 allure generate 生成报告
+    """
+
+    def __init__(self, report_dir, clean=False):
+        from allure_commons import plugin_manager
+        from allure_commons.lifecycle import AllureLifecycle
+        from allure_commons.logger import AllureFileLogger
+        self.plugin_manager = plugin_manager
+        self.lifecycle = AllureLifecycle()
+        self.logger = AllureFileLogger(report_dir, clean)
+        plugin_manager.register(self.logger)
+        plugin_manager.register(self)
+
+    def write(self, result: TestResult):
+        from allure_commons.model2 import Status, StatusDetails
+        full_name = f"{result.file_name}::{result.suite_name}::{result.testcase_name}"
+        stop = now()
+        with self.lifecycle.schedule_test_case() as test:
+            test.name = result.testcase_name
+            test.fullName = full_name
+            test.historyId = hashlib.md5(full_name.encode('utf-8')).hexdigest()
+            test.start = stop - int(sum(timing.get('total', 0) for timing in result.timings))
+        result.write()
+        with self.lifecycle.update_test_case() as test:
+            test.status = Status.PASSED if result.result else Status.FAILED
+            if not result.result and isinstance(result.description, str):
+                test.statusDetails = StatusDetails(message=result.description)
+            test.stop = stop
+        self.lifecycle.write_test_case()
+
+    def close(self):
+        self.plugin_manager.unregister(self)
+        self.plugin_manager.unregister(self.logger)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @hookimpl
+    def start_step(self, uuid, title, params):
+        from allure_commons.model2 import Status
+        with self.lifecycle.start_step(uuid=uuid) as step:
+            step.name = title
+            # 步骤标题以判定结果结尾，见 TestCase.running
+            step.status = Status.FAILED if title.endswith('-> False') else Status.PASSED
+
+    @hookimpl
+    def stop_step(self, uuid, exc_type, exc_val, exc_tb):
+        self.lifecycle.stop_step(uuid=uuid)
+
+    @hookimpl
+    def attach_data(self, body, name, attachment_type, extension):
+        self.lifecycle.attach_data(uuid4(), body, name=name, attachment_type=attachment_type, extension=extension)
+
+    @hookimpl
+    def attach_file(self, source, name, attachment_type, extension):
+        self.lifecycle.attach_file(uuid4(), source, name=name, attachment_type=attachment_type, extension=extension)
+
+    @hookimpl
+    def add_title(self, test_title):
+        with self.lifecycle.update_test_case() as test:
+            test.name = test_title
+
+    @hookimpl
+    def add_description(self, test_description):
+        with self.lifecycle.update_test_case() as test:
+            test.description = test_description
+
+    @hookimpl
+    def add_label(self, label_type, labels):
+        from allure_commons.model2 import Label
+        with self.lifecycle.update_test_case() as test:
+            test.labels.extend(Label(name=label_type, value=value) for value in labels)
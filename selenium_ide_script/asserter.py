@@ -1,9 +1,10 @@
 import abc
 import json
+import re
 from json import JSONDecodeError
-from typing import Union, List, Dict, Set, AnyStr, Tuple
+from typing import Union, List, Dict, Set, AnyStr, Tuple, Any, Callable, Iterable, Optional, Pattern
 
-import jsonpath as jsonpath
+from selenium_ide_script.utils import compile_json_path
 
 
 class BaseAsserter(metaclass=abc.ABCMeta):
@@ -17,21 +18,208 @@ class BaseAsserter(metaclass=abc.ABCMeta):
         pass
 
 
+def _number(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value) if any(c in value for c in '.eE') else int(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _equals(actual, expect):
+    """ 类型化比较：数字与数字字符串按数值比较，其余按原始类型比较 """
+    if isinstance(actual, bool) or isinstance(expect, bool):
+        return actual is expect
+    if actual == expect:
+        return True
+    actual, expect = _number(actual), _number(expect)
+    return isinstance(actual, (int, float)) and isinstance(expect, (int, float)) and actual == expect
+
+
+# 按数值比较的运算符，expect 在构造断言时转换为数字
+ORDERED_OPERATORS = ('lt', 'le', 'gt', 'ge')
+
+COMPARATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    'str_eq': lambda actual, expect: str(actual) == str(expect),
+    'eq': _equals,
+    'ne': lambda actual, expect: not _equals(actual, expect),
+    'lt': lambda actual, expect: _number(actual) < _number(expect),
+    'le': lambda actual, expect: _number(actual) <= _number(expect),
+    'gt': lambda actual, expect: _number(actual) > _number(expect),
+    'ge': lambda actual, expect: _number(actual) >= _number(expect),
+    'in': lambda actual, expect: any(_equals(actual, item) for item in expect),
+    'not_in': lambda actual, expect: not any(_equals(actual, item) for item in expect),
+    'contains': lambda actual, expect: expect in actual if isinstance(actual, (str, list, dict)) else False,
+    'regex': lambda actual, expect: isinstance(actual, str) and expect.search(actual) is not None,
+    'exists': lambda actual, expect: (actual is not False and actual is not None) == bool(expect),
+    'type': lambda actual, expect: type(actual).__name__ == expect,
+}
+
+
 class JSONDataAsserter(BaseAsserter):
+    """
+    对 JSON 数据中 jsonpath 取到的值做断言，表达式在构造时编译一次；operator 默认 str_eq 与旧版本的字符串比较一致
+    """
 
-    def __init__(self, expression, expect):
+    def __init__(self, expression, expect, operator='str_eq'):
+        if operator not in COMPARATORS:
+            raise ValueError(f"不支持的比较方式：{operator}")
+        if operator in ORDERED_OPERATORS:
+            expect = _number(expect)
+            if isinstance(expect, bool) or not isinstance(expect, (int, float)):
+                raise ValueError(f"{operator} 的 expect 必须是数字：{expect!r}")
         self.expression = expression
-        self.expect = expect
+        self.operator = operator
+        self.expect = re.compile(expect) if operator == 'regex' and isinstance(expect, str) else expect
+        self._extract = compile_json_path(expression)
+        self._compare = COMPARATORS[operator]
 
-    def asserting(self, data: Union[List, Dict, Set, Tuple, AnyStr], *args, **kwargs) -> bool:
+    @staticmethod
+    def decode(data):
         if isinstance(data, Set):
             data = list(data)
         if isinstance(data, bytes) or isinstance(data, str):
             try:
                 data = json.loads(data)
             except JSONDecodeError:
-                return False
-        data = jsonpath.jsonpath(data, self.expression)
-        if data and len(data) == 1:
-            data = data[0]
-        return str(data) == str(self.expect)
+                return None
+        return data
+
+    def extract(self, data):
+        """ data 需已解码，批量断言时同一份数据只解码一次 """
+        return self._extract(data)
+
+    def compare(self, actual) -> bool:
+        try:
+            return bool(self._compare(actual, self.expect))
+        except TypeError:
+            return False
+
+    def asserting(self, data: Union[List, Dict, Set, Tuple, AnyStr], *args, **kwargs) -> bool:
+        data = self.decode(data)
+        if data is None:
+            return False
+        return self.compare(self.extract(data))
+
+
+class ResponseAssertion:
+    """
+    一条接口断言：url（正则，search 匹配）、method 和资源类型筛选请求，
+    path/operator/expect 断言响应体，max_latency_ms 断言请求耗时；optional 为 true 时取不到值（或值为空）则跳过
+    """
+
+    def __init__(self, name=None, url='.*', method=None, types=('xhr', 'XHR', 'Fetch'), path=None, operator='eq',
+                 expect=None, max_latency_ms=None, optional=False):
+        self.name = name or f"{url} {path or ''} {operator} {expect!r}".strip()
+        self.url = url
+        self.method = method.upper() if method else None
+        self.types = frozenset(types) if types else None
+        self.asserter = JSONDataAsserter(path, expect, operator) if path else None
+        self.max_latency_ms = max_latency_ms
+        self.optional = optional
+
+    @classmethod
+    def of(cls, data: Dict) -> 'ResponseAssertion':
+        return cls(**data)
+
+    def accept(self, network) -> bool:
+        if self.method and (network.get('method') or '').upper() != self.method:
+            return False
+        return self.types is None or network.get('type') in self.types
+
+    def check(self, network, body, values: Dict[str, Any]) -> Optional[str]:
+        """ values 缓存同一响应中已取过的 jsonpath，多条断言共享同一个表达式时只取一次 """
+        if self.max_latency_ms is not None:
+            latency = latency_of(network)
+            if latency is not None and latency > self.max_latency_ms:
+                return f"{self.name}：耗时 {latency:.0f}ms 超过 {self.max_latency_ms}ms"
+        if self.asserter is None:
+            return None
+        if body is None:
+            return None if self.optional else f"{self.name}：响应体不是 JSON"
+        expression = self.asserter.expression
+        if expression not in values:
+            values[expression] = self.asserter.extract(body)
+        actual = values[expression]
+        if self.optional and not actual:
+            return None
+        if not self.asserter.compare(actual):
+            return f"{self.name}：{expression} 实际为 {actual!r}"
+        return None
+
+
+def latency_of(network) -> Optional[float]:
+    """ timing 中的时间均为毫秒 """
+    timing = network.get('timing') or {}
+    start = timing.get('request')
+    end = timing.get('finished', timing.get('response'))
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+class AssertionEngine:
+    """
+    批量接口断言：规则编译一次，URL 模式去重后编译并缓存每个 URL 命中的规则，
+    每个响应体只解码一次、每个 jsonpath 只取一次，一次遍历步骤的全部网络日志
+    """
+    FILE = None
+    URL_CACHE_SIZE = 4096
+
+    def __init__(self, assertions: Iterable[ResponseAssertion]):
+        self.assertions = tuple(assertions)
+        patterns: Dict[str, Pattern] = {}
+        for assertion in self.assertions:
+            patterns.setdefault(assertion.url, re.compile(assertion.url))
+        self._patterns = tuple(patterns.items())
+        self._by_pattern = {url: tuple(assertion for assertion in self.assertions if assertion.url == url)
+                            for url in patterns}
+        self._urls: Dict[str, Tuple[ResponseAssertion, ...]] = {}
+
+    @classmethod
+    def default(cls) -> 'AssertionEngine':
+        """ 与旧版本一致：XHR 响应体中的 code 存在时必须为 200 """
+        return cls([ResponseAssertion('code', types=('xhr', 'XHR'), path='$.code', operator='in',
+                                      expect=['200', 200], optional=True)])
+
+    @classmethod
+    def load(cls, file) -> 'AssertionEngine':
+        """ JSON 文件：断言对象的列表，字段同 ResponseAssertion 的参数 """
+        with open(file, encoding='utf-8') as f:
+            return cls(ResponseAssertion.of(data) for data in json.load(f))
+
+    def matching(self, url) -> Tuple[ResponseAssertion, ...]:
+        matched = self._urls.get(url)
+        if matched is None:
+            matched = tuple(assertion for pattern_url, pattern in self._patterns if pattern.search(url or '')
+                            for assertion in self._by_pattern[pattern_url])
+            if len(self._urls) >= AssertionEngine.URL_CACHE_SIZE:
+                self._urls.clear()
+            self._urls[url] = matched
+        return matched
+
+    def check(self, networks: Iterable) -> List[str]:
+        failures = []
+        for network in networks:
+            if network.get('canceled'):
+                continue
+            assertions = [assertion for assertion in self.matching(network.get('url')) if assertion.accept(network)]
+            if not assertions:
+                continue
+            body = JSONDataAsserter.decode(network.get('response_body'))
+            if not isinstance(body, (dict, list)):
+                body = None
+            values = {}
+            for assertion in assertions:
+                failure = assertion.check(network, body, values)
+                if failure:
+                    failures.append(f"{network.get('method')} {network.get('url')} {failure}")
+        return failures
+
+    def __call__(self, step) -> List[str]:
+        return self.check(step.get('requests') or ())
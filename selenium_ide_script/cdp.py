@@ -0,0 +1,73 @@
+import json
+from typing import Dict, Optional
+
+
+class CDPEvent:
+    """
+    performance 日志中的一条 Chrome DevTools Protocol 事件，只解码一次
+    """
+    __slots__ = ('method', 'request_id', 'timestamp', 'params', 'log')
+
+    def __init__(self, method: str, request_id, timestamp, params: Dict, log: Dict = None):
+        self.method = method
+        self.request_id = request_id
+        self.timestamp = timestamp
+        self.params = params
+        self.log = log
+
+    @property
+    def domain(self):
+        return self.method.split('.', 1)[0]
+
+    def is_network(self):
+        return self.method.startswith('Network.')
+
+    def __repr__(self):
+        return f"CDPEvent({self.method!r}, {self.request_id!r})"
+
+
+def decode_performance_log(log: Dict) -> Optional[CDPEvent]:
+    """ 解码 driver.get_log('performance') 返回的一条日志，log['message'] 会被替换为解码后的 dict """
+    message = log.get('message')
+    if isinstance(message, (str, bytes)):
+        try:
+            message = json.loads(message)
+        except ValueError:
+            return None
+        log['message'] = message
+    if not isinstance(message, dict):
+        return None
+    message = message.get('message')
+    if not isinstance(message, dict):
+        return None
+    params = message.get('params')
+    if not isinstance(params, dict):
+        params = {}
+    return CDPEvent(message.get('method', ''), params.get('requestId'), log.get('timestamp'), params, log)
+
+
+def request_will_be_sent(params: Dict) -> Dict:
+    request = params.get('request', {})
+    return {
+        'source': params.get('documentURL'),
+        'url': request.get('url'),
+        'method': request.get('method'),
+        'request_headers': request.get('headers'),
+        'type': params.get('type'),
+        'post_data': request.get('postData'),
+    }
+
+
+def response_received(params: Dict) -> Dict:
+    response = params.get('response', {})
+    return {
+        'response_status_code': response.get('status'),
+        'response_headers': params.get('headers') or response.get('headers'),
+    }
+
+
+def loading_failed(params: Dict) -> Dict:
+    return {
+        'canceled': params.get('canceled', False),
+        'error': params.get('errorText'),
+    }
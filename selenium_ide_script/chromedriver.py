@@ -0,0 +1,255 @@
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+from typing import Dict, Optional
+from zipfile import BadZipFile, ZipFile
+
+VERSION = re.compile(r'(\d+)\.(\d+)\.(\d+)(?:\.(\d+))?')
+# 从 115 开始 chromedriver 随 Chrome for Testing 发布，下载地址和压缩包结构都不同
+CHROME_FOR_TESTING = 115
+
+
+def build_of(version: str) -> Optional[str]:
+    """ 取版本号的前三段（major.minor.build），同一个 build 的浏览器和驱动可以互相匹配 """
+    match = VERSION.search(version or '')
+    return ".".join(match.groups()[:3]) if match else None
+
+
+class ChromeDriverResolver:
+    """
+    查找与本机 Chrome 匹配的 chromedriver，结果缓存在 FILE 中：
+
+    浏览器和驱动的版本按文件路径、大小和修改时间缓存，文件没有变化时不再启动进程读取版本；
+    已下载的驱动按 build 记录，匹配时直接返回路径，不访问网络。只有浏览器升级后才会查询版本并从镜像下载
+    （115 之前使用 MIRROR，之后使用 Chrome for Testing 的 CFT_RELEASES 和 CFT_MIRROR），
+    这些地址都可以是 http 地址或目录结构相同的本地目录（以 / 结尾）；OFFLINE 时不访问网络
+    """
+    FILE = os.path.join(os.path.expanduser('~'), '.cache', 'selenium_ide_script', 'chromedriver.json')
+    DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'selenium_ide_script', 'chromedriver')
+    MIRROR = 'https://registry.npmmirror.com/-/binary/chromedriver/'
+    CFT_MIRROR = 'https://registry.npmmirror.com/-/binary/chrome-for-testing/'
+    CFT_RELEASES = 'https://googlechromelabs.github.io/chrome-for-testing/'
+    OFFLINE = False
+    TIMEOUT = 30
+    BROWSER = None
+    # 解析得到的驱动路径，create_chrome 使用；为空时由 selenium 自行在 PATH 中查找
+    EXECUTABLE = None
+
+    LINUX_BROWSERS = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+    MAC_BROWSERS = ('/Applications/Google Chrome.app', os.path.expanduser('~/Applications/Google Chrome.app'),
+                    '/Applications/Chromium.app')
+    WINDOWS_REGISTRY_KEYS = ('Software\\Google\\Chrome\\BLBeacon', 'Software\\Chromium\\BLBeacon')
+    _LOCK = threading.Lock()
+
+    def __init__(self, file=None, directory=None, mirror=None, cft_mirror=None, offline=None):
+        self.file = file or ChromeDriverResolver.FILE
+        self.directory = directory or ChromeDriverResolver.DIRECTORY
+        self.mirror = mirror or ChromeDriverResolver.MIRROR
+        self.cft_mirror = cft_mirror or ChromeDriverResolver.CFT_MIRROR
+        self.offline = ChromeDriverResolver.OFFLINE if offline is None else offline
+        self._cache = self._read()
+        self._changed = False
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.file, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        if not self._changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+            temp_file = f"{self.file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self._cache, ensure_ascii=False, indent=2))
+            os.replace(temp_file, self.file)
+            self._changed = False
+        except OSError:
+            pass
+
+    @classmethod
+    def resolve_default(cls) -> str:
+        """ 解析一次并写入 EXECUTABLE，同一进程中重复调用直接返回 """
+        with cls._LOCK:
+            if ChromeDriverResolver.EXECUTABLE is None:
+                ChromeDriverResolver.EXECUTABLE = cls().resolve()
+            return ChromeDriverResolver.EXECUTABLE
+
+    def resolve(self) -> str:
+        try:
+            build = build_of(self.browser_version())
+            if build is None:
+                raise RuntimeWarning('没有找到chrome浏览器版本信息')
+            executable = self._cached_driver(build) or self._path_driver(build) or self._download(build)
+        finally:
+            self.flush()
+        return executable
+
+    # ---- 浏览器 ----
+
+    def browser_version(self) -> Optional[str]:
+        if sys.platform == 'win32' and not ChromeDriverResolver.BROWSER:
+            return self._windows_browser_version()
+        if sys.platform == 'darwin' and not ChromeDriverResolver.BROWSER:
+            return self._mac_browser_version()
+        browser = self.browser_path()
+        if browser is None:
+            raise RuntimeWarning('没有找到chrome浏览器，可以通过 ChromeDriverResolver.BROWSER 指定')
+        return self.version_of('browsers', browser)
+
+    def browser_path(self) -> Optional[str]:
+        if ChromeDriverResolver.BROWSER:
+            return ChromeDriverResolver.BROWSER
+        for name in self.LINUX_BROWSERS:
+            path = shutil.which(name)
+            if path:
+                return os.path.realpath(path)
+        return None
+
+    def _windows_browser_version(self) -> str:
+        import winreg
+        for root in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            for key_name in self.WINDOWS_REGISTRY_KEYS:
+                try:
+                    with winreg.OpenKey(root, key_name) as key:
+                        return winreg.QueryValueEx(key, 'version')[0]
+                except OSError:
+                    continue
+        raise RuntimeWarning('没有找到chrome浏览器注册表信息')
+
+    def _mac_browser_version(self) -> str:
+        import plistlib
+        for app in self.MAC_BROWSERS:
+            try:
+                with open(os.path.join(app, 'Contents', 'Info.plist'), 'rb') as f:
+                    return plistlib.load(f).get('CFBundleShortVersionString')
+            except (OSError, ValueError):
+                continue
+        raise RuntimeWarning('没有找到chrome浏览器，可以通过 ChromeDriverResolver.BROWSER 指定')
+
+    # ---- 驱动 ----
+
+    def _cached_driver(self, build) -> Optional[str]:
+        executable = self._cache.get('drivers', {}).get(build)
+        if executable and build_of(self.version_of('executables', executable)) == build:
+            return executable
+        return None
+
+    def _path_driver(self, build) -> Optional[str]:
+        """ PATH 中已有匹配的驱动时直接使用 """
+        executable = shutil.which(self._driver_name())
+        if executable and build_of(self.version_of('executables', executable)) == build:
+            return self._remember(build, executable)
+        return None
+
+    def _download(self, build) -> str:
+        if self.offline:
+            raise RuntimeWarning(f'离线模式下没有找到与 chrome {build} 匹配的chromedriver')
+        major = int(build.split('.')[0])
+        if major >= CHROME_FOR_TESTING:
+            version = self._fetch(f"{ChromeDriverResolver.CFT_RELEASES}LATEST_RELEASE_{build}").decode().strip()
+            name = self._cft_platform()
+            url = f"{self.cft_mirror}{version}/{name}/chromedriver-{name}.zip"
+        else:
+            version = self._fetch(f"{self.mirror}LATEST_RELEASE_{build}").decode().strip()
+            url = f"{self.mirror}{version}/chromedriver_{self._legacy_platform()}.zip"
+        executable = os.path.join(self.directory, version, self._driver_name())
+        os.makedirs(os.path.dirname(executable), exist_ok=True)
+        try:
+            archive = ZipFile(io.BytesIO(self._fetch(url)))
+        except BadZipFile as e:
+            # 镜像返回错误页面等非 zip 内容时与其他解析失败一样处理，由调用方回退到 PATH 中的驱动
+            raise RuntimeWarning(f'{url} 不是有效的chromedriver压缩包：{e}')
+        with archive:
+            member = next((info for info in archive.infolist()
+                           if os.path.basename(info.filename) == self._driver_name()), None)
+            if member is None:
+                raise RuntimeWarning(f'{url} 中没有找到chromedriver')
+            temp_file = f"{executable}.{os.getpid()}.tmp"
+            with archive.open(member) as source, open(temp_file, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.chmod(temp_file, os.stat(temp_file).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        os.replace(temp_file, executable)
+        # 下载的版本已知，下次启动不需要再执行 --version
+        self._cache.setdefault('executables', {})[executable] = {'signature': self._signature(executable),
+                                                                 'version': version}
+        return self._remember(build, executable)
+
+    def _remember(self, build, executable) -> str:
+        self._cache.setdefault('drivers', {})[build] = executable
+        self._changed = True
+        return executable
+
+    def _fetch(self, url) -> bytes:
+        if not re.match(r'^https?://', url):
+            with open(url, 'rb') as f:
+                return f.read()
+        import requests
+        response = requests.get(url, timeout=self.TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    # ---- 版本缓存 ----
+
+    def version_of(self, kind, path) -> Optional[str]:
+        """ 文件的大小和修改时间没有变化时使用缓存的版本，否则执行 --version """
+        signature = self._signature(path)
+        if signature is None:
+            return None
+        entries = self._cache.setdefault(kind, {})
+        entry = entries.get(path)
+        if entry and entry.get('signature') == signature:
+            return entry.get('version')
+        try:
+            output = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=self.TIMEOUT).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = VERSION.search(output)
+        version = match.group(0) if match else None
+        entries[path] = {'signature': signature, 'version': version}
+        self._changed = True
+        return version
+
+    @staticmethod
+    def _signature(path):
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        return [info.st_size, info.st_mtime_ns]
+
+    # ---- 平台 ----
+
+    @staticmethod
+    def _driver_name() -> str:
+        return 'chromedriver.exe' if sys.platform == 'win32' else 'chromedriver'
+
+    @staticmethod
+    def _arm() -> bool:
+        return platform.machine().lower() in ('arm64', 'aarch64')
+
+    def _legacy_platform(self) -> str:
+        if sys.platform == 'win32':
+            return 'win32'
+        if sys.platform == 'darwin':
+            return 'mac_arm64' if self._arm() else 'mac64'
+        return 'linux64'
+
+    def _cft_platform(self) -> str:
+        if sys.platform == 'win32':
+            return 'win64' if platform.machine().endswith('64') else 'win32'
+        if sys.platform == 'darwin':
+            return 'mac-arm64' if self._arm() else 'mac-x64'
+        return 'linux64'
+
@@ -1,12 +1,28 @@
 import abc
+import base64
+import hashlib
 import json
+import re
+import sys
+import threading
+import time
+from collections import deque
 from json import JSONDecodeError
-from typing import Any, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
+from allure_commons.types import AttachmentType
 from selenium.common import WebDriverException
-from selenium.webdriver.support.wait import WebDriverWait
 
-from selenium_ide_script.utils import json_data_extract
+from common.exceptions import CommandExecuteException
+from selenium_ide_script import cdp
+from selenium_ide_script.cdp import CDPEvent, decode_performance_log
+from selenium_ide_script.devtools import DevToolsSession
+from selenium_ide_script.performance import step_performance
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
 
 
 class BaseCollector(metaclass=abc.ABCMeta):
@@ -14,21 +30,42 @@ class BaseCollector(metaclass=abc.ABCMeta):
         pass
 
 
-class ConsoleLog(dict):
-    @property
-    def level(self):
-        return self.get('level')
+class ConsoleLog:
+    __slots__ = ('level', 'message', 'source', 'timestamp')
 
-    @property
-    def message(self):
-        return self.get('message')
+    def __init__(self, level=None, message=None, source=None, timestamp=0, **kwargs):
+        self.level = _intern(level)
+        self.message = message
+        self.source = _intern(source)
+        self.timestamp = timestamp
 
-    @property
-    def timestamp(self):
-        return self.get('timestamp', 0)
+    def get(self, key, default=None):
+        """ 兼容旧的 dict 访问方式 """
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {'level': self.level, 'message': self.message, 'source': self.source, 'timestamp': self.timestamp}
+
+    def __repr__(self):
+        return f"ConsoleLog({self.to_dict()!r})"
 
 
 class WebDriverConsoleCollector(BaseCollector):
+    WEBDRIVER = 'webdriver'
+    DEVTOOLS = 'devtools'
+    BACKENDS = (WEBDRIVER, DEVTOOLS)
+    BACKEND = WEBDRIVER
+
+    @classmethod
+    def for_driver(cls, driver) -> BaseCollector:
+        """ 按 BACKEND 选择收集器，DevTools 连接失败时回退到 get_log 轮询 """
+        if WebDriverConsoleCollector.BACKEND == cls.DEVTOOLS:
+            try:
+                return DevToolsConsoleCollector.for_driver(driver)
+            except (WebDriverException, OSError):
+                pass
+        return cls()
 
     def collect(self, driver, *args, **kwargs) -> List[ConsoleLog]:
         logs = list()
@@ -38,106 +75,205 @@ class WebDriverConsoleCollector(BaseCollector):
         return logs
 
 
-class NetworkLog(dict):
-
-    def __init__(self):
-        super().__init__()
+class DevToolsConsoleCollector(BaseCollector):
+    """
+    每个会话订阅一次 Runtime.consoleAPICalled / Runtime.exceptionThrown / Log.entryAdded，
+    事件按级别过滤后写入有界环形缓冲区并标记所属步骤，collect() 不再访问浏览器
+    """
+    BUFFER_SIZE = 1000
+    LEVELS = ('SEVERE',)
+    CONSOLE_LEVELS = {
+        'error': 'SEVERE',
+        'assert': 'SEVERE',
+        'warning': 'WARNING',
+        'debug': 'DEBUG',
+        'verbose': 'DEBUG',
+    }
+    _COLLECTORS: Dict[str, 'DevToolsConsoleCollector'] = {}
+    _LOCK = threading.Lock()
+
+    def __init__(self, session: DevToolsSession, levels=None, buffer_size=None):
+        self.levels = frozenset(level.upper() for level in levels or DevToolsConsoleCollector.LEVELS)
+        self.buffer = deque(maxlen=buffer_size or DevToolsConsoleCollector.BUFFER_SIZE)
+        self.step = 0
+        self.session = session
+        session.subscribe(('Runtime', 'Log'),
+                          ('Runtime.consoleAPICalled', 'Runtime.exceptionThrown', 'Log.entryAdded'), self.on_event)
+
+    @classmethod
+    def for_driver(cls, driver) -> 'DevToolsConsoleCollector':
+        """ 连接断开后重新连接并订阅，之前缓冲的日志随旧的收集器丢弃 """
+        with cls._LOCK:
+            collector = cls._COLLECTORS.get(driver.session_id)
+            if collector is None or not collector.session.alive:
+                collector = cls._COLLECTORS[driver.session_id] = cls(DevToolsSession.for_driver(driver))
+            return collector
+
+    @classmethod
+    def close_for(cls, driver):
+        with cls._LOCK:
+            cls._COLLECTORS.pop(driver.session_id, None)
+
+    def on_event(self, message):
+        log = self.to_console_log(message.get('method'), message.get('params', {}))
+        if log.level in self.levels:
+            self.buffer.append((self.step, log))
+
+    @classmethod
+    def to_console_log(cls, method, params) -> ConsoleLog:
+        if method == 'Log.entryAdded':
+            entry = params.get('entry', {})
+            return ConsoleLog(level=cls.CONSOLE_LEVELS.get(entry.get('level'), 'INFO'), message=entry.get('text'),
+                              source=entry.get('source'), timestamp=entry.get('timestamp', 0))
+        if method == 'Runtime.exceptionThrown':
+            details = params.get('exceptionDetails', {})
+            exception = details.get('exception') or {}
+            return ConsoleLog(level='SEVERE', message=exception.get('description') or details.get('text'),
+                              source='javascript', timestamp=params.get('timestamp', 0))
+        message = " ".join(str(arg.get('value', arg.get('description', ''))) for arg in params.get('args', []))
+        return ConsoleLog(level=cls.CONSOLE_LEVELS.get(params.get('type'), 'INFO'), message=message,
+                          source='console-api', timestamp=params.get('timestamp', 0))
+
+    def collect(self, driver=None, *args, **kwargs) -> List[ConsoleLog]:
+        """ 取出当前步骤及之前缓冲的日志，并开始标记下一个步骤 """
+        step = self.step
+        self.step += 1
+        logs = []
+        while self.buffer and self.buffer[0][0] <= step:
+            logs.append(self.buffer.popleft()[1])
+        return logs
 
-    @property
-    def request_id(self):
-        return self.get('request_id')
 
-    @property
-    def source(self):
-        return self.get('source')
+class NetworkLog:
+    """
+    一个请求的网络记录，使用 __slots__ 保存字段，原始 CDP 消息按 RAW_LOGS 策略保留
 
-    @property
-    def url(self):
-        return self.get('url')
+    RAW_LOGS: off 不保留；on_failure 步骤失败时保留（由 TestCase 在判定通过后调用 discard_logs）；always 总是保留
+    """
+    OFF = 'off'
+    ON_FAILURE = 'on_failure'
+    ALWAYS = 'always'
+    RAW_LOG_POLICIES = (OFF, ON_FAILURE, ALWAYS)
+    RAW_LOGS = ON_FAILURE
 
-    @property
-    def method(self):
-        return self.get('method')
+    __slots__ = ('request_id', 'source', 'url', 'method', 'type', '_request_headers', 'post_data', '_timing',
+                 'response_status_code', '_response_headers', 'response_body', 'data_length', 'encoded_data_length',
+                 'finished', 'canceled', 'error', '_logs')
 
-    @property
-    def type(self):
-        return self.get('type')
+    def __init__(self):
+        self.request_id = None
+        self.source = None
+        self.url = None
+        self.method = None
+        self.type = None
+        self._request_headers = None
+        self.post_data = None
+        self._timing = [None, None, None]
+        self.response_status_code = None
+        self._response_headers = None
+        self.response_body = None
+        self.data_length = 0
+        self.encoded_data_length = None
+        self.finished = None
+        self.canceled = None
+        self.error = None
+        self._logs = [] if NetworkLog.RAW_LOGS != NetworkLog.OFF else None
 
     @property
     def request_headers(self):
-        return self.get('request_headers', {})
-
-    @property
-    def post_data(self):
-        return self.get('post_data')
-
-    @property
-    def timing(self):
-        return self.get('timing')
-
-    @property
-    def response_status_code(self):
-        return self.get('response_status_code')
+        return self._request_headers or {}
 
     @property
     def response_headers(self):
-        return self.get('response_headers', {})
-
-    @property
-    def response_body(self):
-        return self.get('response_body')
-
-    @property
-    def finished(self):
-        return self.get('finished')
+        return self._response_headers or {}
 
     @property
-    def canceled(self):
-        return self.get('canceled')
+    def timing(self):
+        request, response, finished = self._timing
+        timing = {}
+        if request is not None:
+            timing['request'] = request
+        if response is not None:
+            timing['response'] = response
+        if finished is not None:
+            timing['finished'] = finished
+        return timing or None
 
     @property
-    def error(self):
-        return self.get('error')
+    def size(self):
+        """ 响应体大小：优先使用已接收的数据长度，其次 Content-Length 和传输大小 """
+        if self.data_length:
+            return self.data_length
+        for key, value in self.response_headers.items():
+            if key.lower() == 'content-length' and str(value).isdigit():
+                return int(value)
+        return self.encoded_data_length or 0
 
     @property
     def logs(self):
-        return self.get('logs')
+        return self._logs
+
+    def discard_logs(self):
+        if self._logs is not None and NetworkLog.RAW_LOGS != NetworkLog.ALWAYS:
+            self._logs = None
+
+    def get(self, key, default=None):
+        """ 兼容旧的 dict 访问方式 """
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {
+            'request_id': self.request_id,
+            'source': self.source,
+            'url': self.url,
+            'method': self.method,
+            'type': self.type,
+            'request_headers': self.request_headers,
+            'post_data': self.post_data,
+            'timing': self.timing,
+            'response_status_code': self.response_status_code,
+            'response_headers': self.response_headers,
+            'response_body': self.response_body,
+            'finished': self.finished,
+            'canceled': self.canceled,
+            'error': self.error,
+            'data_length': self.data_length,
+            'encoded_data_length': self.encoded_data_length,
+        }
 
     def append_chrome_devtools_protocol_log(self, log, driver):
-        method = json_data_extract(log, "$.message.message.method")
-        if method.startswith("Network"):
-            request_id = json_data_extract(log, "$.message.message.params.requestId")
-            self._append_log(log)
-            self._set_request_id(request_id)
-            if method == 'Network.requestWillBeSentExtraInfo':
-                self._request_will_be_sent_extra_info(log)
-            elif method == 'Network.requestWillBeSent':
-                self._request_will_be_sent(log)
-            elif method == 'Network.responseReceived':
-                self._response_received(log, driver)
-            elif method == 'Network.responseReceivedExtraInfo':
-                self._response_received_extra_info(log)
-            elif method == 'Network.loadingFailed':
-                self._loading_failed(log)
-            elif method == 'Network.loadingFinished':
-                self._loading_finished(log)
-
-    def _request_will_be_sent(self, log):
-        self['source'] = json_data_extract(log, "$.message.message.params.documentURL")
-        self['url'] = json_data_extract(log, "$.message.message.params.request.url")
-        self['method'] = json_data_extract(log, "$.message.message.params.request.method")
-        self._set_headers("request_headers", json_data_extract(log, "$.message.message.params.request.headers"))
-        self['type'] = json_data_extract(log, "$.message.message.params.type")
-        self['post_data'] = json_data_extract(log, "$.message.message.params.request.postData")
-        self._set_timing('request', json_data_extract(log, "$.timestamp"))
-
-    def _request_will_be_sent_extra_info(self, log):
-        self._set_headers("request_headers", json_data_extract(log, "$.message.message.params.headers"))
-
-    def _response_received(self, log, driver):
-        self._set_timing('response', json_data_extract(log, "$.timestamp"))
-        self['response_status_code'] = json_data_extract(log, "$.message.message.params.response.status")
-        self._set_headers('response_headers', json_data_extract(log, "$.message.message.params.headers"))
+        event = log if isinstance(log, CDPEvent) else decode_performance_log(log)
+        if event is None or not event.is_network():
+            return
+        if self._logs is not None:
+            self._logs.append(event.log)
+        if not self.request_id:
+            self.request_id = event.request_id
+        handler = self.HANDLERS.get(event.method)
+        if handler:
+            handler(self, event, driver)
+
+    def _request_will_be_sent(self, event, driver=None):
+        fields = cdp.request_will_be_sent(event.params)
+        self._request_headers = self._merge_headers(self._request_headers, fields['request_headers'])
+        self.source = fields['source']
+        self.url = fields['url']
+        self.method = _intern(fields['method'])
+        self.type = _intern(fields['type'])
+        self.post_data = fields['post_data']
+        self._timing[0] = event.timestamp
+
+    def _request_will_be_sent_extra_info(self, event, driver=None):
+        self._request_headers = self._merge_headers(self._request_headers, event.params.get('headers'))
+
+    def _response_received(self, event, driver):
+        fields = cdp.response_received(event.params)
+        self._timing[1] = event.timestamp
+        self.response_status_code = fields['response_status_code']
+        self._response_headers = self._merge_headers(self._response_headers, fields['response_headers'])
+
+    def fetch_response_body(self, driver):
         _response_body = {}
         try:
             _response_body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': self.request_id})
@@ -146,41 +282,45 @@ class NetworkLog(dict):
             _response_body = ";".join(e.args)
         except JSONDecodeError:
             _response_body = _response_body.get('body')
-        self['response_body'] = _response_body
-
-    def _response_received_extra_info(self, log):
-        self._set_headers("response_headers", json_data_extract(log, "$.message.message.params.headers"))
-        self['response_status_code'] = json_data_extract(log, "$.message.message.params.statusCode")
+        self.response_body = _response_body
+        return _response_body
+
+    def _response_received_extra_info(self, event, driver=None):
+        self._response_headers = self._merge_headers(self._response_headers, event.params.get('headers'))
+        self.response_status_code = event.params.get('statusCode')
+
+    def _data_received(self, event, driver=None):
+        self.data_length += event.params.get('dataLength') or 0
+
+    def _loading_finished(self, event, driver=None):
+        self.finished = True
+        self.canceled = False
+        self.error = None
+        self.encoded_data_length = event.params.get('encodedDataLength')
+        self._timing[2] = event.timestamp
+
+    def _loading_failed(self, event, driver=None):
+        self.finished = True
+        fields = cdp.loading_failed(event.params)
+        self.canceled = fields['canceled']
+        self.error = fields['error']
+        self._timing[2] = event.timestamp
+
+    HANDLERS = {
+        'Network.requestWillBeSent': _request_will_be_sent,
+        'Network.requestWillBeSentExtraInfo': _request_will_be_sent_extra_info,
+        'Network.responseReceived': _response_received,
+        'Network.responseReceivedExtraInfo': _response_received_extra_info,
+        'Network.dataReceived': _data_received,
+        'Network.loadingFinished': _loading_finished,
+        'Network.loadingFailed': _loading_failed,
+    }
 
-    def _loading_finished(self, log):
-        self['finished'] = True
-        self['canceled'] = False
-        self['error'] = None
-        self._set_timing('finished', json_data_extract(log, "$.timestamp"))
-
-    def _loading_failed(self, log):
-        self['finished'] = True
-        self['canceled'] = json_data_extract(log, '$.message.message.params.canceled')
-        self['error'] = json_data_extract(log, '$.message.message.params.errorText')
-        self._set_timing('finished', json_data_extract(log, "$.timestamp"))
-
-    def _set_headers(self, key, headers):
+    @staticmethod
+    def _merge_headers(current, headers):
         if headers and isinstance(headers, dict):
-            self[key] = {**self.get(key, {}), **headers}
-
-    def _set_request_id(self, request_id):
-        if not self.request_id:
-            self['request_id'] = request_id
-
-    def _append_log(self, log):
-        if not self.get('logs'):
-            self['logs'] = []
-        self['logs'].append(log)
-
-    def _set_timing(self, key, value):
-        if not self.get('timing'):
-            self['timing'] = {}
-        self['timing'][key] = value
+            return {**current, **headers} if current else dict(headers)
+        return current
 
     def __eq__(self, other):
         if isinstance(other, NetworkLog):
@@ -190,36 +330,397 @@ class NetworkLog(dict):
         else:
             return other.__eq__(self)
 
+    def __repr__(self):
+        return f"NetworkLog({self.method} {self.url} {self.response_status_code})"
+
+
+class ResponseBodyPolicy:
+    """
+    响应体获取策略：按资源类型、URL 和大小过滤需要调用 Network.getResponseBody 的请求
+    """
+    RESOURCE_TYPES = ('XHR',)
+    MAX_SIZE = 2 * 1024 * 1024
+
+    def __init__(self, resource_types=None, include=None, exclude=None, max_size=None):
+        self.resource_types = {t.lower() for t in (resource_types or ResponseBodyPolicy.RESOURCE_TYPES)}
+        self.include = [re.compile(pattern) for pattern in include or []]
+        self.exclude = [re.compile(pattern) for pattern in exclude or []]
+        self.max_size = ResponseBodyPolicy.MAX_SIZE if max_size is None else max_size
+
+    def accept(self, network: NetworkLog) -> bool:
+        if not network.finished or network.canceled or network.error:
+            return False
+        if (network.type or '').lower() not in self.resource_types:
+            return False
+        url = network.url or ''
+        if self.include and not any(pattern.search(url) for pattern in self.include):
+            return False
+        if any(pattern.search(url) for pattern in self.exclude):
+            return False
+        return not self.max_size or network.size <= self.max_size
+
 
 class WebDriverNetworkCollector(BaseCollector):
+    """
+    收集一个步骤产生的网络请求：在途请求全部结束且持续 IDLE_WINDOW 秒没有新的网络事件时认为页面空闲；
+    动作之后 FIRST_ACTIVITY_WINDOW 秒内（不超过 IDLE_WINDOW）没有任何网络事件时认为该步骤没有触发请求
+    """
+    WEBDRIVER = 'webdriver'
+    DEVTOOLS = 'devtools'
+    BACKENDS = (WEBDRIVER, DEVTOOLS)
+    BACKEND = WEBDRIVER
     LOG_TYPE = "performance"
     TIMEOUT = 10
+    IDLE_WINDOW = 0.25
+    FIRST_ACTIVITY_WINDOW = 0.05
+    MIN_POLL_INTERVAL = 0.02
+    MAX_POLL_INTERVAL = 0.2
+    IGNORED_TYPES = ('EventSource', 'WebSocket')
 
-    def __init__(self):
+    BODY_POLICY = ResponseBodyPolicy()
+
+    def __init__(self, timeout=None, idle_window=None, min_poll_interval=None, max_poll_interval=None,
+                 body_policy: ResponseBodyPolicy = None, first_activity_window=None):
         self.networks = {}
+        self.body_policy = body_policy or WebDriverNetworkCollector.BODY_POLICY
+        self.in_flight = set()
+        self.timeout = WebDriverNetworkCollector.TIMEOUT if timeout is None else timeout
+        self.idle_window = WebDriverNetworkCollector.IDLE_WINDOW if idle_window is None else idle_window
+        self.min_poll_interval = min_poll_interval or WebDriverNetworkCollector.MIN_POLL_INTERVAL
+        self.max_poll_interval = max_poll_interval or WebDriverNetworkCollector.MAX_POLL_INTERVAL
+        self.first_activity_window = WebDriverNetworkCollector.FIRST_ACTIVITY_WINDOW \
+            if first_activity_window is None else first_activity_window
+
+    @classmethod
+    def for_driver(cls, driver) -> BaseCollector:
+        """
+        按 BACKEND 选择收集器。devtools 后端启动浏览器时没有开启 performance 日志，无法回退到轮询，
+        DevTools 连接失败时直接报错
+        """
+        if WebDriverNetworkCollector.BACKEND == cls.DEVTOOLS:
+            try:
+                return DevToolsNetworkCollector.for_driver(driver)
+            except (WebDriverException, OSError) as e:
+                raise CommandExecuteException(f"DevTools 连接失败，无法使用 --network-backend devtools 收集网络请求："
+                                              f"{getattr(e, 'msg', None) or e}；请改用 --network-backend webdriver")
+        return cls()
 
     def collect(self, driver, *args, **kwargs) -> List[NetworkLog]:
-        data = WebDriverWait(driver, self.TIMEOUT).until(self)
-        return [] if data == -1 else data
-
-    def __call__(self, driver, *args, **kwargs):
-        _logs = driver.get_log(self.LOG_TYPE)
-        if len(_logs) == 0:
-            data = self.networks.copy()
-            self.networks.clear()
-            return data.values() if len(data.values()) > 0 else -1
-        for _log in _logs:
-            _log['message'] = json.loads(_log.get("message"))
-            method = json_data_extract(_log, "$.message.message.method")
-            if method.startswith("Network"):
-                request_id = json_data_extract(_log, "$.message.message.params.requestId")
-                network = self.networks.get(request_id) if request_id in self.networks.keys() else NetworkLog()
-                network.append_chrome_devtools_protocol_log(_log, driver)
-                self.networks[request_id] = network
-        return False
-
-
-class WebDriverScreenshotCollector:
+        start = last_activity = time.monotonic()
+        interval = self.min_poll_interval
+        while True:
+            if self(driver):
+                last_activity = time.monotonic()
+                interval = self.min_poll_interval
+            else:
+                interval = min(interval * 2, self.max_poll_interval)
+            now = time.monotonic()
+            idle = now - last_activity
+            # 还没有任何网络事件时只等待较短的窗口：点击异步发出的请求通常在几毫秒后才出现在日志中
+            window = self.idle_window if self.networks else min(self.idle_window, self.first_activity_window)
+            if not self.in_flight and idle >= window:
+                break
+            if now - start >= self.timeout:
+                break
+            wait = interval if self.in_flight else min(interval, window - idle)
+            time.sleep(max(0.0, min(wait, self.timeout - (now - start))))
+        data = list(self.networks.values())
+        self.networks.clear()
+        self.in_flight.clear()
+        self.fetch_response_bodies(driver, data)
+        return data
+
+    def fetch_response_bodies(self, driver, networks: List[NetworkLog]):
+        """ 页面空闲后统一获取符合策略的响应体，静态资源不再逐个请求 """
+        for network in networks:
+            if self.body_policy.accept(network):
+                network.fetch_response_body(driver)
+
+    def __call__(self, driver, *args, **kwargs) -> int:
+        """ 拉取一次 performance 日志，返回本次处理的网络事件数量 """
+        count = 0
+        for _log in driver.get_log(self.LOG_TYPE):
+            event = decode_performance_log(_log)
+            if event is not None and event.is_network():
+                count += 1
+                self._track(event)
+                network = self.networks.get(event.request_id)
+                if network is None:
+                    network = self.networks[event.request_id] = NetworkLog()
+                network.append_chrome_devtools_protocol_log(event, driver)
+        return count
+
+    def _track(self, event):
+        if event.method == 'Network.requestWillBeSent':
+            if event.params.get('type') not in self.IGNORED_TYPES:
+                self.in_flight.add(event.request_id)
+        elif event.method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            self.in_flight.discard(event.request_id)
+
+
+class _SessionCommands:
+    """ 把 execute_cdp_cmd 转发到 DevTools 连接上事件所属的页面会话，供 NetworkLog.fetch_response_body 使用 """
+
+    def __init__(self, session: DevToolsSession, session_id):
+        self.session = session
+        self.session_id = session_id
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self.session.execute(cmd, cmd_args, self.session_id)
+
+
+class DevToolsNetworkCollector(WebDriverNetworkCollector):
+    """
+    通过 DevTools websocket 订阅 Network.* 事件，事件到达时即写入当前步骤的缓冲区，collect() 只等待页面空闲，
+    不再轮询 performance 日志；响应体通过同一个连接向事件所属的页面会话获取
+    """
+    _COLLECTORS: Dict[str, 'DevToolsNetworkCollector'] = {}
+    _LOCK = threading.Lock()
+
+    def __init__(self, session: DevToolsSession, timeout=None, idle_window=None,
+                 body_policy: ResponseBodyPolicy = None):
+        super().__init__(timeout, idle_window, body_policy=body_policy)
+        self.session = session
+        self.sessions: Dict[str, str] = {}
+        self.last_activity = 0.0
+        self._condition = threading.Condition()
+        session.subscribe(('Network',), tuple(NetworkLog.HANDLERS), self.on_event)
+
+    @classmethod
+    def for_driver(cls, driver) -> 'DevToolsNetworkCollector':
+        with cls._LOCK:
+            collector = cls._COLLECTORS.get(driver.session_id)
+            if collector is None or not collector.session.alive:
+                collector = cls._COLLECTORS[driver.session_id] = cls(DevToolsSession.for_driver(driver))
+            return collector
+
+    @classmethod
+    def close_for(cls, driver):
+        with cls._LOCK:
+            cls._COLLECTORS.pop(driver.session_id, None)
+
+    @classmethod
+    def clear_for(cls, driver):
+        """ 丢弃已缓冲的事件，用于会话复用前的清理 """
+        collector = cls._COLLECTORS.get(driver.session_id)
+        if collector is not None:
+            collector.clear()
+
+    def on_event(self, message):
+        params = message.get('params', {})
+        timestamp = params.get('timestamp')
+        # CDP 事件的 timestamp 为秒，performance 日志为毫秒，统一为毫秒
+        event = CDPEvent(message.get('method'), params.get('requestId'),
+                         None if timestamp is None else timestamp * 1000, params, {'message': message})
+        with self._condition:
+            self._track(event)
+            network = self.networks.get(event.request_id)
+            if network is None:
+                network = self.networks[event.request_id] = NetworkLog()
+                self.sessions[event.request_id] = message.get('sessionId')
+            network.append_chrome_devtools_protocol_log(event, None)
+            self.last_activity = time.monotonic()
+            self._condition.notify_all()
+
+    def collect(self, driver=None, *args, **kwargs) -> List[NetworkLog]:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                idle = now - max(self.last_activity, start)
+                if (not self.in_flight and idle >= self.idle_window) or now >= deadline:
+                    break
+                self._condition.wait(min(deadline, now + self.idle_window - idle) - now
+                                     if not self.in_flight else deadline - now)
+            data = list(self.networks.values())
+            sessions = self.sessions
+            self.networks, self.sessions = {}, {}
+            self.in_flight.clear()
+        self.fetch_response_bodies(sessions, data)
+        return data
+
+    def fetch_response_bodies(self, sessions: Dict[str, str], networks: List[NetworkLog]):
+        commands = {}
+        for network in networks:
+            if self.body_policy.accept(network):
+                session_id = sessions.get(network.request_id)
+                if session_id not in commands:
+                    commands[session_id] = _SessionCommands(self.session, session_id)
+                network.fetch_response_body(commands[session_id])
+
+    def clear(self):
+        with self._condition:
+            self.networks, self.sessions = {}, {}
+            self.in_flight.clear()
+
+    def __call__(self, driver=None, *args, **kwargs) -> int:
+        """ 事件由后台线程推送，不需要拉取 """
+        return 0
+
+
+class WebDriverScreenshotCollector(BaseCollector):
+    """
+    截图收集器：按策略通过 CDP Page.captureScreenshot 截图，解码和去重在后台线程完成
+    """
+    ALWAYS = 'always'
+    ON_FAILURE = 'on_failure'
+    EVERY_N_STEPS = 'every_n_steps'
+    ON_NAVIGATION = 'on_navigation'
+    NEVER = 'never'
+    POLICIES = (ALWAYS, ON_FAILURE, EVERY_N_STEPS, ON_NAVIGATION, NEVER)
+
+    ATTACHMENT_TYPES = {
+        'png': AttachmentType.PNG,
+        'jpeg': AttachmentType.JPG,
+        'webp': 'image/webp',
+    }
+
+    POLICY = ALWAYS
+    EVERY_N = 5
+    FORMAT = 'png'
+    QUALITY = 80
+    CLIP = None
+    SCALE = 1
+    EXECUTOR = None
+
+    def __init__(self, policy=None, every_n=None, image_format=None, quality=None, clip=None, scale=None):
+        self.policy = policy or WebDriverScreenshotCollector.POLICY
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"未知的截图策略：{self.policy}")
+        self.every_n = every_n or WebDriverScreenshotCollector.EVERY_N
+        self.image_format = (image_format or WebDriverScreenshotCollector.FORMAT).lower()
+        if self.image_format not in self.ATTACHMENT_TYPES:
+            raise ValueError(f"不支持的截图格式：{self.image_format}")
+        self.quality = WebDriverScreenshotCollector.QUALITY if quality is None else quality
+        self.clip = clip or WebDriverScreenshotCollector.CLIP
+        self.scale = scale or WebDriverScreenshotCollector.SCALE
+        self.steps = 0
+        self._last_digest = None
+
+    @property
+    def attachment_type(self):
+        return self.ATTACHMENT_TYPES[self.image_format]
+
     @staticmethod
     def get_screenshot_as_png(driver):
         return driver.get_screenshot_as_png()
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        if WebDriverScreenshotCollector.EXECUTOR is None:
+            WebDriverScreenshotCollector.EXECUTOR = ThreadPoolExecutor(max_workers=1,
+                                                                       thread_name_prefix='screenshot')
+        return WebDriverScreenshotCollector.EXECUTOR
+
+    def should_capture(self, result=True, navigated=False) -> bool:
+        if self.policy == self.NEVER:
+            return False
+        if self.policy == self.ALWAYS:
+            return True
+        if self.policy == self.ON_FAILURE:
+            return not result
+        if self.policy == self.EVERY_N_STEPS:
+            return not result or (self.steps - 1) % self.every_n == 0
+        return navigated or not result
+
+    def collect(self, driver, result=True, navigated=False, *args, **kwargs) -> Optional[Future]:
+        """ 返回解码后图片字节的 Future，不需要截图或与上一张相同时结果为 None """
+        self.steps += 1
+        if not self.should_capture(result, navigated):
+            return None
+        try:
+            data = driver.execute_cdp_cmd('Page.captureScreenshot', self._params(driver)).get('data')
+        except WebDriverException:
+            return None
+        return self.executor().submit(self._decode, data)
+
+    def _params(self, driver):
+        params = {'format': self.image_format}
+        if self.image_format != 'png':
+            params['quality'] = self.quality
+        clip = self.clip
+        if not clip and self.scale != 1:
+            viewport = driver.execute_cdp_cmd('Page.getLayoutMetrics', {}).get('cssLayoutViewport', {})
+            clip = {'x': viewport.get('pageX', 0), 'y': viewport.get('pageY', 0),
+                    'width': viewport.get('clientWidth'), 'height': viewport.get('clientHeight')}
+        if clip:
+            params['clip'] = {'scale': self.scale, **clip}
+        return params
+
+    def _decode(self, data):
+        if not data:
+            return None
+        digest = hashlib.sha1(data.encode()).digest()
+        if digest == self._last_digest:
+            return None
+        self._last_digest = digest
+        return base64.b64decode(data)
+
+
+class WebDriverPerformanceCollector(BaseCollector):
+    """
+    步骤的前端性能指标：网络部分由已收集的 NetworkLog 计算，不访问浏览器；
+    页面部分（navigation timing 和 Performance.getMetrics）按 POLICY 采集，默认只在发生导航的步骤采集
+    """
+    ALWAYS = 'always'
+    ON_NAVIGATION = 'on_navigation'
+    NEVER = 'never'
+    POLICIES = (ALWAYS, ON_NAVIGATION, NEVER)
+    POLICY = ON_NAVIGATION
+    METRICS = ('JSHeapUsedSize', 'JSHeapTotalSize', 'Nodes', 'Documents', 'LayoutCount', 'RecalcStyleCount',
+               'LayoutDuration', 'RecalcStyleDuration', 'ScriptDuration', 'TaskDuration')
+    NAVIGATION_SCRIPT = """
+        const entry = performance.getEntriesByType('navigation')[0];
+        if (!entry) return null;
+        const since = (end) => end > 0 ? end - entry.startTime : null;
+        return {
+            url: entry.name, type: entry.type,
+            ttfb: entry.responseStart - entry.requestStart,
+            response: since(entry.responseEnd),
+            dom_interactive: since(entry.domInteractive),
+            dom_content_loaded: since(entry.domContentLoadedEventEnd),
+            load: since(entry.loadEventEnd),
+            transfer_size: entry.transferSize,
+        };
+    """
+    _ENABLED = set()
+    _LOCK = threading.Lock()
+
+    def __init__(self, policy=None):
+        self.policy = policy or WebDriverPerformanceCollector.POLICY
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"未知的性能指标采集策略：{self.policy}")
+
+    @classmethod
+    def close_for(cls, driver):
+        with cls._LOCK:
+            cls._ENABLED.discard(driver.session_id)
+
+    def collect(self, driver, networks=(), navigated=False, *args, **kwargs) -> Dict:
+        navigation = metrics = None
+        if self.policy == self.ALWAYS or (self.policy == self.ON_NAVIGATION and navigated):
+            navigation = self.navigation_timing(driver)
+            metrics = self.page_metrics(driver)
+        return step_performance(networks, navigation, metrics)
+
+    def navigation_timing(self, driver) -> Optional[Dict]:
+        try:
+            timing = driver.execute_script(self.NAVIGATION_SCRIPT)
+        except WebDriverException:
+            return None
+        return timing if isinstance(timing, dict) else None
+
+    def page_metrics(self, driver) -> Optional[Dict]:
+        try:
+            with self._LOCK:
+                enable = driver.session_id not in self._ENABLED
+                self._ENABLED.add(driver.session_id)
+            if enable:
+                driver.execute_cdp_cmd('Performance.enable', {})
+            result = driver.execute_cdp_cmd('Performance.getMetrics', {})
+        except WebDriverException:
+            return None
+        metrics = {metric.get('name'): metric.get('value') for metric in (result or {}).get('metrics', ())
+                   if metric.get('name') in self.METRICS}
+        return metrics or None
@@ -0,0 +1,184 @@
+import itertools
+import json
+import threading
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from selenium.common import WebDriverException
+
+
+class DevToolsSession:
+    """
+    浏览器 DevTools websocket 连接：后台线程接收 CDP 事件，按事件名分发给订阅者
+
+    连接浏览器级别的端点，通过 Target.setDiscoverTargets 发现页面并以 flatten 模式附加，
+    订阅时声明的 domain 会在每个附加的页面上启用。trio 在第一次建立连接时才导入，只使用 get_log 时不加载
+    """
+    CONNECT_TIMEOUT = 10
+    MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+    TARGET_TYPES = ('page', 'iframe')
+    _SESSIONS: Dict[str, 'DevToolsSession'] = {}
+    # 连接失败的 WebDriver 会话及失败原因，之后的步骤直接失败，不再每次等待 CONNECT_TIMEOUT
+    _FAILURES: Dict[str, str] = {}
+    _LOCK = threading.Lock()
+
+    def __init__(self, websocket_url):
+        self.websocket_url = websocket_url
+        self._ids = itertools.count(1)
+        self._subscribers = []
+        self._domains: List[str] = []
+        self._targets = set()
+        self._sessions = set()
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = None
+        self._token = None
+        self._cancel_scope = None
+        self._websocket = None
+        self._pending: Dict[int, Future] = {}
+
+    @classmethod
+    def for_driver(cls, driver) -> 'DevToolsSession':
+        """ 每个 WebDriver 会话共享一个 DevTools 连接，连接失败后该会话不再重试 """
+        with cls._LOCK:
+            failure = cls._FAILURES.get(driver.session_id)
+            if failure is not None:
+                raise WebDriverException(failure)
+            session = cls._SESSIONS.get(driver.session_id)
+            if session is None or not session.alive:
+                try:
+                    session = cls._SESSIONS[driver.session_id] = cls(cls.websocket_url_of(driver)).start()
+                except (WebDriverException, OSError) as e:
+                    cls._SESSIONS.pop(driver.session_id, None)
+                    cls._FAILURES[driver.session_id] = getattr(e, 'msg', None) or str(e)
+                    raise
+            return session
+
+    @classmethod
+    def close_for(cls, driver):
+        with cls._LOCK:
+            session = cls._SESSIONS.pop(driver.session_id, None)
+            cls._FAILURES.pop(driver.session_id, None)
+        if session is not None:
+            session.close()
+
+    @classmethod
+    def websocket_url_of(cls, driver) -> str:
+        options = driver.capabilities.get('goog:chromeOptions') or driver.capabilities.get('ms:edgeOptions') or {}
+        debugger_address = options.get('debuggerAddress')
+        if not debugger_address:
+            raise WebDriverException('当前浏览器没有提供 DevTools 调试地址')
+        with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=cls.CONNECT_TIMEOUT) as f:
+            return json.loads(f.read()).get('webSocketDebuggerUrl')
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def sessions(self) -> Tuple[str, ...]:
+        """ 当前附加的页面会话 id """
+        return tuple(self._sessions)
+
+    def execute(self, method, params=None, session_id=None, timeout=None) -> dict:
+        """ 同步执行一条 CDP 命令并返回 result，不能在订阅回调（后台线程）中调用 """
+        import trio
+        if not self.alive or self._token is None:
+            raise WebDriverException('DevTools 连接已关闭')
+        message_id = next(self._ids)
+        future = self._pending[message_id] = Future()
+        try:
+            trio.from_thread.run(self._send, method, params, session_id, message_id, trio_token=self._token)
+            response = future.result(timeout or self.CONNECT_TIMEOUT)
+        except (FutureTimeoutError, trio.RunFinishedError):
+            raise WebDriverException(f'{method} 没有响应')
+        finally:
+            self._pending.pop(message_id, None)
+        if 'error' in response:
+            raise WebDriverException(response['error'].get('message'))
+        return response.get('result', {})
+
+    def subscribe(self, domains: Iterable[str], methods: Iterable[str], callback: Callable[[dict], None]):
+        """ 订阅事件，callback 在后台线程中以完整的 CDP 消息调用，需要自行保证线程安全 """
+        import trio
+        self._subscribers.append((frozenset(methods), callback))
+        domains = [domain for domain in domains if domain not in self._domains]
+        self._domains.extend(domains)
+        if domains and self.alive and self._token is not None:
+            trio.from_thread.run(self._enable, tuple(self._sessions), domains, trio_token=self._token)
+
+    def start(self) -> 'DevToolsSession':
+        import trio
+        self._thread = threading.Thread(target=trio.run, args=(self._main,), name='devtools', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(self.CONNECT_TIMEOUT):
+            raise WebDriverException(f'连接 DevTools 超时：{self.websocket_url}')
+        if self._error is not None:
+            raise WebDriverException(f'连接 DevTools 失败：{self._error!r}')
+        return self
+
+    def close(self):
+        import trio
+        if self.alive and self._cancel_scope is not None:
+            try:
+                trio.from_thread.run_sync(self._cancel_scope.cancel, trio_token=self._token)
+            except trio.RunFinishedError:
+                pass
+            self._thread.join(self.CONNECT_TIMEOUT)
+
+    async def _main(self):
+        import trio
+        from trio_websocket import open_websocket_url
+        try:
+            with trio.CancelScope() as self._cancel_scope:
+                async with open_websocket_url(self.websocket_url, max_message_size=self.MAX_MESSAGE_SIZE) as websocket:
+                    self._websocket = websocket
+                    self._token = trio.lowlevel.current_trio_token()
+                    await self._send('Target.setDiscoverTargets', {'discover': True})
+                    self._ready.set()
+                    while True:
+                        await self._dispatch(json.loads(await websocket.get_message()))
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    async def _send(self, method, params=None, session_id=None, message_id=None):
+        message = {'id': message_id or next(self._ids), 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        await self._websocket.send_message(json.dumps(message))
+
+    async def _enable(self, session_ids, domains):
+        for session_id in session_ids:
+            for domain in domains:
+                await self._send(f'{domain}.enable', {}, session_id)
+
+    async def _dispatch(self, message):
+        method = message.get('method')
+        if not method:
+            future = self._pending.get(message.get('id'))
+            if future is not None:
+                future.set_result(message)
+            return
+        params = message.get('params', {})
+        if method == 'Target.targetCreated':
+            target = params.get('targetInfo', {})
+            if target.get('type') in self.TARGET_TYPES and target.get('targetId') not in self._targets:
+                self._targets.add(target.get('targetId'))
+                await self._send('Target.attachToTarget', {'targetId': target.get('targetId'), 'flatten': True})
+        elif method == 'Target.attachedToTarget':
+            self._targets.add(params.get('targetInfo', {}).get('targetId'))
+            self._sessions.add(params.get('sessionId'))
+            await self._enable([params.get('sessionId')], list(self._domains))
+        elif method == 'Target.detachedFromTarget':
+            self._sessions.discard(params.get('sessionId'))
+        elif method == 'Target.targetDestroyed':
+            self._targets.discard(params.get('targetId'))
+        for methods, callback in list(self._subscribers):
+            if method in methods:
+                try:
+                    callback(message)
+                except Exception:
+                    pass
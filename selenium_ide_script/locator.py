@@ -0,0 +1,188 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from selenium.common import TimeoutException, WebDriverException
+
+FIND_ELEMENT_FUNCTIONS = """
+function find(by, value) {
+    switch (by) {
+        case 'css selector':
+            return document.querySelector(value);
+        case 'id':
+            return document.getElementById(value);
+        case 'name':
+            return document.getElementsByName(value)[0] || null;
+        case 'xpath':
+            return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+                .singleNodeValue;
+        case 'link text':
+            return Array.prototype.find.call(document.links, function (a) {
+                return a.textContent.trim() === value;
+            }) || null;
+        case 'partial link text':
+            return Array.prototype.find.call(document.links, function (a) {
+                return a.textContent.indexOf(value) !== -1;
+            }) || null;
+    }
+    return null;
+}
+function visible(element) {
+    if (!(element.offsetWidth || element.offsetHeight || element.getClientRects().length)) {
+        return false;
+    }
+    var style = window.getComputedStyle(element);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+}
+function firstVisible(locators) {
+    for (var i = 0; i < locators.length; i++) {
+        try {
+            var element = find(locators[i][0], locators[i][1]);
+            if (element && element.nodeType === 1 && visible(element)) {
+                return [i, element];
+            }
+        } catch (e) {
+        }
+    }
+    return null;
+}
+"""
+
+FIRST_VISIBLE_ELEMENT_SCRIPT = FIND_ELEMENT_FUNCTIONS + """
+return firstVisible(arguments[0]);
+"""
+
+MUTATION_OBSERVER_SCRIPT = FIND_ELEMENT_FUNCTIONS + """
+var locators = arguments[0], timeout = arguments[1], interval = arguments[2], done = arguments[arguments.length - 1];
+var found = firstVisible(locators);
+if (found) {
+    return done(found);
+}
+var scheduled = false, observer, timer, poller;
+function finish(result) {
+    observer.disconnect();
+    clearTimeout(timer);
+    clearInterval(poller);
+    done(result);
+}
+function check() {
+    scheduled = false;
+    var result = firstVisible(locators);
+    if (result) {
+        finish(result);
+    }
+}
+observer = new MutationObserver(function () {
+    if (!scheduled) {
+        scheduled = true;
+        Promise.resolve().then(check);
+    }
+});
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+poller = setInterval(check, interval);
+timer = setTimeout(function () {
+    finish(null);
+}, timeout);
+"""
+
+
+class FirstVisibleElement:
+    """
+    WebDriverWait 条件：一次 JS 调用同时尝试所有定位器，返回第一个可见元素的 (下标, 元素)
+    """
+
+    def __init__(self, locators: Sequence[Tuple[str, str]]):
+        self.locators = [list(locator) for locator in locators]
+
+    def __call__(self, driver):
+        result = driver.execute_script(FIRST_VISIBLE_ELEMENT_SCRIPT, self.locators)
+        return (result[0], result[1]) if result else False
+
+
+class MutationObserverWait:
+    """
+    基于页面内 MutationObserver 的等待：DOM 变化时立即在页面内检查定位器，不再按 WebDriver 轮询间隔往返
+    """
+    SCRIPT_TIMEOUT = 25
+
+    def __init__(self, driver, timeout, poll_interval=0.1):
+        self.driver = driver
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def until(self, locators: Sequence[Tuple[str, str]], message=None):
+        locators = [list(locator) for locator in locators]
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                result = self.driver.execute_async_script(
+                    MUTATION_OBSERVER_SCRIPT, locators, int(max(0.0, min(remaining, self.SCRIPT_TIMEOUT)) * 1000),
+                    max(1, int(self.poll_interval * 1000)))
+                if result:
+                    return result[0], result[1]
+            except WebDriverException:
+                time.sleep(self.poll_interval)
+            if time.monotonic() >= deadline:
+                raise TimeoutException(message)
+
+
+class LocatorPreference:
+    """
+    按命令 id 记录每个定位器命中的次数，后续运行优先尝试命中次数多的定位器
+    """
+    FILE = os.path.join(os.path.expanduser('~'), '.cache', 'selenium_ide_script', 'locators.json')
+    _DEFAULT = None
+    _DEFAULT_LOCK = threading.Lock()
+
+    def __init__(self, file=None):
+        self.file = file or LocatorPreference.FILE
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data: Dict[str, Dict[str, int]] = {}
+        try:
+            with open(self.file, encoding='utf-8') as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @classmethod
+    def default(cls) -> 'LocatorPreference':
+        with cls._DEFAULT_LOCK:
+            if LocatorPreference._DEFAULT is None:
+                LocatorPreference._DEFAULT = cls()
+                atexit.register(LocatorPreference._DEFAULT.flush)
+            return LocatorPreference._DEFAULT
+
+    def order(self, key, locators: List[str]) -> List[str]:
+        """ 按命中次数从高到低排序，次数相同时保持原始顺序 """
+        wins = self._data.get(key) if key else None
+        if not wins:
+            return list(locators)
+        return sorted(locators, key=lambda locator: -wins.get(locator, 0))
+
+    def record(self, key, locator: str):
+        if not key:
+            return
+        with self._lock:
+            wins = self._data.setdefault(key, {})
+            wins[locator] = wins.get(locator, 0) + 1
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._data, ensure_ascii=False)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+            temp_file = f"{self.file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_file, self.file)
+        except OSError:
+            pass
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+
+class StepTimer:
+    """
+    单个步骤的分阶段计时，嵌套阶段的耗时只计入最内层（例如元素等待不计入动作）
+
+    stop() 之后 total 固定为关键路径上的耗时，之后在后台记录的阶段（流水线模式下的附件）不计入 total
+    """
+    ACTION = 'action'
+    ELEMENT_WAIT = 'element_wait'
+    NETWORK = 'network'
+    CONSOLE = 'console'
+    PERFORMANCE = 'performance'
+    SCREENSHOT = 'screenshot'
+    ATTACHMENT = 'attachment'
+    PHASES = (ACTION, ELEMENT_WAIT, NETWORK, CONSOLE, PERFORMANCE, SCREENSHOT, ATTACHMENT)
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.stopped = None
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self._stack.append(name)
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            if self._stack:
+                self.phases[self._stack[-1]] -= elapsed
+
+    @staticmethod
+    def timed(timer, name):
+        return timer.phase(name) if timer is not None else nullcontext()
+
+    def stop(self):
+        if self.stopped is None:
+            self.stopped = time.perf_counter()
+
+    def elapsed(self):
+        return (self.stopped or time.perf_counter()) - self.started
+
+    def to_dict(self) -> Dict[str, float]:
+        """ 各阶段耗时（毫秒），total 为步骤开始至今的总耗时 """
+        data = {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+        data['total'] = round(self.elapsed() * 1000, 3)
+        return data
+
+
+class RunMetrics:
+    """
+    汇总每个测试、套件和整个运行的分阶段耗时，导出 JSON 和 Prometheus textfile
+    """
+    PREFIX = 'selenium_ide'
+    _CURRENT = None
+    _CURRENT_LOCK = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tests: Dict[tuple, Dict] = {}
+
+    @classmethod
+    def current(cls) -> 'RunMetrics':
+        with cls._CURRENT_LOCK:
+            if RunMetrics._CURRENT is None:
+                RunMetrics._CURRENT = cls()
+            return RunMetrics._CURRENT
+
+    def record(self, result):
+        self.record_timings(result.file_name, result.suite_name, result.testcase_name, result.timings,
+                            result.result)
+
+    def record_timings(self, file_name, suite_name, test_name, timings: List[Dict[str, float]], passed=True):
+        total = self._empty()
+        for timing in timings:
+            self._add(total, timing)
+        total['passed'] = bool(passed)
+        with self._lock:
+            self.tests[(file_name, suite_name, test_name)] = total
+
+    @staticmethod
+    def _empty():
+        return {'steps': 0, 'total_ms': 0.0, 'phases_ms': dict.fromkeys(StepTimer.PHASES, 0.0)}
+
+    @staticmethod
+    def _add(total, timing):
+        if 'phases_ms' in timing:
+            total['steps'] += timing['steps']
+            total['total_ms'] += timing['total_ms']
+            phases = timing['phases_ms']
+        else:
+            total['steps'] += 1
+            total['total_ms'] += timing.get('total', 0.0)
+            phases = timing
+        for name in StepTimer.PHASES:
+            total['phases_ms'][name] += phases.get(name, 0.0)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            tests = dict(self.tests)
+        run, suites, test_list = self._empty(), {}, []
+        for (file_name, suite_name, test_name), total in tests.items():
+            self._add(run, total)
+            self._add(suites.setdefault((file_name, suite_name), self._empty()), total)
+            test_list.append({'file': file_name, 'suite': suite_name, 'test': test_name, **total})
+        return {
+            'run': run,
+            'suites': [{'file': file_name, 'suite': suite_name, **total}
+                       for (file_name, suite_name), total in suites.items()],
+            'tests': test_list,
+        }
+
+    def write_json(self, path):
+        self._write(path, json.dumps(self.summary(), ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path):
+        """ node_exporter textfile 格式，按测试和阶段输出累计秒数 """
+        summary = self.summary()
+        prefix = self.PREFIX
+        lines = [
+            f'# HELP {prefix}_step_phase_seconds_total Time spent in each step phase.',
+            f'# TYPE {prefix}_step_phase_seconds_total counter',
+        ]
+        for test in summary['tests']:
+            labels = self._labels(file=test['file'], suite=test['suite'], test=test['test'])
+            for name, value in test['phases_ms'].items():
+                lines.append(f'{prefix}_step_phase_seconds_total{{{labels},phase="{name}"}} {value / 1000:.6f}')
+        lines += [
+            f'# HELP {prefix}_test_duration_seconds Wall time of each test.',
+            f'# TYPE {prefix}_test_duration_seconds gauge',
+        ]
+        for test in summary['tests']:
+            labels = self._labels(file=test['file'], suite=test['suite'], test=test['test'])
+            lines.append(f'{prefix}_test_duration_seconds{{{labels}}} {test["total_ms"] / 1000:.6f}')
+        lines += [
+            f'# HELP {prefix}_test_steps Number of executed steps of each test.',
+            f'# TYPE {prefix}_test_steps gauge',
+        ]
+        for test in summary['tests']:
+            labels = self._labels(file=test['file'], suite=test['suite'], test=test['test'])
+            lines.append(f'{prefix}_test_steps{{{labels}}} {test["steps"]}')
+        lines += [
+            f'# HELP {prefix}_test_passed Whether the test passed (1) or failed (0).',
+            f'# TYPE {prefix}_test_passed gauge',
+        ]
+        for test in summary['tests']:
+            labels = self._labels(file=test['file'], suite=test['suite'], test=test['test'])
+            lines.append(f'{prefix}_test_passed{{{labels}}} {int(test["passed"])}')
+        lines += [
+            f'# HELP {prefix}_run_phase_seconds_total Time spent in each step phase over the whole run.',
+            f'# TYPE {prefix}_run_phase_seconds_total counter',
+        ]
+        for name, value in summary['run']['phases_ms'].items():
+            lines.append(f'{prefix}_run_phase_seconds_total{{phase="{name}"}} {value / 1000:.6f}')
+        self._write(path, "\n".join(lines) + "\n")
+
+    @staticmethod
+    def _labels(**labels):
+        def _escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+    @staticmethod
+    def _write(path, content):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_file, path)
@@ -1,4 +1,6 @@
 import abc
+from functools import lru_cache
+from typing import List, Tuple
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
@@ -6,41 +8,68 @@ from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as expected
 from selenium.webdriver.common.action_chains import ActionChains
 
+from selenium_ide_script.metrics import StepTimer
+from selenium_ide_script.locator import FirstVisibleElement, LocatorPreference, MutationObserverWait
+
+
+LOCATOR_STRATEGIES = {
+    "linkText": By.LINK_TEXT,
+    "css": By.CSS_SELECTOR,
+}
+
+
+@lru_cache(maxsize=1024)
+def parse_locator(locator: str) -> Tuple[str, str]:
+    """ 将 Selenium IDE 的 "css=..." 形式的定位字符串转换为 (By, value) """
+    _by, _locator = locator.split("=", 1)
+    return LOCATOR_STRATEGIES.get(_by, _by), _locator
+
 
 class BaseWebOperation(metaclass=abc.ABCMeta):
     DEFAULT_WAIT_EXPECTED = expected.visibility_of_element_located
     DEFAULT_WAIT_TIMEOUT = 10
     GLOBAL_WINDOW_HANDLES = dict()
+    LEARN_LOCATORS = True
+    WEBDRIVER = 'webdriver'
+    MUTATION_OBSERVER = 'mutation_observer'
+    WAIT_ENGINES = (WEBDRIVER, MUTATION_OBSERVER)
+    WAIT_ENGINE = WEBDRIVER
+    POLL_INTERVAL = 0.5
+    timer: StepTimer = None
 
     def __init__(self, driver=None):
         self.driver = driver
 
+    @property
+    def global_window_handles(self) -> dict:
+        return BaseWebOperation.GLOBAL_WINDOW_HANDLES.setdefault(self.driver.session_id, dict())
+
     def window_handles(self, key: str = 'window_handles'):
         window_handles = self.driver.window_handles
         if key:
-            BaseWebOperation.GLOBAL_WINDOW_HANDLES[key] = window_handles
+            self.global_window_handles[key] = window_handles
         return window_handles
 
     def current_window_handle(self, key: str = None):
         current_window_handle = self.driver.current_window_handle
         if key:
-            BaseWebOperation.GLOBAL_WINDOW_HANDLES[key] = current_window_handle
+            self.global_window_handles[key] = current_window_handle
         return current_window_handle
 
     def wait_new_window_handle(self, key: str = None, timeout: int = 10000):
-        window_handles = BaseWebOperation.GLOBAL_WINDOW_HANDLES.get('window_handles')
+        window_handles = self.global_window_handles.get('window_handles')
         if not window_handles:
             window_handles = self.driver.window_handles
         WebDriverWait(self.driver, timeout / 1000).until(expected.new_window_is_opened(window_handles))
         new_window_handles = self.driver.window_handles
         new_window_handle = set(new_window_handles).difference(set(window_handles)).pop()
         if key:
-            BaseWebOperation.GLOBAL_WINDOW_HANDLES[key] = new_window_handle
+            self.global_window_handles[key] = new_window_handle
         return new_window_handle
 
     def switch_to_window(self, handles):
-        if handles in BaseWebOperation.GLOBAL_WINDOW_HANDLES.keys():
-            self.driver.switch_to.window(BaseWebOperation.GLOBAL_WINDOW_HANDLES.get(handles))
+        if handles in self.global_window_handles.keys():
+            self.driver.switch_to.window(self.global_window_handles.get(handles))
         else:
             self.driver.switch_to.window(handles)
 
@@ -48,22 +77,39 @@ class BaseWebOperation(metaclass=abc.ABCMeta):
         self.driver.close()
 
     def find_element(self, locator, timeout=None, message=None, ec=None):
-
-        def _split_string_locator(_str):
-            _keys = {
-                "linkText": By.LINK_TEXT,
-                "css": By.CSS_SELECTOR,
-            }
-            _by, _locator = _str.split("=", 1)
-            return _keys.get(_by, _by), _locator
-
         if isinstance(locator, str):
-            locator = _split_string_locator(locator)
-        if not ec:
-            ec = BaseWebOperation.DEFAULT_WAIT_EXPECTED
+            locator = parse_locator(locator)
+        if not timeout:
+            timeout = BaseWebOperation.DEFAULT_WAIT_TIMEOUT
+        with StepTimer.timed(self.timer, StepTimer.ELEMENT_WAIT):
+            if not ec and BaseWebOperation.WAIT_ENGINE == BaseWebOperation.MUTATION_OBSERVER:
+                return MutationObserverWait(self.driver, timeout, BaseWebOperation.POLL_INTERVAL).until([locator],
+                                                                                                        message)[1]
+            if not ec:
+                ec = BaseWebOperation.DEFAULT_WAIT_EXPECTED
+            return self.wait(timeout).until(ec(locator), message)
+
+    def wait(self, timeout=None) -> WebDriverWait:
+        return WebDriverWait(self.driver, timeout or BaseWebOperation.DEFAULT_WAIT_TIMEOUT,
+                             poll_frequency=BaseWebOperation.POLL_INTERVAL)
+
+    def find_first_element(self, locators: List[str], timeout=None, message=None, key=None):
+        """ 同时尝试多个定位器，返回第一个可见的元素，命中的定位器记入 LocatorPreference """
+        preference = LocatorPreference.default() if BaseWebOperation.LEARN_LOCATORS else None
+        if preference:
+            locators = preference.order(key, locators)
         if not timeout:
             timeout = BaseWebOperation.DEFAULT_WAIT_TIMEOUT
-        return WebDriverWait(self.driver, timeout).until(ec(locator), message)
+        parsed = [parse_locator(locator) for locator in locators]
+        with StepTimer.timed(self.timer, StepTimer.ELEMENT_WAIT):
+            if BaseWebOperation.WAIT_ENGINE == BaseWebOperation.MUTATION_OBSERVER:
+                index, element = MutationObserverWait(self.driver, timeout, BaseWebOperation.POLL_INTERVAL).until(
+                    parsed, message)
+            else:
+                index, element = self.wait(timeout).until(FirstVisibleElement(parsed), message)
+        if preference:
+            preference.record(key, locators[index])
+        return element
 
     def click(self, locator, timeout=None, message=None, ec=None):
         self.find_element(locator, timeout, message, ec).click()
@@ -0,0 +1,159 @@
+import json
+import re
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from selenium_ide_script.asserter import latency_of
+
+REQUEST_TYPES = ('xhr', 'XHR', 'Fetch')
+
+
+def ttfb_of(network) -> Optional[float]:
+    """ 从发出请求到收到响应头的耗时（毫秒） """
+    timing = network.get('timing') or {}
+    start, response = timing.get('request'), timing.get('response')
+    if start is None or response is None:
+        return None
+    return response - start
+
+
+def bytes_of(network) -> int:
+    """ 传输字节数：优先使用 loadingFinished 的 encodedDataLength，其次响应体大小 """
+    encoded = network.get('encoded_data_length')
+    if encoded:
+        return int(encoded)
+    size = getattr(network, 'size', None)
+    return int(size or network.get('data_length') or 0)
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def step_performance(networks: Iterable, navigation: Dict = None, metrics: Dict = None) -> Dict:
+    """
+    一个步骤的前端性能指标：接口请求的 TTFB 和总耗时、最慢的请求、传输字节数，
+    以及页面的 navigation timing 和 Performance.getMetrics（由 WebDriverPerformanceCollector 采集）
+    """
+    requests, slowest, total_bytes, count = [], None, 0, 0
+    for network in networks:
+        if network.get('canceled'):
+            continue
+        count += 1
+        total_bytes += bytes_of(network)
+        duration = latency_of(network)
+        if duration is not None and (slowest is None or duration > slowest['duration_ms']):
+            slowest = {'url': network.get('url'), 'method': network.get('method'), 'type': network.get('type'),
+                       'duration_ms': _round(duration)}
+        if network.get('type') in REQUEST_TYPES:
+            requests.append({'url': network.get('url'), 'method': network.get('method'),
+                             'ttfb_ms': _round(ttfb_of(network)), 'duration_ms': _round(duration),
+                             'bytes': bytes_of(network)})
+    return {'requests': requests, 'slowest': slowest, 'bytes': total_bytes, 'request_count': count,
+            'navigation': navigation, 'metrics': metrics}
+
+
+class PerformanceBudget:
+    """
+    一条性能预算：suite/test（正则，search 匹配）限定生效的测试；
+    url/types 筛选请求后限制每个请求的 max_ttfb_ms、max_duration_ms；
+    max_slowest_ms、max_bytes、max_requests 限制整个步骤；navigation、metrics 为 指标名 -> 上限 的映射
+    """
+
+    def __init__(self, name=None, suite='.*', test='.*', url='.*', types=REQUEST_TYPES, max_ttfb_ms=None,
+                 max_duration_ms=None, max_slowest_ms=None, max_bytes=None, max_requests=None,
+                 navigation: Dict[str, float] = None, metrics: Dict[str, float] = None):
+        self.name = name or f"{suite}::{test} 性能预算"
+        self.suite = re.compile(suite)
+        self.test = re.compile(test)
+        self.url = re.compile(url)
+        self.types = frozenset(types) if types else None
+        self.max_ttfb_ms = max_ttfb_ms
+        self.max_duration_ms = max_duration_ms
+        self.max_slowest_ms = max_slowest_ms
+        self.max_bytes = max_bytes
+        self.max_requests = max_requests
+        self.navigation = navigation or {}
+        self.metrics = metrics or {}
+
+    @classmethod
+    def of(cls, data: Dict) -> 'PerformanceBudget':
+        return cls(**data)
+
+    def applies(self, suite_name, test_name) -> bool:
+        return bool(self.suite.search(suite_name or '')) and bool(self.test.search(test_name or ''))
+
+    def accept(self, network) -> bool:
+        if network.get('canceled'):
+            return False
+        if self.types is not None and network.get('type') not in self.types:
+            return False
+        return bool(self.url.search(network.get('url') or ''))
+
+    def check(self, networks: List, performance: Mapping) -> List[str]:
+        failures = []
+        if self.max_ttfb_ms is not None or self.max_duration_ms is not None:
+            for network in networks:
+                if not self.accept(network):
+                    continue
+                ttfb, duration = ttfb_of(network), latency_of(network)
+                request = f"{network.get('method')} {network.get('url')}"
+                if self.max_ttfb_ms is not None and ttfb is not None and ttfb > self.max_ttfb_ms:
+                    failures.append(f"{self.name}：{request} TTFB {ttfb:.0f}ms 超过 {self.max_ttfb_ms}ms")
+                if self.max_duration_ms is not None and duration is not None and duration > self.max_duration_ms:
+                    failures.append(f"{self.name}：{request} 耗时 {duration:.0f}ms 超过 {self.max_duration_ms}ms")
+        slowest = performance.get('slowest')
+        if self.max_slowest_ms is not None and slowest and slowest['duration_ms'] > self.max_slowest_ms:
+            failures.append(f"{self.name}：最慢的请求 {slowest['method']} {slowest['url']} "
+                            f"耗时 {slowest['duration_ms']:.0f}ms 超过 {self.max_slowest_ms}ms")
+        if self.max_bytes is not None and performance.get('bytes', 0) > self.max_bytes:
+            failures.append(f"{self.name}：传输 {performance['bytes']} 字节，超过 {self.max_bytes} 字节")
+        if self.max_requests is not None and performance.get('request_count', 0) > self.max_requests:
+            failures.append(f"{self.name}：请求数 {performance['request_count']} 超过 {self.max_requests}")
+        for group, limits in (('navigation', self.navigation), ('metrics', self.metrics)):
+            values = performance.get(group) or {}
+            for key, limit in limits.items():
+                value = values.get(key)
+                if value is not None and value > limit:
+                    failures.append(f"{self.name}：{group}.{key} {value:g} 超过 {limit:g}")
+        return failures
+
+
+class BudgetRule:
+    """ 一个测试生效的预算，作为判定规则使用：实时执行时读取 Command.details，离线分析时读取轨迹中的步骤 """
+
+    def __init__(self, budgets: Iterable[PerformanceBudget]):
+        self.budgets = tuple(budgets)
+
+    def __call__(self, step: Mapping) -> List[str]:
+        networks = step.get('requests') or []
+        performance = step.get('performance') or step_performance(networks)
+        return [failure for budget in self.budgets for failure in budget.check(networks, performance)]
+
+
+class PerformanceBudgets:
+    """
+    按套件和测试声明的性能预算，超出时步骤判定失败
+    """
+    FILE = None
+
+    def __init__(self, budgets: Iterable[PerformanceBudget]):
+        self.budgets = tuple(budgets)
+        self._rules: Dict[tuple, Optional[BudgetRule]] = {}
+
+    @classmethod
+    def load(cls, file) -> 'PerformanceBudgets':
+        """ JSON 文件：预算对象的列表，字段同 PerformanceBudget 的参数 """
+        with open(file, encoding='utf-8') as f:
+            return cls(PerformanceBudget.of(data) for data in json.load(f))
+
+    def for_test(self, suite_name, test_name) -> Optional[BudgetRule]:
+        """ 没有预算对该测试生效时返回 None """
+        key = (suite_name, test_name)
+        if key not in self._rules:
+            budgets = [budget for budget in self.budgets if budget.applies(suite_name, test_name)]
+            self._rules[key] = BudgetRule(budgets) if budgets else None
+        return self._rules[key]
+
+
+def default_budgets() -> Optional[PerformanceBudgets]:
+    return PerformanceBudgets.load(PerformanceBudgets.FILE) if PerformanceBudgets.FILE else None
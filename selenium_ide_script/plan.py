@@ -0,0 +1,105 @@
+import hashlib
+import os
+import pickle
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+
+PLAN_VERSION = 1
+
+
+class PlannedCommand(NamedTuple):
+    """ 编译后的命令，字段名与 .side 文件保持一致 """
+    id: str
+    command: str
+    handler: Callable
+    target: Any
+    locator: Optional[Tuple[str, str]]
+    value: Any
+    comment: str
+    targets: Tuple
+    opensWindow: bool
+    windowHandleName: str
+    windowTimeout: int
+
+
+class PlannedTest(NamedTuple):
+    id: str
+    name: str
+    commands: Tuple[PlannedCommand, ...]
+
+
+class PlannedSuite(NamedTuple):
+    id: str
+    name: str
+    persistSession: bool
+    parallel: bool
+    timeout: int
+    tests: Tuple[PlannedTest, ...]
+
+
+class ExecutionPlan(NamedTuple):
+    """
+    不可变的执行计划：处理函数已解析、定位器已拆分、跳过规则已应用、未知命令已在启动浏览器前拒绝
+    """
+    id: str
+    name: str
+    url: str
+    suites: Tuple[PlannedSuite, ...]
+    digest: str = None
+
+    def running(self, driver, host, pool=None):
+        from selenium_ide_script.selenium_ide import TestSuites
+        result = []
+        for suite in self.suites:
+            result.extend(TestSuites(**suite._asdict()).running(self.name, self.url, driver, host, pool))
+        return result
+
+    def sharded(self, host, processes, shard=None):
+        from selenium_ide_script.shard import ShardedRunner
+        return ShardedRunner(self, host, processes).running(shard)
+
+    def descriptors(self, host, pool):
+        from selenium_ide_script.selenium_ide import TestCaseDescriptor
+        return [TestCaseDescriptor(self.name, suite.name, self.url, test, host, pool, suite.persistSession)
+                for suite in self.suites for test in suite.tests]
+
+
+class PlanCache:
+    """
+    执行计划磁盘缓存，以 .side 文件内容的 sha256 为 key
+    """
+    DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'selenium_ide_script', 'plans')
+
+    def __init__(self, directory=None):
+        self.directory = directory or PlanCache.DIRECTORY
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.v{PLAN_VERSION}.pickle")
+
+    @staticmethod
+    def digest(file) -> str:
+        """ 分块计算，不需要把整个文件读入内存 """
+        sha256 = hashlib.sha256()
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def load(self, file, compiler: Callable[[str, str], ExecutionPlan]) -> ExecutionPlan:
+        """ compiler(file, digest) 只在缓存未命中时调用 """
+        digest = self.digest(file)
+        cache_file = self.path(digest)
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+            pass
+        plan = compiler(file, digest)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'wb') as f:
+                pickle.dump(plan, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except OSError:
+            pass
+        return plan
@@ -0,0 +1,159 @@
+import glob
+import json
+import os
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple, Union
+
+from common.exceptions import NotFoundTestException
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+TESTS_ITEM = 'tests.item'
+
+
+class TestView(NamedTuple):
+    """ 只读的测试视图，commands 为只读映射，多个套件引用同一个测试时共享同一个对象 """
+    id: str
+    name: str
+    commands: Tuple[Mapping, ...]
+
+    @classmethod
+    def of(cls, test: Union[dict, 'TestView']) -> 'TestView':
+        if isinstance(test, TestView):
+            return test
+        return cls(test.get('id'), test.get('name'),
+                   tuple(MappingProxyType(command) for command in test.get('commands') or ()))
+
+
+class SuiteView(NamedTuple):
+    id: str
+    name: str
+    persistSession: bool
+    parallel: bool
+    timeout: int
+    tests: Tuple[TestView, ...]
+
+
+def side_files(paths: Union[str, Iterable[str]]) -> List[str]:
+    """ 展开文件和目录（目录下递归查找 *.side），按路径排序并去重 """
+    if isinstance(paths, str):
+        paths = [paths]
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(glob.glob(os.path.join(path, '**', '*.side'), recursive=True)))
+        else:
+            result.append(path)
+    return list(dict.fromkeys(os.path.normpath(path) for path in result))
+
+
+def iter_side(file) -> Iterator[Tuple[str, Any]]:
+    """
+    逐个产出 .side 文件的内容：每个测试为 (TESTS_ITEM, 测试)，其余顶层字段为 (key, value)。
+    安装了 ijson 时流式解析，任意时刻只有一个测试在内存中；否则退回 json.load
+    """
+    if ijson is None:
+        with open(file, 'rb') as f:
+            data = json.load(f)
+        for test in data.pop('tests', None) or ():
+            yield TESTS_ITEM, test
+        yield from data.items()
+        return
+    with open(file, 'rb') as f:
+        builder, key = None, None
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == key and event in ('end_map', 'end_array'):
+                    yield key, builder.value
+                    builder = None
+            elif prefix == TESTS_ITEM or (prefix and '.' not in prefix and prefix != 'tests'):
+                if event in ('start_map', 'start_array'):
+                    builder, key = ijson.ObjectBuilder(), prefix
+                    builder.event(event, value)
+                elif event != 'map_key':
+                    yield prefix, value
+
+
+class Project:
+    """
+    .side 项目的索引模型：构建一次，按 id 和名称 O(1) 查找测试与套件，套件引用的测试直接共享而不复制
+    """
+
+    def __init__(self, id, name, url, tests: Iterable[Union[dict, TestView]], suites: Iterable[Mapping], file=None):
+        self.id = id
+        self.name = name
+        self.url = url
+        self.file = file
+        self._tests: Dict[str, TestView] = {}
+        self._test_names: Dict[str, TestView] = {}
+        for test in tests:
+            test = TestView.of(test)
+            self._tests[test.id] = test
+            self._test_names.setdefault(test.name, test)
+        self._suites: Dict[str, SuiteView] = {}
+        self._suite_names: Dict[str, SuiteView] = {}
+        for suite in suites:
+            suite = self._suite_view(suite)
+            self._suites[suite.id] = suite
+            self._suite_names.setdefault(suite.name, suite)
+
+    def _suite_view(self, suite: Union[Mapping, SuiteView]) -> SuiteView:
+        if isinstance(suite, SuiteView):
+            return suite
+        tests = []
+        for test_id in suite.get('tests') or ():
+            test = self._tests.get(test_id)
+            if test is None:
+                raise NotFoundTestException(f"测试套件 {suite.get('name')} 引用了不存在的测试：{test_id}")
+            tests.append(test)
+        return SuiteView(suite.get('id'), suite.get('name'), suite.get('persistSession', False),
+                         suite.get('parallel', False), suite.get('timeout', 10), tuple(tests))
+
+    @classmethod
+    def read(cls, file) -> 'Project':
+        fields, tests = {}, []
+        for key, value in iter_side(file):
+            if key == TESTS_ITEM:
+                tests.append(TestView.of(value))
+            else:
+                fields[key] = value
+        return cls(fields.get('id'), fields.get('name'), fields.get('url'), tests, fields.get('suites') or (), file)
+
+    @property
+    def tests(self) -> Tuple[TestView, ...]:
+        return tuple(self._tests.values())
+
+    @property
+    def suites(self) -> Tuple[SuiteView, ...]:
+        return tuple(self._suites.values())
+
+    def test(self, id) -> TestView:
+        try:
+            return self._tests[id]
+        except KeyError:
+            raise NotFoundTestException(f"不存在的测试：{id}") from None
+
+    def test_named(self, name) -> TestView:
+        try:
+            return self._test_names[name]
+        except KeyError:
+            raise NotFoundTestException(f"不存在的测试：{name}") from None
+
+    def suite(self, id) -> SuiteView:
+        try:
+            return self._suites[id]
+        except KeyError:
+            raise NotFoundTestException(f"不存在的测试套件：{id}") from None
+
+    def suite_named(self, name) -> SuiteView:
+        try:
+            return self._suite_names[name]
+        except KeyError:
+            raise NotFoundTestException(f"不存在的测试套件：{name}") from None
+
+    def __len__(self):
+        return len(self._tests)
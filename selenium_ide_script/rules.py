@@ -0,0 +1,70 @@
+from typing import Callable, Iterable, List, Mapping, Optional
+
+from selenium_ide_script.asserter import AssertionEngine
+
+# 规则接收一个步骤的明细（实时执行时为 Command.details，离线分析时为轨迹中的步骤记录），返回失败原因列表
+Rule = Callable[[Mapping], List[str]]
+
+XHR_TYPES = ('xhr', 'XHR')
+
+
+def response_code(network) -> Optional:
+    """ 响应体中的业务 code，不存在或为空时返回 None """
+    response_body = network.get('response_body')
+    if response_body and isinstance(response_body, dict) and response_body.get("code"):
+        return response_body.get("code")
+    return None
+
+
+class ExceptionRule:
+    """ 命令执行抛出异常时判定失败 """
+
+    def __call__(self, step: Mapping) -> List[str]:
+        exception = step.get('exception')
+        return [f"执行异常：{exception}"] if exception else []
+
+
+class ResponseCodeRule:
+    """ XHR 响应体中的 code 不在 success_codes 中时判定失败 """
+    SUCCESS_CODES = ('200', 200)
+    RESOURCE_TYPES = XHR_TYPES
+
+    def __init__(self, success_codes: Iterable = None, resource_types: Iterable[str] = None):
+        self.success_codes = tuple(ResponseCodeRule.SUCCESS_CODES if success_codes is None else success_codes)
+        self.resource_types = tuple(resource_types or ResponseCodeRule.RESOURCE_TYPES)
+
+    @staticmethod
+    def code_of(network) -> Optional:
+        return response_code(network)
+
+    def __call__(self, step: Mapping) -> List[str]:
+        failures = []
+        for network in step.get('requests') or ():
+            if network.get('type') not in self.resource_types or network.get('canceled'):
+                continue
+            code = self.code_of(network)
+            if code is not None and code not in self.success_codes:
+                failures.append(f"{network.get('method')} {network.get('url')} code={code}")
+        return failures
+
+
+class ConsoleLevelRule:
+    """ 控制台出现指定级别的日志时判定失败 """
+    LEVELS = ('SEVERE',)
+
+    def __init__(self, levels: Iterable[str] = None):
+        self.levels = frozenset(level.upper() for level in levels or ConsoleLevelRule.LEVELS)
+
+    def __call__(self, step: Mapping) -> List[str]:
+        return [f"console 【{console.get('level')}】 {console.get('message')}" for console in step.get('consoles') or ()
+                if console.get('level') in self.levels]
+
+
+def default_rules() -> List[Rule]:
+    """ 配置了 AssertionEngine.FILE 时用其中的接口断言代替默认的 code 断言 """
+    engine = AssertionEngine.load(AssertionEngine.FILE) if AssertionEngine.FILE else AssertionEngine.default()
+    return [ExceptionRule(), engine, ConsoleLevelRule()]
+
+
+def evaluate(step: Mapping, rules: Iterable[Rule]) -> List[str]:
+    return [failure for rule in rules for failure in rule(step)]
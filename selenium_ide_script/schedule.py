@@ -0,0 +1,107 @@
+import atexit
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Sequence, TypeVar
+
+T = TypeVar('T')
+
+
+class DurationHistory:
+    """
+    按测试 id 记录历史耗时（毫秒，指数滑动平均），用于最长优先排序和多进程负载均衡；
+    SCHEDULE 决定会话池中测试的领取顺序，SHARDING 决定多进程的分片方式
+    """
+    FILE = os.path.join(os.path.expanduser('~'), '.cache', 'selenium_ide_script', 'durations.json')
+    FILE_ORDER = 'file'
+    LONGEST_FIRST = 'duration'
+    SCHEDULES = (FILE_ORDER, LONGEST_FIRST)
+    SCHEDULE = LONGEST_FIRST
+    BY_ID = 'hash'
+    BY_DURATION = 'duration'
+    SHARDINGS = (BY_ID, BY_DURATION)
+    # 默认按 id 哈希分片：按耗时均衡的分片随每次运行都会更新的历史文件变化，--shard 不能保证复现同一批测试
+    SHARDING = BY_ID
+    DEFAULT_ESTIMATE = 30 * 1000
+    SMOOTHING = 0.5
+    _DEFAULT = None
+    _DEFAULT_LOCK = threading.Lock()
+
+    def __init__(self, file=None):
+        self.file = file or DurationHistory.FILE
+        self._lock = threading.Lock()
+        self._data: Dict[str, float] = self._read()
+        self._changed: Dict[str, float] = {}
+
+    @classmethod
+    def default(cls) -> 'DurationHistory':
+        with cls._DEFAULT_LOCK:
+            if DurationHistory._DEFAULT is None:
+                DurationHistory._DEFAULT = cls()
+                atexit.register(DurationHistory._DEFAULT.flush)
+            return DurationHistory._DEFAULT
+
+    def _read(self) -> Dict[str, float]:
+        try:
+            with open(self.file, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def known(self, test_id) -> bool:
+        return test_id in self._data
+
+    def estimate(self, test_id) -> float:
+        return self._data.get(test_id, DurationHistory.DEFAULT_ESTIMATE)
+
+    def record(self, test_id, duration: float):
+        if not test_id:
+            return
+        with self._lock:
+            previous = self._data.get(test_id)
+            if previous is not None:
+                duration = DurationHistory.SMOOTHING * duration + (1 - DurationHistory.SMOOTHING) * previous
+            self._data[test_id] = self._changed[test_id] = round(duration, 3)
+
+    def flush(self):
+        """ 只把本次运行更新过的测试合并进文件，多个进程同时写入时不会覆盖彼此的记录 """
+        with self._lock:
+            if not self._changed:
+                return
+            changed, self._changed = self._changed, {}
+        data = self._read()
+        data.update(changed)
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+            temp_file = f"{self.file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False))
+            os.replace(temp_file, self.file)
+        except OSError:
+            pass
+
+    def longest_first(self, items: Sequence[T], key: Callable[[T], str]) -> List[int]:
+        """ 返回执行顺序（下标）：没有历史的测试在前，其余按历史耗时从长到短，相同时保持原始顺序 """
+        return sorted(range(len(items)),
+                      key=lambda index: (self.known(key(items[index])), -self.estimate(key(items[index]))))
+
+    def balance(self, items: Sequence[T], workers: int, key: Callable[[T], Sequence[str]]) -> List[List[int]]:
+        """
+        LPT 调度：按最长优先依次分给当前总耗时最小的 worker，结果只取决于历史文件和 items 的顺序；
+        key 返回一个工作单元包含的测试 id
+        """
+        def _cost(index):
+            return sum(self.estimate(test_id) for test_id in key(items[index]))
+
+        def _known(index):
+            return all(self.known(test_id) for test_id in key(items[index]))
+
+        result, loads = [[] for _ in range(workers)], [0.0] * workers
+        for index in sorted(range(len(items)), key=lambda index: (_known(index), -_cost(index))):
+            worker = min(range(workers), key=lambda worker: (loads[worker], worker))
+            result[worker].append(index)
+            loads[worker] += _cost(index)
+        for indexes in result:
+            indexes.sort()
+        return result
@@ -1,14 +1,24 @@
 import json
-import time
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import List
+from typing import List, Optional, Tuple
 
 from allure_commons.types import AttachmentType
 
-from selenium_ide_script.allure import TestResult, Step
+from selenium_ide_script.allure import AttachmentStore, TestResult, Step
 from selenium_ide_script.collector import WebDriverNetworkCollector, WebDriverConsoleCollector, \
-    WebDriverScreenshotCollector
-from selenium_ide_script.operable import BaseWebOperation
+    WebDriverPerformanceCollector, WebDriverScreenshotCollector
+from common.exceptions import NotFoundCommandException
+from selenium_ide_script.metrics import RunMetrics, StepTimer
+from selenium_ide_script.operable import BaseWebOperation, parse_locator
+from selenium_ide_script.project import Project, SuiteView, side_files
+from selenium_ide_script.performance import default_budgets
+from selenium_ide_script.rules import XHR_TYPES, default_rules, evaluate, response_code
+from selenium_ide_script.schedule import DurationHistory
+from selenium_ide_script.trace import TraceRecorder
+from selenium_ide_script.plan import ExecutionPlan, PlanCache, PlannedCommand, PlannedSuite, PlannedTest
+from selenium_ide_script.session import WebDriverPool, reset_session
+from selenium_ide_script.stream import ResultStream
 from selenium_ide_script.utils import url_replace
 
 
@@ -34,10 +44,14 @@ class BaseSeleniumIDEScript(dict):
 
 
 class Command(BaseSeleniumIDEScript, BaseWebOperation):
+    COMMANDS = ('open', 'setWindowSize', 'close', 'click', 'selectWindow', 'storeWindowHandle', 'type', 'mouseOver',
+                'mouseOut')
+    LOCATOR_COMMANDS = ('click', 'type', 'mouseOver')
+    SKIPPED_COMMANDS = ('mouseOver', 'mouseOut')
 
     def __init__(self, command, target=None, value=None, id=None, comment='', targets=None, opensWindow=False,
                  windowHandleName='',
-                 windowTimeout=10, driver=None):
+                 windowTimeout=10, driver=None, locator=None):
         super().__init__(id, command)
         self['comment'] = comment
         self['command'] = command
@@ -47,6 +61,7 @@ class Command(BaseSeleniumIDEScript, BaseWebOperation):
         self['opens_window'] = opensWindow
         self['window_handle_name'] = windowHandleName
         self['window_timeout'] = windowTimeout
+        self['locator'] = locator
         self['details'] = {}
         self.result = False
         self.driver = driver
@@ -59,6 +74,29 @@ class Command(BaseSeleniumIDEScript, BaseWebOperation):
     def command(self):
         return self.get('command')
 
+    @property
+    def locator(self):
+        return self.get('locator') or self.target
+
+    @property
+    def targets(self):
+        return self.get('targets') or ()
+
+    @property
+    def locators(self) -> List[str]:
+        """ target 与 targets 中所有可解析的定位字符串，target 在最前 """
+        locators = []
+        for locator in [self.target] + [target[0] for target in self.targets if target]:
+            if isinstance(locator, str) and '=' in locator and locator not in locators:
+                locators.append(locator)
+        return locators
+
+    def find_target(self, timeout=None, message=None, ec=None):
+        locators = self.locators
+        if ec or len(locators) < 2:
+            return self.find_element(self.locator, timeout, message, ec)
+        return self.find_first_element(locators, timeout, message, self.id)
+
     @property
     def value(self):
         return self.get('value')
@@ -100,7 +138,7 @@ class Command(BaseSeleniumIDEScript, BaseWebOperation):
         if self.open_window:
             self.window_handles("window_handles")
             self.current_window_handle('root')
-        self.find_element(self.target, timeout, message, ec).click()
+        self.find_target(timeout, message, ec).click()
         if self.open_window:
             self.wait_new_window_handle(self.window_handle_name, self.window_timeout)
             self.switch_to_window(self.window_handle_name)
@@ -116,87 +154,215 @@ class Command(BaseSeleniumIDEScript, BaseWebOperation):
         self.switch_to_window(self.target)
 
     def type(self):
-        self.find_element(self.target).send_keys(self.value)
+        self.find_target().send_keys(self.value)
 
     def mouseOver(self):
-        self.move_to_element(self.target)
+        self.move_to_element(self.locator)
 
     def mouseOut(self):
         pass
 
+    @classmethod
+    def compile(cls, command: dict) -> Optional[PlannedCommand]:
+        """ 编译一条 .side 命令，需要跳过的命令返回 None，不支持的命令抛出 NotFoundCommandException """
+        name = command.get('command', '')
+        if name.startswith('//') or name in cls.SKIPPED_COMMANDS:
+            return None
+        if name not in cls.COMMANDS:
+            raise NotFoundCommandException(f"不支持的命令：{name}")
+        target = command.get('target')
+        locator = None
+        if name in cls.LOCATOR_COMMANDS and isinstance(target, str) and '=' in target:
+            locator = parse_locator(target)
+        return PlannedCommand(command.get('id'), name, getattr(cls, name), target, locator, command.get('value'),
+                              command.get('comment', ''), tuple(tuple(t) for t in command.get('targets') or ()),
+                              command.get('opensWindow', False), command.get('windowHandleName', ''),
+                              command.get('windowTimeout', 10))
+
     @classmethod
     def execute(cls, driver, command, target=None, value=None, id=None, comment='', targets=None, opensWindow=False,
                 windowHandleName='',
-                windowTimeout=10, *args, **kwargs):
-        start = int(time.monotonic() * 1000)
-        instance = cls(command, target, value, id, comment, targets, opensWindow, windowHandleName, windowTimeout)
+                windowTimeout=10, handler=None, locator=None, *args, **kwargs):
+        timer = StepTimer()
+        instance = cls(command, target, value, id, comment, targets, opensWindow, windowHandleName, windowTimeout,
+                       locator=locator)
+        instance.timer = timer
         try:
             setattr(instance, 'driver', driver)
-            getattr(instance, instance.command)()
-            requests = WebDriverNetworkCollector().collect(driver)
+            # 事件订阅方式的收集器需要在执行动作之前就绪，否则会漏掉动作触发的事件
+            network = WebDriverNetworkCollector.for_driver(driver)
+            console = WebDriverConsoleCollector.for_driver(driver)
+            with timer.phase(StepTimer.ACTION):
+                if handler:
+                    handler(instance)
+                else:
+                    getattr(instance, instance.command)()
+            with timer.phase(StepTimer.NETWORK):
+                requests = network.collect(driver)
             instance['details']['requests'] = [] if isinstance(requests, bool) else requests
-            instance['details']['consoles'] = WebDriverConsoleCollector().collect(driver)
-            end = int(time.monotonic() * 1000)
+            with timer.phase(StepTimer.CONSOLE):
+                instance['details']['consoles'] = console.collect(driver)
             instance.result = True
         except Exception as e:
-            instance['details']['exception'] = ";".join(e.args)
-            end = time.monotonic()
+            instance['details']['exception'] = ";".join(str(arg) for arg in e.args if arg) or repr(e)
             instance.result = False
-        instance['details']['timestamp'] = end - start
+        instance['details']['timestamp'] = int(timer.elapsed() * 1000)
         return instance
 
 
 class TestCase(BaseSeleniumIDEScript):
+    RULES = default_rules()
+    PIPELINE = True
+    PIPELINE_DEPTH = 2
+    # 为 False 时不生成报告附件（没有 allure 输出的命令行运行），网络日志、轨迹和结果流不受影响
+    REPORT = True
+    # 按套件和测试生效的性能预算（PerformanceBudgets），与 RULES 一起判定每个步骤
+    BUDGETS = default_budgets()
 
     def __init__(self, id, name, commands):
         super().__init__(id, name)
-        self['commands'] = list(commands)
+        self['commands'] = [command for command in self.compile(commands) if command]
         self.steps = []
 
+    @classmethod
+    def of(cls, test) -> 'TestCase':
+        return cls(**test._asdict()) if isinstance(test, PlannedTest) else cls(**test)
+
+    @staticmethod
+    def id_of(test) -> str:
+        return test.id if isinstance(test, PlannedTest) else test.get('id')
+
+    @staticmethod
+    def compile(commands) -> Tuple[PlannedCommand, ...]:
+        return tuple(command if isinstance(command, PlannedCommand) else Command.compile(command)
+                     for command in commands)
+
     @property
     def commands(self):
         return self.get('commands')
 
     def running(self, file_name, suite_name, url, driver, host):
-        result = TestResult(file_name, suite_name, self.name, True)
-        for command in self.commands:
-            _command = command.get("command")
-            if _command.startswith('//') or _command in ['mouseOver', 'mouseOut']:
-                continue
-            if command.get('command') == 'open' and command.get('target') == '/':
-                command['target'] = url
-                command['target'] = url_replace(command['target'], host)
-
-            command = Command.execute(driver, **command)
-            step = Step(f"{command.comment if command.comment else command.command} -> {command.result}")
-            screenshot = WebDriverScreenshotCollector.get_screenshot_as_png(driver)
-            step.add_sub_step('screenshot', screenshot, AttachmentType.PNG)
-
-            for network in command.details.get('requests', []):
-                if network.type in ['xhr', 'XHR'] and not network.canceled:
-                    status_code = None
-                    response_body = network.response_body
-                    if response_body and isinstance(response_body, dict) and response_body.get("code"):
-                        status_code = response_body.get("code")
-                        if status_code not in ['200', 200]:
-                            command.result = False
-                            result.result = False
-                            step.title = f"{command.comment if command.comment else command.command} -> {command.result}"
-                    step.add_sub_step(
-                        f'{network.method}  {network.url}  【{network.response_status_code if not status_code else status_code}】',
-                        json.dumps(network.response_body, ensure_ascii=False), AttachmentType.JSON)
-            for console in command.details.get('consoles', []):
-                step.add_sub_step(f'console 【{console.level}】', json.dumps(console), AttachmentType.JSON)
-                if console.level == 'SEVERE':
+        """
+        流水线执行：判定和截图之后，步骤 N 的附件序列化、落盘和轨迹录制交给单线程的后台队列，
+        步骤 N+1 的浏览器操作随即开始；队列按提交顺序处理，附件总是归属于产生它的步骤
+        """
+        store = AttachmentStore.for_test() if AttachmentStore.ENABLED else None
+        result = TestResult(file_name, suite_name, self.name, True, store=store)
+        screenshots = WebDriverScreenshotCollector()
+        performance = WebDriverPerformanceCollector()
+        budget = TestCase.BUDGETS.for_test(suite_name, self.name) if TestCase.BUDGETS is not None else None
+        rules = TestCase.RULES if budget is None else [*TestCase.RULES, budget]
+        recorder = TraceRecorder.current()
+        trace = recorder.test(file_name, suite_name, self.id, self.name) if recorder is not None else None
+        stream = ResultStream.current()
+        stream = stream.test(file_name, suite_name, self.id, self.name) if stream is not None else None
+        pipeline = ThreadPoolExecutor(max_workers=1, thread_name_prefix='step-artifacts') \
+            if TestCase.PIPELINE else None
+        pending = []
+        try:
+            for command in self.commands:
+                if command.command == 'open' and command.target == '/':
+                    command = command._replace(target=url_replace(url, host))
+
+                command = Command.execute(driver, **command._asdict())
+                step = Step(f"{command.comment if command.comment else command.command} -> {command.result}", store)
+                navigated = command.command == 'open' or any(
+                    network.type == 'Document' for network in command.details.get('requests', []))
+                with command.timer.phase(StepTimer.PERFORMANCE):
+                    command.details['performance'] = performance.collect(
+                        driver, command.details.get('requests', []), navigated)
+                failures = evaluate(command.details, rules)
+                if failures:
+                    command.details['failures'] = failures
                     command.result = False
-                    result.result = False
                     step.title = f"{command.comment if command.comment else command.command} -> {command.result}"
-            if not command.result:
-                result.result = False
-            result.steps.append(step)
-            result.description = command.details.get('exception')
+                if not command.result:
+                    result.result = False
+                with command.timer.phase(StepTimer.SCREENSHOT):
+                    screenshot = screenshots.collect(driver, command.result, navigated)
+                command.timer.stop()
+                result.steps.append(step)
+                result.description = command.details.get('exception')
+                if pipeline is None:
+                    self._attach(result, step, command, screenshot, screenshots, trace, stream)
+                else:
+                    # 限制排队的步骤数，后台处理跟不上时由浏览器操作等待，避免附件数据在内存中堆积
+                    if len(pending) >= TestCase.PIPELINE_DEPTH:
+                        pending[-TestCase.PIPELINE_DEPTH].result()
+                    pending.append(pipeline.submit(self._attach, result, step, command, screenshot, screenshots,
+                                                   trace, stream))
+        finally:
+            if pipeline is not None:
+                pipeline.shutdown(wait=True)
+        for future in pending:
+            future.result()
+        if trace is not None:
+            trace.finish(result)
+        if stream is not None:
+            stream.finish(result)
+        RunMetrics.current().record(result)
+        DurationHistory.default().record(self.id, sum(timing['total'] for timing in result.timings))
         return result
 
+    @staticmethod
+    def _attach(result, step, command, screenshot, screenshots, trace, stream=None):
+        with command.timer.phase(StepTimer.ATTACHMENT):
+            for network in command.details.get('requests', []) if TestCase.REPORT else ():
+                if network.type in XHR_TYPES and not network.canceled:
+                    status_code = response_code(network)
+                    step.add_sub_step(
+                        f'{network.method}  {network.url}  【{network.response_status_code if not status_code else status_code}】',
+                        json.dumps(network.response_body, ensure_ascii=False), AttachmentType.JSON)
+            for console in command.details.get('consoles', []) if TestCase.REPORT else ():
+                step.add_sub_step(f'console 【{console.level}】', json.dumps(console.to_dict()), AttachmentType.JSON)
+            performance = command.details.get('performance')
+            if TestCase.REPORT and performance and (performance['request_count'] or performance['navigation']):
+                step.add_sub_step('performance', json.dumps(performance, ensure_ascii=False), AttachmentType.JSON)
+            if screenshot is not None and TestCase.REPORT:
+                step.add_sub_step('screenshot', screenshot, screenshots.attachment_type, index=0)
+            if command.result:
+                for network in command.details.get('requests', []):
+                    network.discard_logs()
+        timings = command.timer.to_dict()
+        result.timings.append(timings)
+        if trace is not None:
+            trace.record(command, screenshot, screenshots.image_format)
+        if stream is not None:
+            stream.step(command, timings)
+
+
+class TestCaseDescriptor:
+    """
+    测试用例描述，收集阶段只保存解析后的 .side 数据，执行推迟到 write()
+    """
+
+    def __init__(self, file_name, suite_name, url, test, host, pool: WebDriverPool, persist_session=False):
+        self.file_name = file_name
+        self.suite_name = suite_name
+        self.url = url
+        self.test = test
+        self.host = host
+        self.pool = pool
+        self.persist_session = persist_session
+        self.result = None
+
+    @property
+    def id(self):
+        return self.test.id
+
+    @property
+    def name(self):
+        return self.test.name
+
+    def write(self):
+        with self.pool.session(not self.persist_session) as driver:
+            result = TestCase.of(self.test).running(self.file_name, self.suite_name, self.url, driver, self.host)
+        result.write()
+        self.result = result.result
+
+    def __repr__(self):
+        return f"{self.suite_name}::{self.name}"
+
 
 class TestSuites(BaseSeleniumIDEScript):
     def __init__(self, id, name, persistSession, parallel, timeout, tests, **kwargs):
@@ -208,7 +374,7 @@ class TestSuites(BaseSeleniumIDEScript):
 
     @property
     def persist_session(self):
-        return self.get("persistSession", False)
+        return self.get("persist_session", False)
 
     @property
     def parallel(self):
@@ -222,11 +388,40 @@ class TestSuites(BaseSeleniumIDEScript):
     def tests(self):
         return self.get("tests", [])
 
-    def running(self, file_name, url, driver, host):
-        results = []
+    def running(self, file_name, url, driver, host, pool: WebDriverPool = None):
+        """ persistSession 为 false 时每个测试之间清理浏览器状态，为 true 时整个套件共享同一个会话 """
+        reset = not self.persist_session
+        if pool is None:
+            result = []
+            for index, test in enumerate(self.tests):
+                if index and reset:
+                    reset_session(driver)
+                result.append(TestCase.of(test).running(file_name, self.name, url, driver, host))
+            return result
+        if self.parallel:
+            return self._running_parallel(file_name, url, host, pool, reset)
+        if not reset:
+            with pool.session() as driver:
+                return [TestCase.of(test).running(file_name, self.name, url, driver, host) for test in self.tests]
+        result = []
         for test in self.tests:
-            results.append(TestCase(**test).running(file_name, self.name, url, driver, host))
-        return results
+            with pool.session() as driver:
+                result.append(TestCase.of(test).running(file_name, self.name, url, driver, host))
+        return result
+
+    def _running_parallel(self, file_name, url, host, pool: WebDriverPool, reset):
+        """ 按历史耗时最长优先提交，空闲的会话总是领取剩余最长的测试，结果仍按原始顺序返回 """
+        tests = self.tests
+        if DurationHistory.SCHEDULE == DurationHistory.LONGEST_FIRST:
+            order = DurationHistory.default().longest_first(tests, key=TestCase.id_of)
+        else:
+            order = list(range(len(tests)))
+        results = pool.map(lambda index, _driver: TestCase.of(tests[index]).running(file_name, self.name, url,
+                                                                                     _driver, host), order, reset)
+        result = [None] * len(tests)
+        for index, test in zip(order, results):
+            result[index] = test
+        return result
 
 
 class SeleniumIDE(BaseSeleniumIDEScript):
@@ -236,6 +431,13 @@ class SeleniumIDE(BaseSeleniumIDEScript):
         self['url'] = url
         self['tests'] = tests
         self['suites'] = suites
+        self._project = None
+
+    @classmethod
+    def of(cls, project: Project) -> 'SeleniumIDE':
+        instance = cls(project.id, project.name, project.url, project.tests, project.suites)
+        instance._project = project
+        return instance
 
     @property
     def url(self):
@@ -246,19 +448,46 @@ class SeleniumIDE(BaseSeleniumIDEScript):
         return self.get('tests', [])
 
     @property
-    def suites(self) -> List[TestSuites]:
-        data = {}
-        suites = []
-        for test in self.tests:
-            data[test.get('id')] = test
-        for suite in self.get('suites', []):
-            for index, test in enumerate(suite.get('tests', [])):
-                suite['tests'][index] = data.get(test).copy()
-            suites.append(suite)
-        return suites
-
-    def running(self, driver, host):
-        result = []
+    def project(self) -> Project:
+        """ 首次访问时建立索引，之后复用；原始的 tests/suites 数据不会被修改 """
+        if self._project is None:
+            self._project = Project(self.id, self.name, self.url, self.tests, self.get('suites', []))
+        return self._project
+
+    @property
+    def suites(self) -> Tuple[SuiteView, ...]:
+        return self.project.suites
+
+    def compile(self, digest=None) -> ExecutionPlan:
+        """ 编译为执行计划，所有不支持的命令一次性报告 """
+        suites, errors = [], []
         for suite in self.suites:
-            result.extend(TestSuites(**suite).running(self.name, self.url, driver, host))
-        return result
+            tests = []
+            for test in suite.tests:
+                try:
+                    commands = tuple(command for command in TestCase.compile(test.commands) if command)
+                    tests.append(PlannedTest(test.id, test.name, commands))
+                except NotFoundCommandException as e:
+                    errors.append(f"{suite.name}::{test.name} {e}")
+            suites.append(PlannedSuite(suite.id, suite.name, suite.persistSession, suite.parallel, suite.timeout,
+                                       tuple(tests)))
+        if errors:
+            raise NotFoundCommandException("\n".join(errors))
+        return ExecutionPlan(self.id, self.name, self.url, tuple(suites), digest)
+
+    @classmethod
+    def load(cls, file, cache: PlanCache = None) -> ExecutionPlan:
+        """ 读取 .side 文件并编译，文件内容未变化时直接使用磁盘缓存的执行计划 """
+        return (cache or PlanCache()).load(file, lambda _file, digest: cls.of(Project.read(_file)).compile(digest))
+
+    @classmethod
+    def load_all(cls, paths, cache: PlanCache = None) -> List[ExecutionPlan]:
+        """ 读取多个 .side 文件或目录（递归查找 *.side） """
+        cache = cache or PlanCache()
+        return [cls.load(file, cache) for file in side_files(paths)]
+
+    def descriptors(self, host, pool: WebDriverPool) -> List[TestCaseDescriptor]:
+        return self.compile().descriptors(host, pool)
+
+    def running(self, driver, host, pool: WebDriverPool = None):
+        return self.compile().running(driver, host, pool)
@@ -0,0 +1,188 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+from urllib.parse import urlsplit
+
+from selenium.common import WebDriverException
+from selenium.webdriver import DesiredCapabilities, Chrome
+from selenium.webdriver.chrome.service import Service
+
+from selenium_ide_script.chromedriver import ChromeDriverResolver
+from selenium_ide_script.collector import DevToolsConsoleCollector, DevToolsNetworkCollector, \
+    WebDriverNetworkCollector, WebDriverPerformanceCollector
+from selenium_ide_script.devtools import DevToolsSession
+from selenium_ide_script.operable import BaseWebOperation
+
+BLANK_PAGE = 'about:blank'
+
+
+def create_chrome():
+    caps = DesiredCapabilities.CHROME.copy()
+    if WebDriverNetworkCollector.BACKEND != WebDriverNetworkCollector.DEVTOOLS:
+        caps['goog:loggingPrefs'] = {'performance': 'ALL'}
+    caps["excludeSwitches"] = ['enable-automation', 'enable-logging']
+    if ChromeDriverResolver.EXECUTABLE:
+        return Chrome(service=Service(ChromeDriverResolver.EXECUTABLE), desired_capabilities=caps)
+    return Chrome(desired_capabilities=caps)
+
+
+def _origin(url):
+    parts = urlsplit(url or '')
+    if parts.scheme in ('http', 'https') and parts.netloc:
+        return f"{parts.scheme}://{parts.netloc}"
+    return None
+
+
+def reset_session(driver):
+    """
+    清理会话状态使其可以被下一个测试复用：关闭多余窗口，通过 CDP 清除 cookie、缓存以及
+    各窗口所在源的 localStorage/sessionStorage/IndexedDB 等存储，回到空白页并重置窗口句柄记录
+    """
+    handles = driver.window_handles
+    origins = set()
+    for handle in reversed(handles):
+        driver.switch_to.window(handle)
+        origins.add(_origin(driver.current_url))
+        if handle != handles[0]:
+            driver.close()
+    driver.switch_to.window(handles[0])
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    for origin in origins - {None}:
+        driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+    driver.get(BLANK_PAGE)
+    BaseWebOperation.GLOBAL_WINDOW_HANDLES.pop(driver.session_id, None)
+    # 丢弃清理过程产生的日志，避免计入下一个测试的第一个步骤
+    for log_type in ('performance', 'browser'):
+        try:
+            driver.get_log(log_type)
+        except WebDriverException:
+            pass
+    DevToolsNetworkCollector.clear_for(driver)
+
+
+class WebDriverPool:
+    """
+    WebDriver 会话池，最多同时持有 size 个浏览器会话
+
+    会话在测试之间复用：归还时默认通过 reset_session 清理状态，只有浏览器崩溃、清理失败或
+    使用次数达到 recycle_after 时才关闭并在下次 acquire 时重新启动。
+    """
+    DEFAULT_SIZE = 1
+    WARM_SIZE = 1
+    RECYCLE_AFTER = 50
+
+    def __init__(self, factory: Callable = create_chrome, size: int = None, recycle_after: int = None):
+        self.factory = factory
+        self.size = max(1, size or WebDriverPool.DEFAULT_SIZE)
+        self.recycle_after = WebDriverPool.RECYCLE_AFTER if recycle_after is None else recycle_after
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def warm(self, count: int = None) -> 'WebDriverPool':
+        """ 并行预先启动 count 个浏览器（不超过 size），测试开始时无需等待启动 """
+        with self._lock:
+            count = min(self.size, WebDriverPool.WARM_SIZE if count is None else count) - len(self._drivers)
+            if count <= 0:
+                return self
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                futures = [executor.submit(self.factory) for _ in range(count)]
+            for future in futures:
+                if future.exception() is None:
+                    self._drivers.append(future.result())
+                    self._idle.put(future.result())
+        return self
+
+    def acquire(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if len(self._drivers) < self.size:
+                        driver = self.factory()
+                        self._drivers.append(driver)
+                        return driver
+                driver = self._idle.get()
+            # None 表示有会话被淘汰，空出了启动新浏览器的名额
+            if driver is not None:
+                return driver
+
+    def release(self, driver, reset: bool = True):
+        with self._lock:
+            uses = self._uses[driver] = self._uses.get(driver, 0) + 1
+        if self.recycle_after and uses >= self.recycle_after:
+            return self.discard(driver)
+        try:
+            if reset:
+                reset_session(driver)
+            elif not self.alive(driver):
+                return self.discard(driver)
+        except WebDriverException:
+            return self.discard(driver)
+        self._idle.put(driver)
+
+    @staticmethod
+    def alive(driver) -> bool:
+        try:
+            driver.window_handles
+            return True
+        except WebDriverException:
+            return False
+
+    def discard(self, driver):
+        """ 关闭并移出会话池，下次 acquire 时按需启动新的浏览器 """
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            self._uses.pop(driver, None)
+        self._close(driver)
+        self._idle.put(None)
+
+    @contextmanager
+    def session(self, reset: bool = True):
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver, reset)
+
+    def map(self, func: Callable, items: Iterable, reset: bool = True) -> List:
+        """ 并发执行 func(item, driver)，结果保持 items 的原始顺序 """
+
+        def _run(item):
+            with self.session(reset) as driver:
+                return func(item, driver)
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(_run, items))
+
+    def quit(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._uses.clear()
+        self._idle = queue.LifoQueue()
+        for driver in drivers:
+            self._close(driver)
+
+    @staticmethod
+    def _close(driver):
+        DevToolsConsoleCollector.close_for(driver)
+        DevToolsNetworkCollector.close_for(driver)
+        WebDriverPerformanceCollector.close_for(driver)
+        DevToolsSession.close_for(driver)
+        BaseWebOperation.GLOBAL_WINDOW_HANDLES.pop(driver.session_id, None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.quit()
@@ -0,0 +1,152 @@
+import importlib
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from selenium_ide_script.asserter import AssertionEngine
+from selenium_ide_script.allure import AttachmentStore, TestResult
+from selenium_ide_script.chromedriver import ChromeDriverResolver
+from selenium_ide_script.collector import DevToolsConsoleCollector, NetworkLog, WebDriverConsoleCollector, \
+    WebDriverNetworkCollector, WebDriverPerformanceCollector, WebDriverScreenshotCollector
+from selenium_ide_script.locator import LocatorPreference
+from selenium_ide_script.metrics import RunMetrics
+from selenium_ide_script.operable import BaseWebOperation
+from selenium_ide_script.performance import PerformanceBudgets, default_budgets
+from selenium_ide_script.plan import ExecutionPlan
+from selenium_ide_script.rules import default_rules
+from selenium_ide_script.schedule import DurationHistory
+from selenium_ide_script.trace import TraceRecorder
+from selenium_ide_script.selenium_ide import TestCase, TestSuites
+from selenium_ide_script.session import WebDriverPool, create_chrome
+from selenium_ide_script.stream import ResultStream
+
+# (套件下标, 测试下标元组)：persistSession 的套件整体分配，其余套件按测试分配
+Unit = Tuple[int, Tuple[int, ...]]
+
+CONFIGURABLE = (AssertionEngine, AttachmentStore, BaseWebOperation, ChromeDriverResolver, DevToolsConsoleCollector,
+                DurationHistory, NetworkLog, PerformanceBudgets, ResultStream, TestCase, TraceRecorder,
+                WebDriverConsoleCollector, WebDriverNetworkCollector, WebDriverPerformanceCollector,
+                WebDriverScreenshotCollector, WebDriverPool)
+SETTING_TYPES = (bool, int, float, str, tuple, frozenset, type(None))
+
+
+def shard_of(key: str, shards: int) -> int:
+    """ 与进程、PYTHONHASHSEED 无关的稳定分片，同一个 id 总是落在同一个分片 """
+    return zlib.crc32(str(key).encode('utf-8')) % shards
+
+
+def units_of(plan: ExecutionPlan) -> List[Tuple[str, Unit]]:
+    """ (分片 key, 工作单元)，按 .side 中的顺序 """
+    result = []
+    for suite_index, suite in enumerate(plan.suites):
+        if suite.persistSession:
+            result.append((suite.id, (suite_index, tuple(range(len(suite.tests))))))
+            continue
+        result.extend((test.id, (suite_index, (test_index,))) for test_index, test in enumerate(suite.tests))
+    return result
+
+
+def assign(plan: ExecutionPlan, shards: int) -> List[List[Unit]]:
+    """ 默认按 id 哈希分片，与历史文件无关；--sharding duration 时按历史耗时做 LPT 均衡 """
+    units = units_of(plan)
+    if DurationHistory.SHARDING == DurationHistory.BY_DURATION:
+        def _test_ids(item):
+            suite_index, test_indexes = item[1]
+            return [plan.suites[suite_index].tests[index].id for index in test_indexes]
+
+        return [[units[index][1] for index in indexes]
+                for indexes in DurationHistory.default().balance(units, shards, _test_ids)]
+    result = [[] for _ in range(shards)]
+    for key, unit in units:
+        result[shard_of(key, shards)].append(unit)
+    return result
+
+
+def capture_settings() -> Dict[str, Dict]:
+    """ 收集命令行选项写入的类属性，spawn 启动的子进程不会继承这些修改 """
+    return {f"{cls.__module__}:{cls.__qualname__}": {name: value for name, value in vars(cls).items()
+                                                     if name.isupper() and isinstance(value, SETTING_TYPES)}
+            for cls in CONFIGURABLE}
+
+
+def apply_settings(settings: Dict[str, Dict]):
+    for path, values in settings.items():
+        module, name = path.split(':')
+        cls = getattr(importlib.import_module(module), name)
+        for key, value in values.items():
+            setattr(cls, key, value)
+
+
+def trace_file_of(file, shard: int) -> str:
+    """ 进程池的同一个子进程可能先后执行多个分片，文件名同时包含进程号和分片编号，后一个分片不会覆盖前一个 """
+    root, extension = os.path.splitext(file)
+    return f"{root}.{os.getpid()}.{shard}{extension}"
+
+
+def run_shard(plan: ExecutionPlan, host, units: List[Unit], factory: Callable = create_chrome,
+              settings: Dict[str, Dict] = None, shard: int = 0) -> List[Tuple[Tuple[int, int], TestResult]]:
+    """ 在当前进程中用独立的浏览器执行一个分片，也可用于单独复现失败的分片 """
+    if settings:
+        apply_settings(settings)
+        TestCase.RULES = default_rules()
+        TestCase.BUDGETS = default_budgets()
+        if TraceRecorder.FILE:
+            # 每个分片写入自己的轨迹文件，离线分析时一起传入
+            TraceRecorder.FILE = trace_file_of(TraceRecorder.FILE, shard)
+    result = []
+    with WebDriverPool(factory, 1).warm(1) as pool:
+        for suite_index, test_indexes in units:
+            suite = plan.suites[suite_index]
+            suite = suite._replace(tests=tuple(suite.tests[index] for index in test_indexes))
+            results = TestSuites(**suite._asdict()).running(plan.name, plan.url, None, host, pool)
+            result.extend(((suite_index, index), test) for index, test in zip(test_indexes, results))
+    # 进程池的子进程退出时不执行 atexit，需要主动保存学习到的定位器和耗时
+    LocatorPreference.default().flush()
+    DurationHistory.default().flush()
+    if settings:
+        TraceRecorder.close_current()
+    return result
+
+
+class ShardedRunner:
+    """
+    多进程执行：按历史耗时均衡或按测试 id 哈希（persistSession 的套件整体）确定性地分片，每个进程使用自己的浏览器，
+    结果以可序列化的 TestResult 返回父进程并按 .side 中的顺序排列
+    """
+    DEFAULT_PROCESSES = 1
+
+    def __init__(self, plan: ExecutionPlan, host, processes: int = None, factory: Callable = create_chrome):
+        self.plan = plan
+        self.host = host
+        self.processes = max(1, processes or ShardedRunner.DEFAULT_PROCESSES)
+        self.factory = factory
+
+    def shards(self) -> List[List[Unit]]:
+        return assign(self.plan, self.processes)
+
+    def settings(self) -> Dict[str, Dict]:
+        settings = capture_settings()
+        if AttachmentStore.ENABLED:
+            # 附件写入父进程的运行目录，子进程退出后文件仍然存在
+            store = settings[f"{AttachmentStore.__module__}:{AttachmentStore.__qualname__}"]
+            store['DIRECTORY'] = AttachmentStore.run().directory
+            store['RUN_BUDGET'] = AttachmentStore.RUN_BUDGET // self.processes
+        return settings
+
+    def running(self, shard: int = None) -> List[TestResult]:
+        """ shard 不为空时只在当前进程执行该分片 """
+        if shard is not None and not 0 <= shard < self.processes:
+            raise ValueError(f"分片编号 {shard} 超出范围，应在 0 到 {self.processes - 1} 之间")
+        shards = self.shards()
+        if shard is not None:
+            pairs = run_shard(self.plan, self.host, shards[shard], self.factory)
+        else:
+            settings = self.settings()
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                futures = [executor.submit(run_shard, self.plan, self.host, units, self.factory, settings, index)
+                           for index, units in enumerate(shards) if units]
+                pairs = [pair for future in futures for pair in future.result()]
+            for _, test in pairs:
+                RunMetrics.current().record(test)
+        return [test for _, test in sorted(pairs, key=lambda pair: pair[0])]
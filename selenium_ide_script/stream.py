@@ -0,0 +1,99 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from selenium_ide_script.allure import TestResult
+
+STDOUT = '-'
+
+
+class StreamTest:
+    """ 一个测试在结果流中的记录，步骤在附件处理完成后按执行顺序写出 """
+
+    def __init__(self, stream: 'ResultStream', file_name, suite_name, test_id, test_name):
+        self.stream = stream
+        self.entry = {'file': file_name, 'suite': suite_name, 'id': test_id, 'name': test_name}
+        self.steps = 0
+
+    def step(self, command, timings: Dict):
+        index = self.steps
+        self.steps += 1
+        details = command.details
+        self.stream.write({
+            'event': 'step', **self.entry, 'index': index,
+            'command': command.command, 'target': command.target, 'value': command.value, 'comment': command.comment,
+            'passed': bool(command.result), 'exception': details.get('exception'),
+            'failures': details.get('failures', []),
+            'requests': len(details.get('requests') or ()), 'consoles': len(details.get('consoles') or ()),
+            'timings': timings, 'performance': self._performance(details.get('performance')),
+        })
+
+    @staticmethod
+    def _performance(performance):
+        """ 结果流中只保留汇总，逐个请求的明细见轨迹和报告附件 """
+        if not performance:
+            return None
+        slowest = performance.get('slowest')
+        return {'requests': performance.get('request_count'), 'bytes': performance.get('bytes'),
+                'slowest_ms': slowest['duration_ms'] if slowest else None, 'slowest_url': slowest['url'] if slowest else None,
+                'navigation': performance.get('navigation'), 'metrics': performance.get('metrics')}
+
+    def finish(self, result: TestResult):
+        self.stream.write({
+            'event': 'test', **self.entry, 'passed': bool(result.result), 'steps': self.steps,
+            'duration_ms': round(sum(timing.get('total', 0) for timing in result.timings), 3),
+            'description': result.description if isinstance(result.description, str) else None,
+        })
+
+
+class ResultStream:
+    """
+    JSON Lines 结果流：每个步骤和测试结束时各写出一行，FILE 为 - 时写到标准输出。
+    每行一次写入并立即刷新，多进程执行时子进程可以共用同一个输出
+    """
+    FILE = None
+    _CURRENT = None
+    _CURRENT_LOCK = threading.Lock()
+
+    def __init__(self, file):
+        self.file = file
+        self._output = sys.stdout if file == STDOUT else open(file, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def current(cls) -> Optional['ResultStream']:
+        """ 未配置 FILE 时不输出 """
+        if not ResultStream.FILE:
+            return None
+        with cls._CURRENT_LOCK:
+            if ResultStream._CURRENT is None:
+                ResultStream._CURRENT = cls(ResultStream.FILE)
+                atexit.register(ResultStream._CURRENT.close)
+            return ResultStream._CURRENT
+
+    @classmethod
+    def close_current(cls):
+        with cls._CURRENT_LOCK:
+            stream, ResultStream._CURRENT = ResultStream._CURRENT, None
+        if stream is not None:
+            stream.close()
+
+    def test(self, file_name, suite_name, test_id, test_name) -> StreamTest:
+        return StreamTest(self, file_name, suite_name, test_id, test_name)
+
+    def write(self, record: Dict):
+        record.setdefault('time', round(time.time(), 3))
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._output is not None:
+                self._output.write(line)
+                self._output.flush()
+
+    def close(self):
+        with self._lock:
+            output, self._output = self._output, None
+        if output is not None and output is not sys.stdout:
+            output.close()
@@ -0,0 +1,298 @@
+"""
+轨迹录制与离线分析：录制每个步骤的网络、控制台、耗时和截图，之后无需浏览器即可用新的规则重新判定
+
+    python -m selenium_ide_script.trace trace.zip [trace.*.zip ...] --success-codes 0,200 --json report.json
+"""
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import zipfile
+from concurrent.futures import Future, wait
+from typing import Dict, Iterator, List, Optional
+
+from allure_commons.types import AttachmentType
+
+from selenium_ide_script.allure import Step, TestResult
+from selenium_ide_script.asserter import AssertionEngine
+from selenium_ide_script.performance import PerformanceBudgets
+from selenium_ide_script.rules import XHR_TYPES, ConsoleLevelRule, ExceptionRule, ResponseCodeRule, Rule, \
+    default_rules, evaluate, response_code
+
+TRACE_VERSION = 1
+INDEX = 'index.json'
+
+
+class TraceTest:
+    """ 一个测试在轨迹中的记录，步骤按执行顺序写入 tests/<编号>/<步骤>.json """
+
+    def __init__(self, recorder: 'TraceRecorder', prefix, file_name, suite_name, test_id, test_name):
+        self.recorder = recorder
+        self.prefix = prefix
+        self.entry = {'prefix': prefix, 'file': file_name, 'suite': suite_name, 'id': test_id, 'name': test_name,
+                      'steps': 0}
+
+    def record(self, command, screenshot=None, extension='png'):
+        index = self.entry['steps']
+        self.entry['steps'] += 1
+        details = command.details
+        step = {
+            'index': index,
+            'id': command.id,
+            'command': command.command,
+            'target': command.target,
+            'value': command.value,
+            'comment': command.comment,
+            'passed': bool(command.result),
+            'exception': details.get('exception'),
+            'timings': command.timer.to_dict() if command.timer is not None else {},
+            'requests': [network.to_dict() for network in details.get('requests', [])],
+            'consoles': [console.to_dict() for console in details.get('consoles', [])],
+            'performance': details.get('performance'),
+            'screenshot': None,
+        }
+        if screenshot is not None:
+            step['screenshot'] = f"{self.prefix}/{index:06d}.{extension}"
+            self.recorder.write_screenshot(step['screenshot'], screenshot)
+        self.recorder.write(f"{self.prefix}/{index:06d}.json", json.dumps(step, ensure_ascii=False, default=str))
+
+    def finish(self, result: TestResult):
+        self.entry['passed'] = bool(result.result)
+        self.entry['description'] = result.description
+        self.recorder.add(self.entry)
+
+
+class TraceRecorder:
+    """
+    轨迹归档为一个 zip 文件（deflate 压缩，中央目录即索引），index.json 记录每个测试的位置和实时判定结果
+    """
+    FILE = None
+    COMPRESS_LEVEL = 6
+    _CURRENT = None
+    _CURRENT_LOCK = threading.Lock()
+
+    def __init__(self, file):
+        self.file = file
+        directory = os.path.dirname(os.path.abspath(file))
+        os.makedirs(directory, exist_ok=True)
+        self._zip = zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED, compresslevel=TraceRecorder.COMPRESS_LEVEL)
+        self._lock = threading.Lock()
+        self._tests: List[Dict] = []
+        self._pending: List[Future] = []
+        self._sequence = 0
+
+    @classmethod
+    def current(cls) -> Optional['TraceRecorder']:
+        """ 未配置 FILE 时不录制 """
+        if not TraceRecorder.FILE:
+            return None
+        with cls._CURRENT_LOCK:
+            if TraceRecorder._CURRENT is None:
+                TraceRecorder._CURRENT = cls(TraceRecorder.FILE)
+                atexit.register(TraceRecorder._CURRENT.close)
+            return TraceRecorder._CURRENT
+
+    @classmethod
+    def close_current(cls):
+        with cls._CURRENT_LOCK:
+            recorder, TraceRecorder._CURRENT = TraceRecorder._CURRENT, None
+        if recorder is not None:
+            recorder.close()
+
+    def test(self, file_name, suite_name, test_id, test_name) -> TraceTest:
+        with self._lock:
+            self._sequence += 1
+            prefix = f"tests/{self._sequence:06d}"
+        return TraceTest(self, prefix, file_name, suite_name, test_id, test_name)
+
+    def write(self, name, content):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.writestr(name, content)
+
+    def write_screenshot(self, name, screenshot):
+        """ 截图可能是尚未解码完成的 Future，完成后再写入；截图已经压缩过，不再 deflate """
+
+        def _write(data):
+            if data is None:
+                return
+            with self._lock:
+                if self._zip is not None:
+                    self._zip.writestr(zipfile.ZipInfo(name), data, zipfile.ZIP_STORED)
+
+        if not isinstance(screenshot, Future):
+            return _write(screenshot)
+        with self._lock:
+            self._pending.append(screenshot)
+        screenshot.add_done_callback(lambda future: _write(None if future.exception() else future.result()))
+
+    def add(self, entry: Dict):
+        with self._lock:
+            self._tests.append(entry)
+
+    def close(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        wait(pending)
+        with self._lock:
+            if self._zip is None:
+                return
+            tests = sorted(self._tests, key=lambda entry: entry['prefix'])
+            self._zip.writestr(INDEX, json.dumps({'version': TRACE_VERSION, 'tests': tests}, ensure_ascii=False))
+            self._zip.close()
+            self._zip = None
+
+
+class TraceArchive:
+    """ 只读打开一个轨迹文件，步骤按需解压 """
+
+    def __init__(self, file):
+        self.file = file
+        self._zip = zipfile.ZipFile(file)
+        self.index = json.loads(self._zip.read(INDEX))
+        if self.index.get('version') != TRACE_VERSION:
+            raise ValueError(f"不支持的轨迹版本：{self.index.get('version')}")
+
+    @property
+    def tests(self) -> List[Dict]:
+        return self.index.get('tests', [])
+
+    def steps(self, test: Dict) -> Iterator[Dict]:
+        for index in range(test['steps']):
+            yield json.loads(self._zip.read(f"{test['prefix']}/{index:06d}.json"))
+
+    def screenshot(self, step: Dict) -> Optional[bytes]:
+        name = step.get('screenshot')
+        if not name:
+            return None
+        try:
+            return self._zip.read(name)
+        except KeyError:
+            return None
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TraceAnalyzer:
+    """
+    用给定的规则重新判定轨迹中的每个步骤，结果可以汇总、与录制时的判定比较，或重新生成 TestResult 写入 allure
+    """
+    SCREENSHOT_TYPES = {'png': AttachmentType.PNG, 'jpeg': AttachmentType.JPG, 'webp': 'image/webp'}
+
+    def __init__(self, files: List[str], rules: List[Rule] = None, budgets: PerformanceBudgets = None):
+        self.files = files
+        self.rules = default_rules() if rules is None else rules
+        self.budgets = budgets
+
+    def rules_for(self, test: Dict) -> List[Rule]:
+        """ 对该测试生效的性能预算追加在规则之后 """
+        budget = self.budgets.for_test(test['suite'], test['name']) if self.budgets is not None else None
+        return self.rules if budget is None else [*self.rules, budget]
+
+    def verdicts(self) -> Iterator[Dict]:
+        for file in self.files:
+            with TraceArchive(file) as archive:
+                for test in archive.tests:
+                    steps, rules = [], self.rules_for(test)
+                    for step in archive.steps(test):
+                        failures = evaluate(step, rules)
+                        steps.append({'index': step['index'], 'command': step['command'], 'passed': not failures,
+                                      'failures': failures})
+                    passed = all(step['passed'] for step in steps)
+                    yield {'file': test['file'], 'suite': test['suite'], 'id': test['id'], 'name': test['name'],
+                           'passed': passed, 'recorded': test.get('passed'), 'changed': passed != test.get('passed'),
+                           'steps': steps}
+
+    def summary(self) -> Dict:
+        tests = list(self.verdicts())
+        return {
+            'tests': len(tests),
+            'passed': sum(1 for test in tests if test['passed']),
+            'failed': sum(1 for test in tests if not test['passed']),
+            'changed': [test for test in tests if test['changed']],
+            'results': tests,
+        }
+
+    def results(self) -> Iterator[TestResult]:
+        """ 按新的判定重新生成报告数据，附件内容直接来自轨迹 """
+        for file in self.files:
+            with TraceArchive(file) as archive:
+                for test in archive.tests:
+                    result = TestResult(test['file'], test['suite'], test['name'], test.get('description'))
+                    rules = self.rules_for(test)
+                    for step in archive.steps(test):
+                        content, passed = self._step(archive, step, rules)
+                        result.result = result.result and passed
+                        result.steps.append(content)
+                        result.timings.append(step.get('timings', {}))
+                    yield result
+
+    def _step(self, archive: TraceArchive, step: Dict, rules: List[Rule]):
+        passed = not evaluate(step, rules)
+        content = Step(f"{step.get('comment') or step['command']} -> {passed}")
+        screenshot = archive.screenshot(step)
+        if screenshot is not None:
+            extension = step['screenshot'].rsplit('.', 1)[-1]
+            content.add_sub_step('screenshot', screenshot, self.SCREENSHOT_TYPES.get(extension, AttachmentType.PNG))
+        for network in step.get('requests', []):
+            if network.get('type') in XHR_TYPES and not network.get('canceled'):
+                code = response_code(network)
+                content.add_sub_step(f"{network.get('method')}  {network.get('url')}  "
+                                     f"【{network.get('response_status_code') if not code else code}】",
+                                     json.dumps(network.get('response_body'), ensure_ascii=False), AttachmentType.JSON)
+        for console in step.get('consoles', []):
+            content.add_sub_step(f"console 【{console.get('level')}】", json.dumps(console), AttachmentType.JSON)
+        if step.get('performance'):
+            content.add_sub_step('performance', json.dumps(step['performance'], ensure_ascii=False), AttachmentType.JSON)
+        return content, passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='轨迹文件（多进程执行时每个进程一个）')
+    parser.add_argument('--success-codes', default=None,
+                        help='响应体 code 视为成功的取值，逗号分隔，默认 200')
+    parser.add_argument('--assertions', default=None, help='接口断言 JSON 文件，与 --success-codes 同时使用时两者都生效')
+    parser.add_argument('--budgets', default=None, help='性能预算 JSON 文件，轨迹中没有记录性能指标的步骤按请求计算')
+    parser.add_argument('--console-levels', default=",".join(ConsoleLevelRule.LEVELS),
+                        help='判定失败的控制台日志级别，逗号分隔，为空表示忽略控制台')
+    parser.add_argument('--json', help='完整的判定结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+
+    rules: List[Rule] = [ExceptionRule()]
+    if args.success_codes is not None:
+        codes = [code.strip() for code in args.success_codes.split(',') if code.strip()]
+        rules.append(ResponseCodeRule([*codes, *(int(code) for code in codes if code.lstrip('-').isdigit())]))
+    if args.assertions:
+        rules.append(AssertionEngine.load(args.assertions))
+    if args.success_codes is None and not args.assertions:
+        rules.append(AssertionEngine.default())
+    if args.console_levels:
+        rules.append(ConsoleLevelRule(args.console_levels.split(',')))
+
+    budgets = PerformanceBudgets.load(args.budgets) if args.budgets else None
+    summary = TraceAnalyzer(args.files, rules, budgets).summary()
+    print(f"tests {summary['tests']}  passed {summary['passed']}  failed {summary['failed']}  "
+          f"changed {len(summary['changed'])}")
+    for test in summary['changed']:
+        print(f"  {'FAIL -> PASS' if test['passed'] else 'PASS -> FAIL'}  {test['suite']}::{test['name']}")
+        for step in test['steps']:
+            for failure in step['failures']:
+                print(f"      #{step['index']} {step['command']}: {failure}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
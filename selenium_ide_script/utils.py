@@ -1,17 +1,39 @@
 import json
-import os
 import re
-import winreg
-from typing import Dict, List, Union
-from zipfile import ZipFile
+from functools import lru_cache
+from typing import Callable, Dict, List, Union
 import jsonpath
-import requests
 import urllib3
 
+from selenium_ide_script.chromedriver import ChromeDriverResolver, build_of
+
+
+SIMPLE_JSONPATH = re.compile(r'^\$(\.[A-Za-z_]\w*)+$')
+
+
+@lru_cache(maxsize=256)
+def compile_json_path(expression: str) -> Callable:
+    """ 编译 jsonpath 表达式，简单的 $.a.b.c 路径直接按 key 取值，其余表达式交给 jsonpath """
+    if not SIMPLE_JSONPATH.match(expression):
+        def _extract(data):
+            data = jsonpath.jsonpath(data, expression)
+            return data[0] if data and len(data) == 1 else data
+
+        return _extract
+    keys = tuple(expression.split('.')[1:])
+
+    def _get(data):
+        for key in keys:
+            if not isinstance(data, dict) or key not in data:
+                return False
+            data = data[key]
+        return data
+
+    return _get
+
 
 def json_data_extract(data: Union[Dict, List], expression: str):
-    data = jsonpath.jsonpath(data, expression)
-    return data[0] if data and len(data) == 1 else data
+    return compile_json_path(expression)(data)
 
 
 def json_data_reader(json_file):
@@ -20,41 +42,17 @@ def json_data_reader(json_file):
 
 
 def get_chrome_version():
-    try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 'Software\\Google\\Chrome\\BLBeacon')
-        value, t = winreg.QueryValueEx(key, 'version')
-        return re.compile(r'^[1-9]\d*\.\d*.\d*').findall(value)[0]
-    except WindowsError:
-        raise RuntimeWarning('没有找到chrome浏览器注册表信息')
+    return build_of(ChromeDriverResolver().browser_version())
 
 
 def get_chromedriver_version():
-    chromedriver_version_info = os.popen('chromedriver --version').read()
-    try:
-        version_info = chromedriver_version_info.split(' ')[1]
-        version_info = ".".join(version_info.split(".")[:-1])
-        return version_info
-    except KeyError and Exception:
-        raise RuntimeWarning('没有找到可用的chromedriver，请检查执行环境')
+    executable = ChromeDriverResolver.EXECUTABLE or ChromeDriverResolver().resolve()
+    return build_of(ChromeDriverResolver().version_of('executables', executable))
 
 
 def update_chromedriver_version():
-    chrome_version = get_chrome_version()
-    chromedriver_version = get_chromedriver_version()
-    if chrome_version != chromedriver_version:
-        base_url = 'https://npm.taobao.org/mirrors/chromedriver/'
-        url = f"{base_url}LATEST_RELEASE_{chrome_version}"
-        latest_version = requests.get(url).text
-        download_url = f"{base_url}{latest_version}/chromedriver_win32.zip"
-        file = requests.get(download_url)
-        with open("chromedriver.zip", 'wb') as zip_file:
-            zip_file.write(file.content)
-        f = ZipFile("chromedriver.zip", 'r')
-        for file in f.namelist():
-            f.extract(file)
-        f.close()
-        os.remove('chromedriver.zip')
-        os.remove('LICENSE.chromedriver')
+    """ 兼容旧的入口，解析结果在进程内和 ChromeDriverResolver.FILE 中缓存 """
+    ChromeDriverResolver.resolve_default()
     return True
 
 
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from selenium_ide_script.asserter import COMPARATORS, AssertionEngine, JSONDataAsserter, ResponseAssertion, \
+    latency_of
+from selenium_ide_script.cdp import decode_performance_log
+from selenium_ide_script.collector import NetworkLog
+
+
+def _network(url='https://example.com/api/orders', body=None, request=1000.0, finished=1120.0, type='XHR',
+             method='GET'):
+    return {'url': url, 'method': method, 'type': type, 'response_body': body,
+            'timing': {'request': request, 'response': request + 20, 'finished': finished}}
+
+
+def _performance_log(method, timestamp, **params):
+    return {'message': json.dumps({'message': {'method': method, 'params': {'requestId': '1', **params}}}),
+            'timestamp': timestamp}
+
+
+@pytest.mark.parametrize('operator, actual, expect, result', [
+    ('str_eq', 200, '200', True),
+    ('eq', '200', 200, True),
+    ('eq', True, 1, False),
+    ('ne', 0, '0', False),
+    ('lt', '3', 5, True),
+    ('lt', 3, '5', True),
+    ('le', 5, '5.0', True),
+    ('gt', '10', '9', True),
+    ('ge', 9, 10, False),
+    ('in', '200', [200, 0], True),
+    ('not_in', 500, ['200', 0], True),
+    ('contains', 'abc', 'b', True),
+    ('contains', 3, 'b', False),
+    ('exists', None, True, False),
+    ('type', [], 'list', True),
+])
+def test_comparators(operator, actual, expect, result):
+    assert JSONDataAsserter('$.value', expect, operator).compare(actual) is result
+
+
+def test_ordered_comparators_coerce_expect():
+    assert COMPARATORS['gt']('600', '500')
+    assert not COMPARATORS['le'](600, '500')
+
+
+@pytest.mark.parametrize('operator', ['lt', 'le', 'gt', 'ge'])
+def test_ordered_operators_reject_non_numeric_expect(operator):
+    with pytest.raises(ValueError):
+        JSONDataAsserter('$.value', 'fast', operator)
+
+
+def test_unknown_operator_rejected():
+    with pytest.raises(ValueError):
+        JSONDataAsserter('$.value', 1, 'approx')
+
+
+def test_regex_and_asserting_decodes_strings():
+    asserter = JSONDataAsserter('$.data.name', '^ord-\\d+$', 'regex')
+    assert asserter.asserting(json.dumps({'data': {'name': 'ord-42'}}))
+    assert not asserter.asserting('not json')
+
+
+def test_latency_of_is_milliseconds():
+    assert latency_of(_network(request=1000.0, finished=1120.0)) == 120.0
+    assert latency_of({'timing': {'request': 1000.0}}) is None
+
+
+def test_latency_of_network_log_from_performance_log():
+    network = NetworkLog()
+    for log in (_performance_log('Network.requestWillBeSent', 1000, type='XHR',
+                                 request={'url': 'https://example.com/api', 'method': 'GET'}),
+                _performance_log('Network.responseReceived', 1030, response={'status': 200, 'headers': {}}),
+                _performance_log('Network.loadingFinished', 1080, encodedDataLength=10)):
+        network.append_chrome_devtools_protocol_log(decode_performance_log(log), None)
+    assert latency_of(network) == 80
+
+
+def test_max_latency_ms_uses_milliseconds():
+    engine = AssertionEngine([ResponseAssertion('slow', max_latency_ms=100)])
+    assert engine.check([_network(finished=1090.0)]) == []
+    failures = engine.check([_network(finished=1150.0)])
+    assert len(failures) == 1 and '150ms' in failures[0]
+
+
+def test_default_engine_checks_xhr_code():
+    engine = AssertionEngine.default()
+    assert engine.check([_network(body={'code': 200}), _network(body={'code': '200'}), _network(body={})]) == []
+    assert len(engine.check([_network(body={'code': 500})])) == 1
+    assert engine.check([_network(body={'code': 500}, type='Document')]) == []
+
+
+def test_engine_filters_and_shares_extraction():
+    engine = AssertionEngine([
+        ResponseAssertion('total', url='/api/orders', method='post', path='$.data.total', operator='ge', expect='1'),
+        ResponseAssertion('code', url='/api/orders', method='post', path='$.code', operator='eq', expect=0),
+    ])
+    body = {'code': 0, 'data': {'total': 0}}
+    failures = engine.check([_network(body=body, method='POST'), _network(body=body, method='GET'),
+                             _network(url='https://example.com/api/users', body=body, method='POST')])
+    assert len(failures) == 1 and 'total' in failures[0]
+    assert engine.check([{**_network(body=body, method='POST'), 'canceled': True}]) == []
+
+
+def test_missing_body_fails_unless_optional():
+    assert len(AssertionEngine([ResponseAssertion('code', path='$.code', expect=0)]).check([_network()])) == 1
+    assert AssertionEngine([ResponseAssertion('code', path='$.code', expect=0, optional=True)]).check(
+        [_network(body={})]) == []
+
+
+def test_load(tmp_path):
+    file = tmp_path / 'assertions.json'
+    file.write_text(json.dumps([{'name': 'code', 'path': '$.code', 'operator': 'in', 'expect': [0]}]),
+                    encoding='utf-8')
+    engine = AssertionEngine.load(str(file))
+    assert [assertion.name for assertion in engine.assertions] == ['code']
+    assert len(engine.check([_network(body={'code': 1})])) == 1
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+from selenium_ide_script import chromedriver
+from selenium_ide_script.chromedriver import ChromeDriverResolver, build_of
+
+BROWSER_VERSION = '120.0.6099.71'
+BUILD = '120.0.6099'
+DRIVER_VERSION = '120.0.6099.109'
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError('不应启动进程或访问网络')
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    """ 伪造的浏览器文件及其版本缓存，PATH 中没有 chromedriver """
+    browser = tmp_path / 'chrome'
+    browser.write_bytes(b'chrome')
+    cache = {'browsers': {str(browser): {'signature': ChromeDriverResolver._signature(str(browser)),
+                                         'version': BROWSER_VERSION}}}
+    (tmp_path / 'chromedriver.json').write_text(json.dumps(cache), encoding='utf-8')
+    monkeypatch.setattr(ChromeDriverResolver, 'BROWSER', str(browser))
+    monkeypatch.setattr(chromedriver.shutil, 'which', lambda name: None)
+    monkeypatch.setattr(chromedriver.subprocess, 'run', _fail)
+    return tmp_path
+
+
+def _resolver(paths, **kwargs) -> ChromeDriverResolver:
+    return ChromeDriverResolver(str(paths / 'chromedriver.json'), str(paths / 'drivers'), **kwargs)
+
+
+def _cft_mirror(paths, monkeypatch, archive: bytes) -> str:
+    """ 目录结构与 Chrome for Testing 相同的本地镜像 """
+    releases = paths / 'releases'
+    releases.mkdir()
+    (releases / f'LATEST_RELEASE_{BUILD}').write_text(DRIVER_VERSION)
+    monkeypatch.setattr(ChromeDriverResolver, 'CFT_RELEASES', f"{releases}{os.sep}")
+    name = _resolver(paths)._cft_platform()
+    directory = paths / 'mirror' / DRIVER_VERSION / name
+    directory.mkdir(parents=True)
+    (directory / f'chromedriver-{name}.zip').write_bytes(archive)
+    return f"{paths / 'mirror'}{os.sep}"
+
+
+def _driver_zip(paths, content=b'driver') -> bytes:
+    name = _resolver(paths)._cft_platform()
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr(f'chromedriver-{name}/LICENSE.chromedriver', 'license')
+        archive.writestr(f'chromedriver-{name}/{ChromeDriverResolver._driver_name()}', content)
+    return data.getvalue()
+
+
+def test_build_of():
+    assert build_of('Google Chrome 120.0.6099.71 ') == BUILD
+    assert build_of('ChromeDriver 114.0.5735.90 (abc)') == '114.0.5735'
+    assert build_of('') is None
+
+
+def test_cached_driver_is_used_without_process_or_network(paths, monkeypatch):
+    driver = paths / 'chromedriver'
+    driver.write_bytes(b'driver')
+    cache = json.loads((paths / 'chromedriver.json').read_text(encoding='utf-8'))
+    cache['drivers'] = {BUILD: str(driver)}
+    cache['executables'] = {str(driver): {'signature': ChromeDriverResolver._signature(str(driver)),
+                                          'version': DRIVER_VERSION}}
+    (paths / 'chromedriver.json').write_text(json.dumps(cache), encoding='utf-8')
+    monkeypatch.setattr(ChromeDriverResolver, '_fetch', _fail)
+    assert _resolver(paths, offline=False).resolve() == str(driver)
+
+
+def test_offline_miss_raises_runtime_warning(paths, monkeypatch):
+    monkeypatch.setattr(ChromeDriverResolver, '_fetch', _fail)
+    with pytest.raises(RuntimeWarning):
+        _resolver(paths, offline=True).resolve()
+
+
+def test_download_from_local_cft_mirror(paths, monkeypatch):
+    mirror = _cft_mirror(paths, monkeypatch, _driver_zip(paths, b'downloaded'))
+    executable = _resolver(paths, cft_mirror=mirror, offline=False).resolve()
+    assert executable == os.path.join(str(paths / 'drivers'), DRIVER_VERSION, ChromeDriverResolver._driver_name())
+    with open(executable, 'rb') as f:
+        assert f.read() == b'downloaded'
+    assert os.access(executable, os.X_OK)
+    cache = json.loads((paths / 'chromedriver.json').read_text(encoding='utf-8'))
+    assert cache['drivers'] == {BUILD: executable}
+    assert cache['executables'][executable]['version'] == DRIVER_VERSION
+
+    # 下一次启动直接使用缓存，不再访问镜像
+    monkeypatch.setattr(ChromeDriverResolver, '_fetch', _fail)
+    assert _resolver(paths, offline=True).resolve() == executable
+
+
+def test_corrupt_download_is_a_resolve_failure(paths, monkeypatch):
+    mirror = _cft_mirror(paths, monkeypatch, b'<html>502 Bad Gateway</html>')
+    with pytest.raises(RuntimeWarning, match='不是有效的chromedriver压缩包'):
+        _resolver(paths, cft_mirror=mirror, offline=False).resolve()
+    cache = json.loads((paths / 'chromedriver.json').read_text(encoding='utf-8'))
+    assert 'drivers' not in cache
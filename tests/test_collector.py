@@ -0,0 +1,43 @@
+import time
+
+from benchmarks.fake_webdriver import RecordedStep, RecordedWebDriver
+from selenium_ide_script.collector import WebDriverNetworkCollector
+
+
+class DelayedWebDriver(RecordedWebDriver):
+    """ 动作之后前 delay 秒内 performance 日志为空，模拟点击之后异步发出的请求 """
+
+    def __init__(self, step, delay):
+        super().__init__(step)
+        self.delay = delay
+        self.acted = None
+        self.polls = 0
+
+    def next_step(self):
+        super().next_step()
+        self.acted = time.monotonic()
+
+    def get_log(self, log_type):
+        if log_type == 'performance':
+            self.polls += 1
+            if time.monotonic() - self.acted < self.delay:
+                return []
+        return super().get_log(log_type)
+
+
+def test_events_after_an_empty_first_poll_belong_to_the_step():
+    driver = DelayedWebDriver(RecordedStep.load(), delay=0.02)
+    driver.next_step()
+    networks = WebDriverNetworkCollector(idle_window=0.1, first_activity_window=0.05).collect(driver)
+    assert driver.polls > 1
+    assert networks
+    assert all(network.url for network in networks)
+    assert WebDriverNetworkCollector(idle_window=0.1).collect(driver) == []
+
+
+def test_step_without_requests_returns_after_the_first_activity_window():
+    driver = DelayedWebDriver(RecordedStep([]), delay=0)
+    driver.next_step()
+    start = time.monotonic()
+    assert WebDriverNetworkCollector(idle_window=1, first_activity_window=0.05).collect(driver) == []
+    assert 0.05 <= time.monotonic() - start < 0.5
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('trio_websocket')
+
+from benchmarks.fake_devtools import DevToolsReplayServer
+from benchmarks.fake_webdriver import RecordedStep, RecordedWebDriver
+from selenium_ide_script.collector import DevToolsNetworkCollector, NetworkLog, WebDriverNetworkCollector
+from selenium_ide_script.devtools import DevToolsSession
+
+
+class RecordingReplayServer(DevToolsReplayServer):
+    """ 额外记录收到的完整 CDP 消息，用于检查命令发往的页面会话 """
+
+    def __init__(self, step):
+        super().__init__(step)
+        self.messages = []
+
+    def _respond(self, message):
+        self.messages.append(message)
+        return super()._respond(message)
+
+
+def _record(network):
+    return network.url, network.method, network.type, network.response_status_code, network.response_body
+
+
+@pytest.fixture
+def replay():
+    servers, sessions = [], []
+
+    def _start(step, **kwargs):
+        server = RecordingReplayServer(step).start()
+        session = DevToolsSession(server.websocket_url).start()
+        servers.append(server)
+        sessions.append(session)
+        return server, DevToolsNetworkCollector(session, **kwargs)
+
+    yield _start
+    for session in sessions:
+        session.close()
+    for server in servers:
+        server.close()
+
+
+def test_replayed_step_matches_performance_log_collector(replay):
+    step = RecordedStep.load(events=200)
+    driver = RecordedWebDriver(step)
+    driver.next_step()
+    expected = [_record(network) for network in WebDriverNetworkCollector(idle_window=0).collect(driver)]
+
+    server, collector = replay(step, idle_window=0.05)
+    server.replay()
+    actual = [_record(network) for network in collector.collect()]
+    assert len(actual) == len(expected) > 0
+    assert sorted(actual, key=repr) == sorted(expected, key=repr)
+    assert any(body for *_, body in actual)
+
+
+def test_response_bodies_are_fetched_from_the_emitting_session(replay):
+    server, collector = replay(RecordedStep.load(), idle_window=0.05)
+    server.replay()
+    networks = collector.collect()
+    fetches = [message for message in server.messages if message['method'] == 'Network.getResponseBody']
+    assert fetches
+    assert all(message.get('sessionId') == DevToolsReplayServer.SESSION_ID for message in fetches)
+    assert {message['params']['requestId'] for message in fetches} == {
+        network.request_id for network in networks if network.response_body is not None}
+
+
+def test_collect_waits_for_events_that_arrive_after_it_starts(replay):
+    server, collector = replay(RecordedStep.load(), idle_window=0.2)
+    timer = threading.Timer(0.05, server.replay)
+    timer.start()
+    try:
+        networks = collector.collect()
+    finally:
+        timer.join()
+    assert len(networks) == len({event['params'].get('requestId') for event in server.events
+                                 if event['method'] in NetworkLog.HANDLERS})
+
+
+def test_collect_returns_after_the_idle_window_without_events(replay):
+    _, collector = replay(RecordedStep([]), idle_window=0.1, timeout=5)
+    start = time.monotonic()
+    assert collector.collect() == []
+    assert 0.1 <= time.monotonic() - start < 1
+
+
+def test_collect_returns_partial_requests_on_timeout(replay):
+    step = RecordedStep.load()
+    server, collector = replay(step, idle_window=0.05, timeout=0.3)
+    # 只推送 requestWillBeSent，请求一直在途，只能等到超时
+    server.events = [event for event in server.events if event['method'] == 'Network.requestWillBeSent']
+    server.replay()
+    start = time.monotonic()
+    networks = collector.collect()
+    assert 0.25 <= time.monotonic() - start < 2
+    assert networks and not any(network.finished for network in networks)
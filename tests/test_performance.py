@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from selenium_ide_script.performance import BudgetRule, PerformanceBudget, PerformanceBudgets, bytes_of, \
+    step_performance, ttfb_of
+
+
+def _network(url, type='XHR', request=1000.0, response=1040.0, finished=1100.0, encoded=1000, method='GET',
+             canceled=False):
+    return {'url': url, 'method': method, 'type': type, 'canceled': canceled, 'encoded_data_length': encoded,
+            'timing': {'request': request, 'response': response, 'finished': finished}}
+
+
+NETWORKS = [
+    _network('https://example.com/app', type='Document', finished=1300.0, encoded=50000),
+    _network('https://example.com/api/orders', response=1250.0, finished=1400.0, encoded=2000),
+    _network('https://example.com/api/users', encoded=500),
+    _network('https://example.com/api/cancelled', canceled=True, finished=9000.0),
+]
+
+
+def test_ttfb_and_bytes():
+    assert ttfb_of(NETWORKS[1]) == 250.0
+    assert ttfb_of({'timing': {'request': 1.0}}) is None
+    assert bytes_of({'data_length': 30}) == 30
+    assert bytes_of({'encoded_data_length': 10, 'data_length': 30}) == 10
+
+
+def test_step_performance_summary():
+    performance = step_performance(NETWORKS, {'load': 800}, {'JSHeapUsedSize': 1024})
+    assert performance['request_count'] == 3
+    assert performance['bytes'] == 52500
+    assert performance['slowest'] == {'url': 'https://example.com/api/orders', 'method': 'GET', 'type': 'XHR',
+                                      'duration_ms': 400.0}
+    assert [request['url'] for request in performance['requests']] == ['https://example.com/api/orders',
+                                                                       'https://example.com/api/users']
+    assert performance['requests'][0]['ttfb_ms'] == 250.0
+    assert performance['navigation'] == {'load': 800}
+    assert performance['metrics'] == {'JSHeapUsedSize': 1024}
+
+
+def test_empty_budget_passes():
+    assert PerformanceBudget().check(NETWORKS, step_performance(NETWORKS)) == []
+
+
+@pytest.mark.parametrize('limits, expected', [
+    ({'max_ttfb_ms': 200}, ['/api/orders TTFB 250ms']),
+    ({'max_duration_ms': 300}, ['/api/orders 耗时 400ms']),
+    ({'max_duration_ms': 300, 'url': '/api/users'}, []),
+    ({'max_duration_ms': 250, 'types': ['Document']}, ['/app 耗时 300ms']),
+    ({'max_slowest_ms': 399}, ['最慢的请求']),
+    ({'max_bytes': 52500}, []),
+    ({'max_bytes': 52499}, ['传输 52500 字节']),
+    ({'max_requests': 2}, ['请求数 3']),
+])
+def test_budget_limits(limits, expected):
+    failures = PerformanceBudget('budget', **limits).check(NETWORKS, step_performance(NETWORKS))
+    assert len(failures) == len(expected)
+    for failure, text in zip(failures, expected):
+        assert failure.startswith('budget：') and text in failure
+
+
+def test_budget_page_limits_skip_missing_values():
+    budget = PerformanceBudget('page', navigation={'load': 500}, metrics={'LayoutCount': 10})
+    performance = step_performance(NETWORKS, {'load': 800}, {'LayoutCount': 3})
+    assert budget.check(NETWORKS, performance) == ['page：navigation.load 800 超过 500']
+    assert budget.check(NETWORKS, step_performance(NETWORKS)) == []
+
+
+def test_budget_rule_computes_performance_for_old_traces():
+    rule = BudgetRule([PerformanceBudget('b', max_requests=2)])
+    assert len(rule({'requests': NETWORKS})) == 1
+    assert rule({'requests': NETWORKS, 'performance': step_performance(NETWORKS[:1])}) == []
+
+
+def test_budgets_for_test(tmp_path):
+    file = tmp_path / 'budgets.json'
+    file.write_text(json.dumps([{'name': 'checkout', 'suite': '^checkout$', 'max_requests': 1},
+                                {'name': 'all', 'max_bytes': 10}]), encoding='utf-8')
+    budgets = PerformanceBudgets.load(str(file))
+    rule = budgets.for_test('checkout', 'pay')
+    assert [budget.name for budget in rule.budgets] == ['checkout', 'all']
+    assert budgets.for_test('checkout', 'pay') is rule
+    assert [budget.name for budget in budgets.for_test('search', 'query').budgets] == ['all']
+    assert PerformanceBudgets([PerformanceBudget(test='^pay$')]).for_test('checkout', 'refund') is None
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from common.exceptions import NotFoundTestException
+from selenium_ide_script import project
+from selenium_ide_script.project import Project, TESTS_ITEM, iter_side, side_files
+
+SIDE = {
+    'id': 'project-1',
+    'version': '2.0',
+    'name': 'demo',
+    'url': 'https://example.com',
+    'tests': [
+        {'id': 't1', 'name': 'login', 'commands': [{'id': 'c1', 'command': 'open', 'target': '/', 'value': ''}]},
+        {'id': 't2', 'name': 'search', 'commands': [{'id': 'c2', 'command': 'click', 'target': 'css=#q',
+                                                      'value': '', 'targets': [['css=#q', 'css:finder']]}]},
+    ],
+    'suites': [
+        {'id': 's1', 'name': 'main', 'persistSession': True, 'parallel': False, 'timeout': 300,
+         'tests': ['t1', 't2']},
+        {'id': 's2', 'name': 'smoke', 'tests': ['t2']},
+    ],
+    'urls': ['https://example.com/'],
+    'plugins': [],
+}
+
+
+@pytest.fixture(params=['json', 'ijson'])
+def side_file(request, tmp_path, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(project, 'ijson', None)
+    elif project.ijson is None:
+        pytest.skip('ijson 未安装')
+    file = tmp_path / 'demo.side'
+    file.write_text(json.dumps(SIDE, ensure_ascii=False), encoding='utf-8')
+    return str(file)
+
+
+def test_iter_side_yields_tests_and_top_level_fields(side_file):
+    items = list(iter_side(side_file))
+    assert [value['id'] for key, value in items if key == TESTS_ITEM] == ['t1', 't2']
+    fields = {key: value for key, value in items if key != TESTS_ITEM}
+    assert fields == {key: value for key, value in SIDE.items() if key != 'tests'}
+
+
+def test_read_indexes_tests_and_suites(side_file):
+    side = Project.read(side_file)
+    assert (side.id, side.name, side.url, len(side)) == ('project-1', 'demo', 'https://example.com', 2)
+    assert side.test('t2') is side.test_named('search')
+    main = side.suite('s1')
+    assert (main.persistSession, main.timeout) == (True, 300)
+    assert main.tests[1] is side.suite_named('smoke').tests[0]
+    assert (side.suite('s2').persistSession, side.suite('s2').timeout) == (False, 10)
+    assert side.test('t2').commands[0]['targets'] == [['css=#q', 'css:finder']]
+
+
+def test_views_are_read_only(side_file):
+    command = Project.read(side_file).test('t1').commands[0]
+    with pytest.raises(TypeError):
+        command['target'] = '/admin'
+
+
+def test_lookup_errors(side_file):
+    side = Project.read(side_file)
+    for lookup in (side.test, side.test_named, side.suite, side.suite_named):
+        with pytest.raises(NotFoundTestException):
+            lookup('missing')
+
+
+def test_suite_referencing_unknown_test():
+    with pytest.raises(NotFoundTestException):
+        Project('p', 'p', '', [], [{'id': 's', 'name': 's', 'tests': ['missing']}])
+
+
+def test_side_files_expands_directories(tmp_path):
+    (tmp_path / 'b').mkdir()
+    for name in ('a.side', 'b/c.side', 'b/readme.txt'):
+        (tmp_path / name).write_text('{}', encoding='utf-8')
+    expected = [str(tmp_path / 'a.side'), str(tmp_path / 'b' / 'c.side')]
+    assert side_files(str(tmp_path)) == expected
+    assert side_files([str(tmp_path), str(tmp_path / 'a.side')]) == expected
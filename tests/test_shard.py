@@ -0,0 +1,89 @@
+import zlib
+
+import pytest
+
+from selenium_ide_script.plan import ExecutionPlan, PlannedSuite, PlannedTest
+from selenium_ide_script.schedule import DurationHistory
+from selenium_ide_script.shard import ShardedRunner, assign, shard_of, trace_file_of, units_of
+
+
+def _plan(*suites) -> ExecutionPlan:
+    return ExecutionPlan('plan', 'demo', 'https://example.com', tuple(
+        PlannedSuite(f"suite-{index}", f"suite {index}", persist, False, 300,
+                     tuple(PlannedTest(test_id, test_id, ()) for test_id in test_ids))
+        for index, (persist, test_ids) in enumerate(suites)))
+
+
+def _test_ids(plan, shard):
+    return [plan.suites[suite_index].tests[index].id for suite_index, indexes in shard for index in indexes]
+
+
+@pytest.fixture
+def hash_sharding(monkeypatch):
+    monkeypatch.setattr(DurationHistory, 'SHARDING', DurationHistory.BY_ID)
+
+
+def test_shard_of_is_stable_crc32():
+    for key in ('a', 'test-1', '中文'):
+        assert shard_of(key, 4) == zlib.crc32(key.encode('utf-8')) % 4
+    assert {shard_of(f"t{index}", 3) for index in range(100)} == {0, 1, 2}
+
+
+def test_units_of_keeps_persist_session_suites_whole():
+    plan = _plan((False, ['a', 'b']), (True, ['c', 'd']))
+    assert units_of(plan) == [('a', (0, (0,))), ('b', (0, (1,))), ('suite-1', (1, (0, 1)))]
+
+
+def test_assign_by_id_hash_covers_every_test_once(hash_sharding):
+    plan = _plan((False, [f"t{index}" for index in range(20)]), (True, ['p1', 'p2']))
+    shards = assign(plan, 3)
+    assert len(shards) == 3
+    ids = [test_id for shard in shards for test_id in _test_ids(plan, shard)]
+    assert sorted(ids) == sorted([f"t{index}" for index in range(20)] + ['p1', 'p2'])
+    for index, shard in enumerate(shards):
+        assert all(shard_of(test_id, 3) == index for test_id in _test_ids(plan, shard) if test_id.startswith('t'))
+    assert [(1, (0, 1))] == [unit for unit in shards[shard_of('suite-1', 3)] if unit[0] == 1]
+
+
+def test_assign_by_id_hash_is_deterministic(hash_sharding):
+    plan = _plan((False, [f"t{index}" for index in range(20)]))
+    assert assign(plan, 4) == assign(plan, 4)
+
+
+def test_trace_file_of_is_unique_per_shard_in_one_process():
+    files = {trace_file_of('/tmp/run/trace.zip', shard) for shard in range(3)}
+    assert len(files) == 3
+    assert all(file.startswith('/tmp/run/trace.') and file.endswith('.zip') for file in files)
+
+
+@pytest.mark.parametrize('shard', [-1, 2, 5])
+def test_running_rejects_shard_out_of_range(shard):
+    runner = ShardedRunner(_plan((False, ['a'])), 'test', 2, factory=None)
+    with pytest.raises(ValueError):
+        runner.running(shard)
+
+
+def test_defaults_run_longest_first_and_shard_by_id():
+    assert DurationHistory.SCHEDULE == DurationHistory.LONGEST_FIRST
+    assert DurationHistory.SHARDING == DurationHistory.BY_ID
+
+
+def test_longest_first_runs_unseen_tests_first(tmp_path):
+    history = DurationHistory(str(tmp_path / 'durations.json'))
+    for test_id, duration in {'a': 100, 'b': 900, 'd': 500}.items():
+        history.record(test_id, duration)
+    tests = ['a', 'b', 'c', 'd', 'e']
+    assert [tests[index] for index in history.longest_first(tests, key=str)] == ['c', 'e', 'b', 'd', 'a']
+
+
+def test_assign_by_duration_balances_by_history(monkeypatch, tmp_path):
+    history = DurationHistory(str(tmp_path / 'durations.json'))
+    for test_id, duration in {'a': 900, 'b': 500, 'c': 400, 'd': 300, 'e': 200}.items():
+        history.record(test_id, duration)
+    monkeypatch.setattr(DurationHistory, '_DEFAULT', history)
+    monkeypatch.setattr(DurationHistory, 'SHARDING', DurationHistory.BY_DURATION)
+    plan = _plan((False, ['a', 'b', 'c', 'd', 'e']))
+    shards = assign(plan, 2)
+    loads = [sum(history.estimate(test_id) for test_id in _test_ids(plan, shard)) for shard in shards]
+    assert sorted(loads) == [1100, 1200]
+    assert _test_ids(plan, shards[0]) == ['a', 'd']
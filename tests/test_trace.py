@@ -0,0 +1,102 @@
+import json
+from types import SimpleNamespace
+
+from selenium_ide_script.allure import TestResult as Result
+from selenium_ide_script.asserter import AssertionEngine
+from selenium_ide_script.cdp import decode_performance_log
+from selenium_ide_script.collector import ConsoleLog, NetworkLog
+from selenium_ide_script.metrics import StepTimer
+from selenium_ide_script.performance import PerformanceBudget, PerformanceBudgets
+from selenium_ide_script.rules import ConsoleLevelRule, ExceptionRule, ResponseCodeRule, default_rules, evaluate
+from selenium_ide_script.trace import TraceAnalyzer, TraceArchive, TraceRecorder
+from selenium_ide_script.trace import main as trace_main
+
+
+def _network(body, request_id='1', url='https://example.com/api/orders'):
+    network = NetworkLog()
+    for method, timestamp, params in (
+            ('Network.requestWillBeSent', 1000, {'type': 'XHR', 'request': {'url': url, 'method': 'POST'}}),
+            ('Network.responseReceived', 1040, {'response': {'status': 200, 'headers': {}}}),
+            ('Network.loadingFinished', 1100, {'encodedDataLength': 300})):
+        log = {'message': json.dumps({'message': {'method': method, 'params': {'requestId': request_id, **params}}}),
+               'timestamp': timestamp}
+        network.append_chrome_devtools_protocol_log(decode_performance_log(log), None)
+    network.response_body = body
+    return network
+
+
+def _command(index, requests=(), consoles=(), exception=None):
+    details = {'requests': list(requests), 'consoles': list(consoles)}
+    if exception:
+        details['exception'] = exception
+    return SimpleNamespace(id=f"c{index}", command='click', target=f"css=#b{index}", value='', comment='',
+                           result=not exception, details=details, timer=StepTimer())
+
+
+def _record(file, commands, suite='main', name='orders'):
+    recorder = TraceRecorder(file)
+    trace = recorder.test('demo', suite, 't1', name)
+    for command in commands:
+        trace.record(command, screenshot=b'png' if command.id == 'c0' else None)
+    trace.finish(Result('demo', suite, name, 'description', all(command.result for command in commands)))
+    recorder.close()
+
+
+def test_rules():
+    step = {'exception': 'boom', 'requests': [{'type': 'XHR', 'method': 'GET', 'url': '/a',
+                                               'response_body': {'code': 500}}],
+            'consoles': [{'level': 'SEVERE', 'message': 'x'}, {'level': 'INFO', 'message': 'y'}]}
+    assert ExceptionRule()(step) == ['执行异常：boom']
+    assert ResponseCodeRule()(step) == ['GET /a code=500']
+    assert ResponseCodeRule([500])(step) == []
+    assert ConsoleLevelRule()(step) == ['console 【SEVERE】 x']
+    assert ConsoleLevelRule(['info'])(step) == ['console 【INFO】 y']
+    assert len(evaluate(step, default_rules())) == 3
+    assert evaluate({}, default_rules()) == []
+
+
+def test_round_trip(tmp_path):
+    file = str(tmp_path / 'trace.zip')
+    _record(file, [_command(0, [_network({'code': 200})], [ConsoleLog('INFO', 'ready', 'console-api', 1)]),
+                   _command(1, [_network({'code': 500}, '2')])])
+    with TraceArchive(file) as archive:
+        [test] = archive.tests
+        assert (test['suite'], test['name'], test['steps'], test['passed']) == ('main', 'orders', 2, True)
+        steps = list(archive.steps(test))
+        assert [step['target'] for step in steps] == ['css=#b0', 'css=#b1']
+        assert steps[0]['requests'][0]['response_body'] == {'code': 200}
+        assert steps[0]['requests'][0]['timing'] == {'request': 1000, 'response': 1040, 'finished': 1100}
+        assert steps[0]['consoles'] == [{'level': 'INFO', 'message': 'ready', 'source': 'console-api', 'timestamp': 1}]
+        assert archive.screenshot(steps[0]) == b'png'
+        assert archive.screenshot(steps[1]) is None
+
+
+def test_analyzer_re_evaluates_with_new_rules(tmp_path):
+    file = str(tmp_path / 'trace.zip')
+    _record(file, [_command(0, [_network({'code': 1})])])
+    assert TraceAnalyzer([file], [ExceptionRule(), ResponseCodeRule([1])]).summary()['changed'] == []
+    summary = TraceAnalyzer([file], [ExceptionRule(), AssertionEngine.default()]).summary()
+    assert (summary['tests'], summary['failed']) == (1, 1)
+    [changed] = summary['changed']
+    assert changed['recorded'] is True
+    assert changed['steps'][0]['failures'] == ['POST https://example.com/api/orders code：$.code 实际为 1']
+    [result] = TraceAnalyzer([file], [ResponseCodeRule()]).results()
+    assert result.result is False and len(result.steps) == 1
+
+
+def test_analyzer_applies_budgets_per_test(tmp_path):
+    file = str(tmp_path / 'trace.zip')
+    _record(file, [_command(0, [_network({'code': 200})])])
+    budgets = PerformanceBudgets([PerformanceBudget('slow', suite='^main$', max_duration_ms=50)])
+    assert TraceAnalyzer([file], [], budgets).summary()['failed'] == 1
+    other = PerformanceBudgets([PerformanceBudget('slow', suite='^other$', max_duration_ms=50)])
+    assert TraceAnalyzer([file], [], other).summary()['failed'] == 0
+
+
+def test_main(tmp_path, capsys):
+    file = str(tmp_path / 'trace.zip')
+    _record(file, [_command(0, [_network({'code': 1})])])
+    assert trace_main([file, '--success-codes', '1,200']) == 0
+    assert trace_main([file, '--json', str(tmp_path / 'report.json')]) == 1
+    assert 'PASS -> FAIL' in capsys.readouterr().out
+    assert json.loads((tmp_path / 'report.json').read_text(encoding='utf-8'))['failed'] == 1